@@ -2,6 +2,8 @@ from flask import Flask
 from flask_cors import CORS
 from config import Config
 from database import db
+from services.session_store import ServerSideSessionInterface, create_store
+from services import instrumentation
 import os
 from datetime import timedelta
 
@@ -17,9 +19,10 @@ def create_app():
         SESSION_COOKIE_SECURE=True,
         SESSION_COOKIE_HTTPONLY=True,
         SESSION_COOKIE_DOMAIN='.akash-codes.space',  # shared for subdomains
-        PERMANENT_SESSION_LIFETIME=timedelta(days=7),
-        SESSION_TYPE='filesystem'
+        PERMANENT_SESSION_LIFETIME=timedelta(days=7)
     )
+    # Session data stays server-side; the cookie only carries its id
+    app.session_interface = ServerSideSessionInterface(create_store('sessions'))
 
     # ✅ Correct frontend origins for CORS
     allowed_origins = [
@@ -39,12 +42,30 @@ def create_app():
         supports_credentials=True
     )
 
+    # ✅ Fail the deploy, not every sync job, when the async pipeline can't run
+    if Config.SYNC_PIPELINE == 'async':
+        from services.async_sync import missing_dependencies
+        missing = missing_dependencies()
+        if missing:
+            raise RuntimeError(
+                f"SYNC_PIPELINE=async needs {', '.join(missing)}: pip install -r requirements-async.txt"
+            )
+
+    # ✅ Connect, build indexes and warm the pool before the first request
+    if Config.MONGO_CONNECT_ON_STARTUP:
+        db.startup()
+
+    # ✅ Stage timings, Server-Timing header and sampled profiles
+    instrumentation.init_app(app)
+
     # ✅ Register blueprints
     from routes.auth import auth_bp
     from routes.emails import emails_bp
+    from routes.sync import sync_bp
 
     app.register_blueprint(auth_bp, url_prefix='/api/auth')
     app.register_blueprint(emails_bp, url_prefix='/api')
+    app.register_blueprint(sync_bp, url_prefix='/api')
 
     # ✅ Health and root routes
     @app.route('/')
@@ -57,7 +78,34 @@ def create_app():
 
     @app.route('/api/health')
     def health():
-        return {'status': 'healthy', 'database': 'connected'}
+        from services.client_pool import gmail_client_pool
+        from services.rate_limiter import gmail_rate_limiter
+        from services.credentials_manager import credentials_manager
+        from services.response_cache import response_cache, data_versions
+        database = db.health()
+        return {
+            'status': 'healthy' if database['connected'] else 'degraded',
+            'database': database,
+            'gmail_client_pool': gmail_client_pool.stats(),
+            'gmail_rate_limiter': gmail_rate_limiter.stats(),
+            'credentials': credentials_manager.stats(),
+            'response_cache': dict(response_cache.stats(), versions=data_versions.stats())
+        }, 200 if database['connected'] else 503
+
+    @app.route('/api/metrics')
+    def metrics():
+        from services.client_pool import gmail_client_pool
+        from services.rate_limiter import gmail_rate_limiter
+        from services.credentials_manager import credentials_manager
+        from services.response_cache import response_cache
+        body = instrumentation.render_metrics({
+            'mongo_pool': db.pool_monitor.snapshot(),
+            'gmail_client_pool': gmail_client_pool.stats(),
+            'gmail_rate_limiter': gmail_rate_limiter.stats(),
+            'credentials': credentials_manager.stats(),
+            'response_cache': response_cache.stats()
+        })
+        return body, 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
 
     # ✅ CORS headers for OPTIONS preflight requests
     @app.after_request
@@ -0,0 +1,65 @@
+"""Classifier throughput on a synthetic corpus.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_classifier --emails 10000
+"""
+import argparse
+import random
+import time
+
+from services.classifier import EmailClassifier
+
+FILLER = (
+    'the team reviewed our roadmap and hiring plans for next quarter please find attached '
+    'the schedule for the onsite day regards talent acquisition data engineer platform '
+    'offered others benefits remote hybrid salary equity location manager recruiter'
+).split()
+
+
+def make_corpus(size, seed=1):
+    """Synthetic (subject, body) pairs, from short notes to newsletter-sized HTML"""
+    classifier = EmailClassifier()
+    keywords = (classifier.rejection_keywords + classifier.selection_keywords +
+                classifier.pending_keywords)
+    rng = random.Random(seed)
+    corpus = []
+
+    for _ in range(size):
+        words = [rng.choice(FILLER) for _ in range(rng.choice([40, 200, 1000, 4000]))]
+        for _ in range(rng.randint(0, 4)):
+            words.insert(rng.randrange(len(words)), rng.choice(keywords))
+        body = ' '.join(words)
+        if rng.random() < 0.3:
+            body = f'<html><body><p>{body}</p></body></html>'
+        corpus.append((f'Update on your application #{rng.randint(1, 9999)}', body))
+
+    return corpus
+
+
+def measure(label, classifier, corpus, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for subject, body in corpus:
+            classifier.classify(subject, body)
+        best = min(best, time.perf_counter() - start)
+    print(f"{label:<16} {len(corpus) / best:10,.0f} emails/s  ({best:.3f}s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--emails', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    corpus = make_corpus(args.emails)
+    size_kb = sum(len(s) + len(b) for s, b in corpus) / 1024
+    print(f"{len(corpus)} emails, {size_kb:,.0f} KB of text")
+
+    measure('substring scan', EmailClassifier(word_boundaries=False), corpus, args.repeat)
+    measure('word index', EmailClassifier(word_boundaries=True), corpus, args.repeat)
+
+
+if __name__ == '__main__':
+    main()
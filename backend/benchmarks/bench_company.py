@@ -0,0 +1,110 @@
+"""Company resolution over a corpus of senders: old extract_company vs the resolver.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_company --senders 100000 --unique 8000
+"""
+import argparse
+import random
+import time
+
+from services.company import CompanyResolver, resolve_companies
+
+COMPANIES = ['Acme', 'Globex', 'Initech', 'Hooli', 'Umbrella', 'Stark Industries', 'Wayne Enterprises',
+             'Cyberdyne', 'Soylent', 'Vandelay', 'Pied Piper', 'Wonka', 'Tyrell', 'Aperture']
+ATS = [
+    ('Greenhouse', 'no-reply@us.greenhouse-mail.io'),
+    ('Lever', 'no-reply@hire.lever.co'),
+    ('{company} Hiring Team', 'no-reply@greenhouse.io'),
+    ('Workday', '{slug}@myworkday.com'),
+    ('{company} via Ashby', 'notifications@ashbyhq.com'),
+]
+FREEMAIL = ['gmail.com', 'yahoo.com', 'outlook.com', 'hotmail.com']
+
+
+def legacy_extract_company(sender):
+    """services.company.extract_company before the resolver"""
+    if '<' in sender and '>' in sender:
+        company_name = sender.split('<')[0].strip()
+        if company_name and not '@' in company_name:
+            return company_name
+
+        email = sender.split('<')[1].split('>')[0]
+        domain = email.split('@')[1] if '@' in email else ''
+        company = domain.split('.')[0] if domain else 'Unknown'
+
+        if company.lower() in ['gmail', 'yahoo', 'outlook', 'hotmail', 'mail']:
+            return 'Unknown'
+
+        return company.capitalize()
+
+    if '@' in sender:
+        domain = sender.split('@')[1].split('.')[0]
+        if domain.lower() not in ['gmail', 'yahoo', 'outlook', 'hotmail', 'mail']:
+            return domain.capitalize()
+
+    return 'Unknown'
+
+
+def make_corpus(count, unique, seed=1):
+    """(sender, subject, true company) triples; sender popularity is Zipf-like"""
+    rng = random.Random(seed)
+    distinct = []
+    for i in range(unique):
+        company = rng.choice(COMPANIES)
+        slug = company.lower().replace(' ', '')
+        subject = f'Thank you for applying to {company}'
+        kind = rng.random()
+        if kind < 0.25:
+            name, address = rng.choice(ATS)
+            sender = f"{name.format(company=company)} <{address.format(slug=slug)}>"
+        elif kind < 0.55:
+            sender = f"{company} <recruiter{i}@{slug}.com>"
+        elif kind < 0.8:
+            sender = f"talent{i}@careers.{slug}.com"
+            company = slug.capitalize()
+        else:
+            sender = f"Recruiter {i} <person{i}@{rng.choice(FREEMAIL)}>"
+            company = f"Recruiter {i}"
+        distinct.append((sender, subject, company))
+
+    weights = [1 / (rank + 1) for rank in range(unique)]
+    return rng.choices(distinct, weights=weights, k=count)
+
+
+def timed(label, func, corpus):
+    start = time.perf_counter()
+    results = func()
+    elapsed = time.perf_counter() - start
+    correct = sum(1 for got, (_, _, want) in zip(results, corpus) if got == want)
+    print(f"{label:<30} {elapsed * 1000:8.1f} ms  {len(corpus) / elapsed:11,.0f} senders/s  "
+          f"{correct / len(corpus):6.1%} correct")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--senders', type=int, default=100000)
+    parser.add_argument('--unique', type=int, default=8000)
+    args = parser.parse_args()
+
+    corpus = make_corpus(args.senders, args.unique)
+    print(f"{len(corpus)} senders, {len({s for s, _, _ in corpus})} distinct\n")
+
+    timed('before (extract_company)', lambda: [legacy_extract_company(s) for s, _, _ in corpus], corpus)
+
+    resolver = CompanyResolver()
+    timed('resolver, cold memo', lambda: [resolver.resolve(s, subj) for s, subj, _ in corpus], corpus)
+    timed('resolver, warm memo', lambda: [resolver.resolve(s, subj) for s, subj, _ in corpus], corpus)
+    print(f"{'':<30} memo {resolver.stats()}")
+
+    # A sync chunk after the user's senders were persisted: no resolving at all
+    messages = [{'id': str(i), 'from': s, 'subject': subj} for i, (s, subj, _) in enumerate(corpus)]
+    _, known = resolve_companies(messages, {})
+    resolved = timed('resolve_companies, persisted',
+                     lambda: list(resolve_companies(messages, known)[0].values()), corpus)
+    assert len(resolved) == len(corpus)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,357 @@
+"""End-to-end latency, throughput and memory of the sync and read paths.
+
+Serves a synthetic mailbox from the fake Gmail server and drives
+GmailService, EmailClassifier, a full sync, and /api/emails, /api/stats
+and refresh through the Flask test client. MongoDB is mongomock by
+default (pip install mongomock), or a scratch database on MONGODB_URI
+with --mongo real. Results are written as JSON; with --baseline they are
+compared against an earlier run and the exit status is 1 on a regression.
+
+Each scenario's peak RSS is its own: on Linux the kernel's high-water
+mark is reset before the scenario starts. Elsewhere only the
+process-wide peak is reported.
+Run from the backend directory:
+
+    python -m benchmarks.bench_e2e --messages 500 --output baseline.json
+    python -m benchmarks.bench_e2e --messages 500 --baseline baseline.json
+"""
+import argparse
+import contextlib
+import json
+import math
+import platform
+import sys
+import time
+from datetime import datetime
+
+from config import Config
+from benchmarks.fake_gmail import FakeGmailServer, FakeMailbox, MIME_SHAPES
+
+FAKE_CREDENTIALS = {'token': 'fake-access-token'}
+COLLECTIONS = ('emails', 'users', 'user_stats', 'sync_jobs', 'sender_companies', 'user_versions')
+# Metric -> 1 if higher is worse, -1 if lower is worse
+COMPARED_METRICS = {'p50_ms': 1, 'p95_ms': 1, 'items_per_s': -1, 'peak_rss_mb': 1}
+
+try:
+    import resource
+except ImportError:
+    resource = None  # Windows
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far, None where unsupported"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def reset_peak_rss():
+    """Restart the peak RSS count from the current RSS; False where unsupported"""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def scenario_peak_rss_mb():
+    """Peak RSS since reset_peak_rss, from /proc/self/status"""
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('VmHWM:'):
+                return round(int(line.split()[1]) / 1024, 1)
+    return None
+
+
+def percentile(values, q):
+    """Linearly interpolated percentile of sorted values"""
+    k = (len(values) - 1) * q
+    low = math.floor(k)
+    high = min(low + 1, len(values) - 1)
+    return values[low] + (values[high] - values[low]) * (k - low)
+
+
+def summarize(samples, items):
+    samples = sorted(samples)
+    total = sum(samples)
+    return {
+        'runs': len(samples),
+        'p50_ms': round(percentile(samples, 0.5) * 1000, 3),
+        'p95_ms': round(percentile(samples, 0.95) * 1000, 3),
+        'mean_ms': round(total / len(samples) * 1000, 3),
+        'max_ms': round(samples[-1] * 1000, 3),
+        'ops_per_s': round(len(samples) / total, 2) if total else None,
+        'items_per_s': round(len(samples) * items / total, 1) if total else None,
+        'peak_rss_mb': None
+    }
+
+
+class Runner:
+    """Times scenarios and collects their summaries"""
+
+    def __init__(self, warmup):
+        self.warmup = warmup
+        self.scenarios = {}
+
+    def measure(self, name, func, runs, items=1, before=None):
+        """Call func runs times after warmup calls; before() runs untimed ahead of each call"""
+        tracks_rss = reset_peak_rss()
+        for _ in range(self.warmup):
+            if before:
+                before()
+            func()
+
+        samples = []
+        for _ in range(runs):
+            if before:
+                before()
+            start = time.perf_counter()
+            func()
+            samples.append(time.perf_counter() - start)
+
+        summary = summarize(samples, items)
+        summary['peak_rss_mb'] = scenario_peak_rss_mb() if tracks_rss else None
+        self.scenarios[name] = summary
+        print(f"{name:<18} p50 {summary['p50_ms']:9.2f} ms  p95 {summary['p95_ms']:9.2f} ms  "
+              f"{summary['items_per_s'] or 0:10,.1f} items/s  peak RSS {summary['peak_rss_mb']} MB")
+        return summary
+
+
+def connect_mongo(kind, db_name):
+    """Point the shared database at mongomock or a dropped scratch database"""
+    Config.MONGODB_DB_NAME = db_name
+    from database import db
+
+    if kind == 'mock':
+        try:
+            import mongomock
+        except ImportError:
+            raise SystemExit('--mongo mock needs mongomock (pip install mongomock)')
+        # Skip startup(): mongomock has no pool or topology to warm
+        Config.MONGO_CONNECT_ON_STARTUP = False
+        db._client = mongomock.MongoClient()
+        db._db = db._client[db_name]
+    elif db.emails is None:
+        raise SystemExit('MongoDB is not reachable')
+    reset_collections(db)
+    return db
+
+
+def reset_collections(db):
+    for name in COLLECTIONS:
+        db._db.drop_collection(name)
+
+
+def expect(response, status):
+    if response.status_code != status:
+        raise RuntimeError(f"{response.request.path} answered {response.status_code}, expected {status}")
+    return response
+
+
+def stage_totals():
+    from services.instrumentation import stage_seconds
+    return {
+        labels[0]: {'count': count, 'total_ms': round(seconds * 1000, 3)}
+        for labels, (seconds, count) in sorted(stage_seconds.totals().items())
+    }
+
+
+def run_benchmarks(args, server):
+    from bson import ObjectId
+    from database import db
+    from services.gmail_service import GmailService
+    from services.classifier import EmailClassifier
+    from services.sync_service import run_sync
+    from services.sync_worker import sync_worker
+    from services.response_cache import data_versions
+    from app import create_app
+
+    runner = Runner(args.warmup)
+    messages = args.messages
+
+    # --- Gmail fetch and classification ---
+    gmail = GmailService(FAKE_CREDENTIALS, api_endpoint=server.url)
+    emails = gmail.fetch_job_emails(max_results=messages)
+    runner.measure('gmail.fetch', lambda: gmail.fetch_job_emails(max_results=messages),
+                   args.sync_runs, items=messages)
+    gmail.close()
+
+    classifier = EmailClassifier()
+    corpus = [(e['subject'], e['snippet']) for e in emails]
+
+    def classify_all():
+        for subject, body in corpus:
+            classifier.classify(subject, body)
+
+    runner.measure('classifier', classify_all, args.runs, items=len(corpus))
+
+    # --- Full sync, from an empty database each time ---
+    runner.measure('sync.full', lambda: run_sync(FAKE_CREDENTIALS), args.sync_runs, items=messages,
+                   before=lambda: reset_collections(db))
+
+    # --- HTTP API through the test client ---
+    app = create_app()
+    app.config.update(SESSION_COOKIE_DOMAIN=None, SESSION_COOKIE_SECURE=False)
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['credentials'] = dict(FAKE_CREDENTIALS)
+
+    def refresh():
+        # The request hands the sync to the worker; time it until the job is done
+        job = expect(client.get('/api/emails?refresh=true'), 200).json['sync_job']
+        sync_worker.wait(ObjectId(job['id']), timeout=600)
+
+    runner.measure('api.refresh', refresh, args.sync_runs, items=messages)
+
+    user_email = server.mailbox.email_address
+    new_version = lambda: data_versions.bump(user_email)
+
+    def get(url, status=200, **kwargs):
+        return lambda: expect(client.get(url, **kwargs), status)
+
+    def etag(url):
+        return expect(client.get(url), 200).headers['ETag']
+
+    # Cold runs bump the data version first, so every request rebuilds its payload
+    runner.measure('api.emails', get('/api/emails'), args.runs, items=messages, before=new_version)
+    runner.measure('api.emails.cached', get('/api/emails'), args.runs, items=messages)
+    runner.measure('api.emails.304', get('/api/emails', 304, headers={'If-None-Match': etag('/api/emails')}),
+                   args.runs)
+    runner.measure('api.emails.page', get(f'/api/emails?limit={Config.EMAILS_PAGE_SIZE}'), args.runs,
+                   items=min(messages, Config.EMAILS_PAGE_SIZE), before=new_version)
+    runner.measure('api.stats', get('/api/stats'), args.runs, before=new_version)
+    runner.measure('api.stats.304', get('/api/stats', 304, headers={'If-None-Match': etag('/api/stats')}),
+                   args.runs)
+
+    return runner.scenarios
+
+
+def compare(results, baseline, tolerance, min_delta_ms, min_delta_mb):
+    """Scenario metrics that got worse than baseline by more than tolerance"""
+    if results['config'] != baseline.get('config'):
+        print(f"⚠️  Baseline was run with a different configuration: {baseline.get('config')}")
+
+    regressions = []
+    print(f"\n{'scenario':<18} {'metric':<12} {'baseline':>10} {'current':>10} {'change':>8}")
+    for name, current in results['scenarios'].items():
+        previous = baseline.get('scenarios', {}).get(name)
+        if previous is None:
+            print(f"{name:<18} (not in baseline)")
+            continue
+        for metric, direction in COMPARED_METRICS.items():
+            old, new = previous.get(metric), current.get(metric)
+            if old is None or new is None:
+                continue
+            change = (new - old) / old if old else 0.0
+            worse = change * direction > tolerance
+            # Absolute floors keep timer and allocator noise on tiny values out
+            if metric.endswith('_ms'):
+                worse = worse and new - old > min_delta_ms
+            elif metric == 'peak_rss_mb':
+                worse = worse and new - old > min_delta_mb
+            print(f"{name:<18} {metric:<12} {old:10.2f} {new:10.2f} {change:+8.1%}{'  ❌' if worse else ''}")
+            if worse:
+                regressions.append({'scenario': name, 'metric': metric, 'baseline': old,
+                                    'current': new, 'change': round(change, 4)})
+
+    old_rss, new_rss = baseline.get('peak_rss_mb'), results['peak_rss_mb']
+    if old_rss and new_rss and (new_rss - old_rss) / old_rss > tolerance and new_rss - old_rss > min_delta_mb:
+        print(f"peak RSS {old_rss} MB -> {new_rss} MB  ❌")
+        regressions.append({'scenario': 'process', 'metric': 'peak_rss_mb', 'baseline': old_rss,
+                            'current': new_rss, 'change': round((new_rss - old_rss) / old_rss, 4)})
+    return regressions
+
+
+def run(args, shapes):
+    Config.GMAIL_RETRY_BASE_DELAY = 0.05
+    Config.GMAIL_RATE_LIMIT = False
+    Config.SYNC_MAX_MESSAGES = args.messages
+    connect_mongo(args.mongo, args.db)
+
+    mailbox = FakeMailbox(size=args.messages, body_repeat=args.body_repeat, shapes=shapes)
+    with FakeGmailServer(mailbox, latency=args.latency, jitter=args.jitter, retry_after=0) as server:
+        Config.GMAIL_API_ENDPOINT = server.url
+        print(f"{args.messages} messages ({', '.join(shapes)}), {args.latency * 1000:.0f} ms RTT, "
+            f"{args.mongo} MongoDB")
+        scenarios = run_benchmarks(args, server)
+
+    results = {
+        'benchmark': 'e2e',
+        'created_at': datetime.utcnow().isoformat(),
+        'python': platform.python_version(),
+        'config': {
+            'messages': args.messages,
+            'latency': args.latency,
+            'jitter': args.jitter,
+            'shapes': list(shapes),
+            'body_repeat': args.body_repeat,
+            'mongo': args.mongo,
+            'batch_size': Config.GMAIL_BATCH_SIZE,
+            'tiered_fetch': Config.GMAIL_TIERED_FETCH,
+            'sync_pipeline': Config.SYNC_PIPELINE
+        },
+        'scenarios': scenarios,
+        'stages': stage_totals(),
+        'peak_rss_mb': peak_rss_mb()
+    }
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance, args.min_delta_ms, args.min_delta_mb)
+        results['regressions'] = regressions
+        print(f"\n{len(regressions)} regression(s) beyond {args.tolerance:.0%}" if regressions
+            else f"\nNo regressions beyond {args.tolerance:.0%}")
+
+    return results, regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--messages', type=int, default=500)
+    parser.add_argument('--latency', type=float, default=0.02, help='simulated RTT in seconds')
+    parser.add_argument('--jitter', type=float, default=0.0, help='extra random RTT, up to this many seconds')
+    parser.add_argument('--shapes', default=','.join(MIME_SHAPES),
+                        help=f"comma-separated MIME shapes to mix ({', '.join(MIME_SHAPES)})")
+    parser.add_argument('--body-repeat', type=int, default=20, help='sentences per synthetic body')
+    parser.add_argument('--runs', type=int, default=50, help='timed runs per read scenario')
+    parser.add_argument('--sync-runs', type=int, default=3, help='timed runs per fetch/sync scenario')
+    parser.add_argument('--warmup', type=int, default=1)
+    parser.add_argument('--mongo', choices=('mock', 'real'), default='mock')
+    parser.add_argument('--db', default='jobmail_bench', help='scratch database name')
+    parser.add_argument('--output', help="write JSON results here ('-' for stdout)")
+    parser.add_argument('--baseline', help='JSON results of an earlier run to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed regression, 0.2 = 20%%')
+    parser.add_argument('--min-delta-ms', type=float, default=1.0,
+                        help='ignore slowdowns smaller than this, whatever the ratio')
+    parser.add_argument('--min-delta-mb', type=float, default=5.0,
+                        help='ignore peak RSS growth smaller than this, whatever the ratio')
+    args = parser.parse_args()
+
+    shapes = tuple(s.strip() for s in args.shapes.split(',') if s.strip())
+    unknown = set(shapes) - set(MIME_SHAPES)
+    if unknown:
+        parser.error(f"unknown shapes: {', '.join(sorted(unknown))}")
+
+    # With JSON on stdout, progress and the app's own logging go to stderr
+    stdout = sys.stdout
+    with contextlib.redirect_stdout(sys.stderr if args.output == '-' else stdout):
+        results, regressions = run(args, shapes)
+
+    if args.output == '-':
+        stdout.write(json.dumps(results, indent=2) + '\n')
+    elif args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,146 @@
+"""Email model memory and serialization throughput, before and after slots.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_email_model --emails 100000
+"""
+import argparse
+import gc
+import random
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+from models.email import Email
+
+STATUSES = ['Rejection', 'Selection', 'Pending']
+
+
+class LegacyEmail:
+    """models/email.py before slots, enum status and the cached date format.
+
+    Carries the same fields as Email, so to_dict compares like with like.
+    """
+
+    def __init__(self, user_email, gmail_id, subject, sender, company, status, date, snippet,
+                 fetch_tier=None, bytes_saved=0):
+        self.user_email = user_email
+        self.gmail_id = gmail_id
+        self.subject = subject
+        self.sender = sender
+        self.company = company
+        self.status = status
+        self.date = date
+        self.snippet = snippet
+        self.fetch_tier = fetch_tier
+        self.bytes_saved = bytes_saved
+        self.created_at = datetime.utcnow()
+
+    def to_dict(self):
+        return {
+            'user_email': self.user_email,
+            'gmail_id': self.gmail_id,
+            'subject': self.subject,
+            'sender': self.sender,
+            'company': self.company,
+            'status': self.status,
+            'date': self.date,
+            'snippet': self.snippet,
+            'fetch_tier': self.fetch_tier,
+            'bytes_saved': self.bytes_saved,
+            'created_at': self.created_at
+        }
+
+    @staticmethod
+    def from_dict(data):
+        return {
+            'id': str(data.get('_id')),
+            'gmail_id': data.get('gmail_id'),
+            'subject': data.get('subject'),
+            'sender': data.get('sender'),
+            'company': data.get('company'),
+            'status': data.get('status'),
+            'date': data.get('date').strftime('%Y-%m-%d') if isinstance(data.get('date'), datetime) else data.get('date'),
+            'snippet': data.get('snippet'),
+            'read': data.get('read', False)
+        }
+
+
+def make_docs(size, seed=1):
+    """Mongo-shaped email documents spread over two years of day-precision dates"""
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1)
+    return [{
+        '_id': ObjectId(),
+        'user_email': 'bench@example.com',
+        'gmail_id': f'{i:016x}',
+        'subject': f'Update on your application #{i}',
+        'sender': f'Careers <jobs@company{rng.randrange(500)}.com>',
+        'company': f'Company{rng.randrange(500)}',
+        'status': rng.choice(STATUSES),
+        'date': start + timedelta(days=rng.randrange(730)),
+        'snippet': 'thank you for applying ' * rng.randint(1, 20),
+        'read': rng.random() < 0.5
+    } for i in range(size)]
+
+
+def build(cls, docs):
+    return [cls(d['user_email'], d['gmail_id'], d['subject'], d['sender'], d['company'],
+                d['status'], d['date'], d['snippet']) for d in docs]
+
+
+def memory_per_email(cls, docs):
+    """Bytes allocated per instance, excluding the field values shared with docs"""
+    gc.collect()
+    tracemalloc.start()
+    objects = build(cls, docs)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del objects
+    return size / len(docs)
+
+
+def throughput(label, func, size, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    print(f"{label:<30} {size / best:12,.0f} emails/s  ({best:.3f}s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--emails', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    docs = make_docs(args.emails)
+    print(f"{len(docs)} documents")
+
+    legacy_mem = memory_per_email(LegacyEmail, docs)
+    slotted_mem = memory_per_email(Email, docs)
+    print(f"\nMemory per {args.emails:,} emails")
+    print(f"{'before (dict attributes)':<30} {legacy_mem * args.emails / 2**20:10.1f} MiB  ({legacy_mem:.0f} B/email)")
+    print(f"{'after (slots)':<30} {slotted_mem * args.emails / 2**20:10.1f} MiB  ({slotted_mem:.0f} B/email)")
+
+    legacy_objects = build(LegacyEmail, docs)
+    objects = build(Email, docs)
+
+    print("\nto_dict")
+    throughput('before', lambda: [e.to_dict() for e in legacy_objects], len(docs), args.repeat)
+    throughput('after', lambda: [e.to_dict() for e in objects], len(docs), args.repeat)
+
+    print("\nfrom_dict (documents -> API rows)")
+    throughput('before', lambda: [LegacyEmail.from_dict(d) for d in docs], len(docs), args.repeat)
+    throughput('after, per row', lambda: [Email.from_dict(d) for d in docs], len(docs), args.repeat)
+    throughput('after, from_dicts', lambda: Email.from_dicts(docs), len(docs), args.repeat)
+
+    assert Email.from_dicts(docs) == [LegacyEmail.from_dict(d) for d in docs]
+    assert objects[0].to_dict().keys() == legacy_objects[0].to_dict().keys()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+"""Body extraction cost on newsletter-sized messages, before and after the byte budget.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_mime --messages 500 --body-kb 200
+"""
+import argparse
+import base64
+import random
+import time
+import tracemalloc
+
+from services.mime import MimeParser, extract_body
+
+WORDS = (
+    'thank you for applying to the platform engineer role our team will review your '
+    'application and get back to you unsubscribe view in browser weekly digest jobs'
+).split()
+
+
+def legacy_get_body(payload):
+    """GmailService._get_body before the MIME stage: whole first text/plain part"""
+    if 'body' in payload and 'data' in payload['body']:
+        return base64.urlsafe_b64decode(payload['body']['data']).decode('utf-8', errors='ignore')
+
+    if 'parts' in payload:
+        for part in payload['parts']:
+            if part['mimeType'] == 'text/plain':
+                if 'data' in part['body']:
+                    return base64.urlsafe_b64decode(part['body']['data']).decode('utf-8', errors='ignore')
+            elif 'parts' in part:
+                body = legacy_get_body(part)
+                if body:
+                    return body
+
+    return ''
+
+
+def _b64(text):
+    return base64.urlsafe_b64encode(text.encode('utf-8')).decode('ascii')
+
+
+def make_messages(count, body_kb, seed=1):
+    """Half multipart/alternative with a PDF attachment, half HTML-only"""
+    rng = random.Random(seed)
+    messages = []
+    for i in range(count):
+        words = []
+        while len(words) * 6 < body_kb * 1024:
+            words.append(rng.choice(WORDS))
+        text = ' '.join(words)
+        markup = ('<html><head><style>p{margin:0}</style></head><body><table><tr><td>'
+                  + '</p><p>'.join(text[n:n + 400] for n in range(0, len(text), 400))
+                  + '</td></tr></table></body></html>')
+        headers = [{'name': 'Subject', 'value': f'Weekly digest #{i}'}]
+
+        if i % 2:
+            payload = {'mimeType': 'text/html', 'headers': headers, 'body': {'data': _b64(markup)}}
+        else:
+            payload = {'mimeType': 'multipart/mixed', 'headers': headers, 'body': {'size': 0}, 'parts': [
+                {'mimeType': 'multipart/alternative', 'body': {'size': 0}, 'parts': [
+                    {'mimeType': 'text/plain', 'body': {'data': _b64(text)}},
+                    {'mimeType': 'text/html', 'body': {'data': _b64(markup)}}
+                ]},
+                {'mimeType': 'application/pdf', 'filename': 'offer.pdf', 'body': {'attachmentId': 'a1'}}
+            ]}
+        messages.append({'id': f'{i:016x}', 'payload': payload})
+    return messages
+
+
+def measure(label, func, messages):
+    start = time.perf_counter()
+    results = func(messages)
+    elapsed = time.perf_counter() - start
+
+    # Separate run for memory; tracemalloc slows down the timed one
+    tracemalloc.start()
+    func(messages)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    kept = sum(len(r['snippet'] if isinstance(r, dict) else r) for r in results) / len(messages)
+    print(f"{label:<26} {len(messages) / elapsed:9,.0f} msgs/s  peak {peak / 2**20:7.1f} MiB"
+          f"  {kept / 1024:7.1f} KB text/msg")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--messages', type=int, default=500)
+    parser.add_argument('--body-kb', type=int, default=200)
+    parser.add_argument('--processes', type=int, default=4)
+    args = parser.parse_args()
+
+    messages = make_messages(args.messages, args.body_kb)
+    print(f"{len(messages)} messages, ~{args.body_kb} KB body each (half HTML-only)\n")
+
+    measure('before (_get_body)', lambda ms: [legacy_get_body(m['payload']) for m in ms], messages)
+    measure('after (extract_body)', lambda ms: [extract_body(m['payload']) for m in ms], messages)
+
+    inline = MimeParser(processes=0)
+    pooled = MimeParser(processes=args.processes, threshold=1)
+    pooled.parse_many(messages[:args.processes])  # start the workers outside the timing
+    measure('parse_many, inline', inline.parse_many, messages)
+    measure(f'parse_many, {args.processes} processes', pooled.parse_many, messages)
+    pooled.close()
+
+
+if __name__ == '__main__':
+    main()
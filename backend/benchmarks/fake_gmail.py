@@ -0,0 +1,366 @@
+"""Local fake of the Gmail REST API used by the benchmarks.
+
+Serves a synthetic mailbox over plain HTTP so GmailService can be pointed
+at it with ``api_endpoint``. Supports profile, messages.list,
+messages.get (full and metadata formats), history.list and multipart
+batch requests, with injectable latency, jitter and throttling.
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from email.parser import BytesParser
+from email.utils import format_datetime
+from datetime import datetime, timedelta, timezone
+from urllib.parse import urlparse, parse_qs
+import base64
+import json
+import random
+import threading
+import time
+import uuid
+
+COMPANIES = ['Acme', 'Globex', 'Initech', 'Umbrella', 'Hooli', 'Stark', 'Wayne', 'Wonka']
+
+SUBJECTS = [
+    'Your application for Software Engineer',
+    'Interview invitation - Backend Developer',
+    'Update on your application',
+    'Congratulations! Offer for Data Analyst role',
+    'Thank you for applying to the Frontend position',
+]
+
+BODIES = [
+    'Unfortunately we have decided to move forward with other candidates.',
+    'We are pleased to invite you to the next round of interviews.',
+    'We have received your application and are currently reviewing it.',
+    'Congratulations, we would like to extend an offer to you.',
+    'Thank you for your interest. Your application is under review.',
+]
+
+
+# MIME layouts a synthetic message can have
+MIME_SHAPES = ('alternative', 'plain', 'html', 'mixed', 'related')
+
+
+def _b64(text):
+    return base64.urlsafe_b64encode(text.encode('utf-8')).decode('ascii')
+
+
+def _text_part(mime_type, text):
+    return {'mimeType': mime_type, 'body': {'size': len(text), 'data': _b64(text)}}
+
+
+def _payload(shape, body, headers, message_id):
+    """Gmail payload for body laid out as shape (see MIME_SHAPES)"""
+    html = f'<p>{body}</p>'
+    alternative = {
+        'mimeType': 'multipart/alternative',
+        'body': {'size': 0},
+        'parts': [_text_part('text/plain', body), _text_part('text/html', html)],
+    }
+    if shape == 'plain':
+        return dict(_text_part('text/plain', body), headers=headers)
+    if shape == 'html':
+        return dict(_text_part('text/html', html), headers=headers)
+    if shape == 'mixed':
+        # Body plus a PDF attachment Gmail only references by id
+        attachment = {
+            'mimeType': 'application/pdf',
+            'filename': 'offer.pdf',
+            'body': {'size': 48213, 'attachmentId': f'att-{message_id}'},
+        }
+        return {'mimeType': 'multipart/mixed', 'headers': headers, 'body': {'size': 0},
+                'parts': [alternative, attachment]}
+    if shape == 'related':
+        # HTML newsletter with an inline image, no text/plain alternative
+        image = {'mimeType': 'image/png', 'filename': 'logo.png',
+                 'body': {'size': 5120, 'attachmentId': f'img-{message_id}'}}
+        return {'mimeType': 'multipart/related', 'headers': headers, 'body': {'size': 0},
+                'parts': [_text_part('text/html', f'<html><body>{html * 3}</body></html>'), image]}
+    return dict(alternative, headers=headers)
+
+
+class FakeMailbox:
+    """Deterministic synthetic mailbox of job emails.
+
+    shapes: MIME layouts (MIME_SHAPES) the messages cycle through at
+    random; the default multipart/alternative matches what most ATS mail
+    looks like.
+    """
+
+    def __init__(self, size=100, body_repeat=20, seed=42, email_address='bench@example.com',
+                 shapes=('alternative',)):
+        rng = random.Random(seed)
+        # Separate stream, so adding shapes doesn't change the messages themselves
+        shape_rng = random.Random(seed + 1)
+        now = datetime(2024, 6, 1, tzinfo=timezone.utc)
+        self.email_address = email_address
+        self.messages = {}
+        self.order = []
+
+        for i in range(size):
+            company = rng.choice(COMPANIES)
+            message_id = f'{i:016x}'
+            body = ' '.join([rng.choice(BODIES)] * body_repeat)
+            date = now - timedelta(hours=i * 3)
+            headers = [
+                {'name': 'Subject', 'value': rng.choice(SUBJECTS)},
+                {'name': 'From', 'value': f'{company} Careers <jobs@{company.lower()}.com>'},
+                {'name': 'Date', 'value': format_datetime(date)},
+            ]
+            self.messages[message_id] = {
+                'id': message_id,
+                'threadId': message_id,
+                'labelIds': ['INBOX'],
+                'snippet': body[:200],
+                'historyId': str(1000 + i),
+                'internalDate': str(int(date.timestamp() * 1000)),
+                'payload': _payload(shape_rng.choice(shapes), body, headers, message_id),
+            }
+            self._set_size_estimate(message_id)
+            self.order.append(message_id)
+
+        self.history_id = 1000 + size
+        # history.list answers 404 for cursors older than this, like Gmail does
+        self.min_history_id = 1000
+
+    def add_message(self, subject, sender, body):
+        """Deliver a new message at the top of the mailbox"""
+        self.history_id += 1
+        message_id = f'{self.history_id:016x}'
+        date = datetime.now(timezone.utc)
+        self.messages[message_id] = {
+            'id': message_id,
+            'threadId': message_id,
+            'labelIds': ['INBOX'],
+            'snippet': body[:200],
+            'historyId': str(self.history_id),
+            'internalDate': str(int(date.timestamp() * 1000)),
+            'payload': {
+                'mimeType': 'text/plain',
+                'headers': [
+                    {'name': 'Subject', 'value': subject},
+                    {'name': 'From', 'value': sender},
+                    {'name': 'Date', 'value': format_datetime(date)},
+                ],
+                'body': {'size': len(body), 'data': _b64(body)},
+            },
+        }
+        self._set_size_estimate(message_id)
+        self.order.insert(0, message_id)
+        return message_id
+
+    def _set_size_estimate(self, message_id):
+        message = self.messages[message_id]
+        message['sizeEstimate'] = len(json.dumps(message['payload']))
+
+
+class FakeGmailServer:
+    """Threaded HTTP server speaking enough of the Gmail API for benchmarks.
+
+    latency: seconds slept per HTTP round trip (simulated network RTT).
+    jitter: up to this many extra seconds added to each round trip.
+    item_latency: seconds of server work per message inside a batch.
+    throttle_rate: probability that a message get answers 429 once.
+    """
+
+    def __init__(self, mailbox=None, latency=0.05, item_latency=0.001,
+                 throttle_rate=0.0, retry_after=1, seed=7, jitter=0.0):
+        self.mailbox = mailbox or FakeMailbox()
+        self.latency = latency
+        self.jitter = jitter
+        self.item_latency = item_latency
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.stats = {'http_requests': 0, 'batch_requests': 0, 'message_gets': 0, 'throttled': 0,
+                      'message_bytes': 0}
+        self._rng = random.Random(seed)
+        self._throttled_once = set()
+        self._lock = threading.Lock()
+        self._httpd = None
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address[:2]
+        return f'http://{host}:{port}/'
+
+    def start(self):
+        self._httpd = ThreadingHTTPServer(('127.0.0.1', 0), _make_handler(self))
+        self._httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._httpd:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def reset_stats(self):
+        with self._lock:
+            for key in self.stats:
+                self.stats[key] = 0
+            self._throttled_once.clear()
+
+    def round_trip_delay(self):
+        if not self.jitter:
+            return self.latency
+        with self._lock:
+            return self.latency + self._rng.uniform(0, self.jitter)
+
+    def _count(self, key, amount=1):
+        with self._lock:
+            self.stats[key] += amount
+
+    def _should_throttle(self, message_id):
+        if not self.throttle_rate:
+            return False
+        with self._lock:
+            if message_id in self._throttled_once or self._rng.random() >= self.throttle_rate:
+                return False
+            self._throttled_once.add(message_id)
+            self.stats['throttled'] += 1
+            return True
+
+    # --- API handlers: each returns (status, headers, body dict) ---
+
+    def handle_get(self, path, params):
+        parts = path.strip('/').split('/')
+        if parts[:3] != ['gmail', 'v1', 'users'] or len(parts) < 5:
+            return 404, {}, {'error': {'code': 404, 'message': 'Not Found'}}
+
+        resource = parts[4]
+        if resource == 'profile':
+            return 200, {}, {
+                'emailAddress': self.mailbox.email_address,
+                'messagesTotal': len(self.mailbox.order),
+                'threadsTotal': len(self.mailbox.order),
+                'historyId': str(self.mailbox.history_id),
+            }
+
+        if resource == 'history':
+            return self._list_history(params)
+
+        if resource == 'messages' and len(parts) == 5:
+            return 200, {}, self._list_messages(params)
+
+        if resource == 'messages' and len(parts) == 6:
+            return self._get_message(parts[5], params)
+
+        return 404, {}, {'error': {'code': 404, 'message': 'Not Found'}}
+
+    def _list_messages(self, params):
+        max_results = min(int(params.get('maxResults', ['100'])[0]), 500)
+        offset = int(params.get('pageToken', ['0'])[0] or 0)
+        ids = self.mailbox.order[offset:offset + max_results]
+        result = {
+            'messages': [{'id': i, 'threadId': i} for i in ids],
+            'resultSizeEstimate': len(self.mailbox.order),
+        }
+        if offset + max_results < len(self.mailbox.order):
+            result['nextPageToken'] = str(offset + max_results)
+        return result
+
+    def _list_history(self, params):
+        start = int(params.get('startHistoryId', ['0'])[0])
+        if start < self.mailbox.min_history_id:
+            return 404, {}, {'error': {'code': 404, 'message': 'Requested entity was not found.'}}
+        added = [m for m in self.mailbox.messages.values() if int(m['historyId']) > start]
+        added.sort(key=lambda m: int(m['historyId']))
+        return 200, {}, {
+            'history': [{'id': m['historyId'], 'messagesAdded': [{'message': {'id': m['id']}}]}
+                        for m in added],
+            'historyId': str(self.mailbox.history_id),
+        }
+
+    def _get_message(self, message_id, params):
+        self._count('message_gets')
+        message = self.mailbox.messages.get(message_id)
+        if message is None:
+            return 404, {}, {'error': {'code': 404, 'message': 'Requested entity was not found.'}}
+        if self._should_throttle(message_id):
+            return 429, {'Retry-After': str(self.retry_after)}, {
+                'error': {'code': 429, 'message': 'Too many concurrent requests for user',
+                          'errors': [{'reason': 'rateLimitExceeded'}]}}
+        if params.get('format', ['full'])[0] == 'metadata':
+            wanted = {name.lower() for name in params.get('metadataHeaders', [])}
+            headers = [h for h in message['payload']['headers'] if not wanted or h['name'].lower() in wanted]
+            message = dict(message, payload={'mimeType': message['payload']['mimeType'], 'headers': headers})
+        self._count('message_bytes', len(json.dumps(message)))
+        return 200, {}, message
+
+    def handle_batch(self, content_type, body):
+        self._count('batch_requests')
+        envelope = BytesParser().parsebytes(
+            b'Content-Type: ' + content_type.encode('ascii') + b'\r\n\r\n' + body)
+        boundary = f'batch_{uuid.uuid4().hex}'
+        chunks = []
+
+        for part in envelope.get_payload():
+            inner = part.get_payload()
+            request_line = inner.split('\n', 1)[0].strip()
+            method, target = request_line.split(' ')[:2]
+            parsed = urlparse(target)
+            if self.item_latency:
+                time.sleep(self.item_latency)
+            if method == 'GET':
+                status, headers, payload = self.handle_get(parsed.path, parse_qs(parsed.query))
+            else:
+                status, headers, payload = 405, {}, {'error': {'code': 405}}
+
+            extra = ''.join(f'{k}: {v}\r\n' for k, v in headers.items())
+            chunks.append(
+                f'--{boundary}\r\n'
+                f'Content-Type: application/http\r\n'
+                f'Content-ID: <response-{part["Content-ID"][1:-1]}>\r\n\r\n'
+                f'HTTP/1.1 {status} {"OK" if status == 200 else "Error"}\r\n'
+                f'Content-Type: application/json; charset=UTF-8\r\n{extra}\r\n'
+                f'{json.dumps(payload)}\r\n'
+            )
+
+        chunks.append(f'--{boundary}--\r\n')
+        return boundary, ''.join(chunks).encode('utf-8')
+
+
+def _make_handler(server):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, *args):
+            pass
+
+        def _send(self, status, headers, body, content_type='application/json; charset=UTF-8'):
+            if not isinstance(body, bytes):
+                body = json.dumps(body).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            for key, value in headers.items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            server._count('http_requests')
+            time.sleep(server.round_trip_delay())
+            parsed = urlparse(self.path)
+            status, headers, payload = server.handle_get(parsed.path, parse_qs(parsed.query))
+            self._send(status, headers, payload)
+
+        def do_POST(self):
+            server._count('http_requests')
+            time.sleep(server.round_trip_delay())
+            body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            if urlparse(self.path).path.rstrip('/') != '/batch/gmail/v1':
+                self._send(404, {}, {'error': {'code': 404}})
+                return
+            boundary, content = server.handle_batch(self.headers['Content-Type'], body)
+            self._send(200, {}, content, content_type=f'multipart/mixed; boundary={boundary}')
+
+    return Handler
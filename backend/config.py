@@ -13,3 +13,84 @@ class Config:
     MONGODB_URI = os.getenv("MONGODB_URI", "mongodb://localhost:27017/")
     MONGODB_DB_NAME = os.getenv("MONGODB_DB_NAME", "jobmail_insight")
     FRONTEND_URL = os.getenv("FRONTEND_URL", "http://localhost:3000")
+
+    # Gmail API
+    GMAIL_API_ENDPOINT = os.getenv("GMAIL_API_ENDPOINT")  # override for local fakes
+    GMAIL_BATCH_SIZE = int(os.getenv("GMAIL_BATCH_SIZE", "50"))  # <= 1 disables batching
+    GMAIL_MAX_RETRIES = int(os.getenv("GMAIL_MAX_RETRIES", "3"))
+    GMAIL_RETRY_BASE_DELAY = float(os.getenv("GMAIL_RETRY_BASE_DELAY", "1.0"))
+    # Fetch headers + snippet first and full bodies only for unsure classifications
+    GMAIL_TIERED_FETCH = os.getenv("GMAIL_TIERED_FETCH", "true").lower() == "true"
+    # Client-side quota, in Gmail quota units; the project rate is per process
+    GMAIL_RATE_LIMIT = os.getenv("GMAIL_RATE_LIMIT", "true").lower() == "true"
+    GMAIL_USER_QUOTA_RATE = float(os.getenv("GMAIL_USER_QUOTA_RATE", "250"))  # units/s per user
+    GMAIL_PROJECT_QUOTA_RATE = float(os.getenv("GMAIL_PROJECT_QUOTA_RATE", "20000"))  # units/s for all users
+    GMAIL_RATE_BURST_SECONDS = float(os.getenv("GMAIL_RATE_BURST_SECONDS", "1"))  # bucket size, in seconds of rate
+
+    # Sync
+    SYNC_MAX_MESSAGES = int(os.getenv("SYNC_MAX_MESSAGES", "2000"))  # cap per full sync
+    SYNC_TIME_BUDGET = float(os.getenv("SYNC_TIME_BUDGET", "300"))  # seconds, 0 = unlimited
+    SYNC_CHUNK_SIZE = int(os.getenv("SYNC_CHUNK_SIZE", "100"))  # messages stored per write round
+    SYNC_WORKERS = int(os.getenv("SYNC_WORKERS", "2"))  # background sync threads per process
+    SYNC_INLINE_WAIT = float(os.getenv("SYNC_INLINE_WAIT", "10"))  # seconds /api/emails waits for a first chunk
+    SYNC_POLL_INTERVAL = float(os.getenv("SYNC_POLL_INTERVAL", "0.25"))
+    SYNC_JOB_STALE_SECONDS = int(os.getenv("SYNC_JOB_STALE_SECONDS", "600"))  # requeue jobs with no heartbeat
+    SYNC_PIPELINE = os.getenv("SYNC_PIPELINE", "threaded")  # "async" = aiohttp + motor pipeline, needs requirements-async.txt
+    ASYNC_SYNC_CONCURRENCY = int(os.getenv("ASYNC_SYNC_CONCURRENCY", "8"))  # Gmail requests in flight per user
+    ASYNC_SYNC_QUEUE_SIZE = int(os.getenv("ASYNC_SYNC_QUEUE_SIZE", "200"))  # items buffered between stages
+
+    # MIME decoding
+    MIME_BODY_BUDGET = int(os.getenv("MIME_BODY_BUDGET", "8192"))  # bytes of body text kept per message
+    MIME_HTML_BUDGET_FACTOR = int(os.getenv("MIME_HTML_BUDGET_FACTOR", "4"))  # raw HTML decoded per byte of text
+    MIME_PROCESSES = int(os.getenv("MIME_PROCESSES", "0"))  # 0/1 = parse inline
+    MIME_PARALLEL_THRESHOLD = int(os.getenv("MIME_PARALLEL_THRESHOLD", "50"))  # messages per call before using the pool
+
+    # MongoDB pool
+    MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "50"))  # connections per process
+    MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "4"))  # opened at startup and kept warm
+    MONGO_MAX_IDLE_TIME_MS = int(os.getenv("MONGO_MAX_IDLE_TIME_MS", "300000"))
+    MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", "2000"))  # fail fast when the pool is exhausted
+    MONGO_READ_PREFERENCE = os.getenv("MONGO_READ_PREFERENCE", "primary")  # e.g. primaryPreferred, secondaryPreferred
+    MONGO_CONNECT_ON_STARTUP = os.getenv("MONGO_CONNECT_ON_STARTUP", "true").lower() == "true"
+
+    # MongoDB writes
+    MONGO_BULK_BATCH_SIZE = int(os.getenv("MONGO_BULK_BATCH_SIZE", "500"))  # operations per bulk_write
+
+    # Classifier
+    CLASSIFIER_WORD_BOUNDARIES = os.getenv("CLASSIFIER_WORD_BOUNDARIES", "true").lower() == "true"
+    CLASSIFIER_PROCESSES = int(os.getenv("CLASSIFIER_PROCESSES", str(os.cpu_count() or 1)))
+    CLASSIFIER_PARALLEL_THRESHOLD = int(os.getenv("CLASSIFIER_PARALLEL_THRESHOLD", "5000"))  # pairs before fanning out
+    CLASSIFIER_CHUNK_SIZE = int(os.getenv("CLASSIFIER_CHUNK_SIZE", "500"))
+    CLASSIFIER_MIN_MARGIN = int(os.getenv("CLASSIFIER_MIN_MARGIN", "1"))  # keyword lead that counts as confident
+
+    # Caches
+    IDENTITY_CACHE_SIZE = int(os.getenv("IDENTITY_CACHE_SIZE", "10000"))
+    IDENTITY_CACHE_TTL = int(os.getenv("IDENTITY_CACHE_TTL", "3600"))  # seconds
+    GMAIL_CLIENT_POOL_SIZE = int(os.getenv("GMAIL_CLIENT_POOL_SIZE", "200"))  # idle clients kept per process
+    GMAIL_CLIENT_POOL_TTL = int(os.getenv("GMAIL_CLIENT_POOL_TTL", "1800"))  # seconds
+    CREDENTIALS_CACHE_SIZE = int(os.getenv("CREDENTIALS_CACHE_SIZE", "10000"))  # refreshed access tokens kept per process
+    COMPANY_MEMO_SIZE = int(os.getenv("COMPANY_MEMO_SIZE", "50000"))  # senders memoized by the company resolver
+    COMPANY_INDEX_FILE = os.getenv("COMPANY_INDEX_FILE")  # JSON domain -> company index merged over the built-in rules
+
+    # Sessions
+    SESSION_BACKEND = os.getenv("SESSION_BACKEND", "mongo")  # "memory" is per process: single worker only
+    SESSION_CACHE_SIZE = int(os.getenv("SESSION_CACHE_SIZE", "10000"))  # entries kept by the memory backend
+    OAUTH_STATE_TTL = int(os.getenv("OAUTH_STATE_TTL", "600"))  # seconds a login has to come back
+
+    # API
+    EMAILS_PAGE_SIZE = int(os.getenv("EMAILS_PAGE_SIZE", "50"))
+    EMAILS_MAX_PAGE_SIZE = int(os.getenv("EMAILS_MAX_PAGE_SIZE", "500"))
+    EMAILS_STREAM_BATCH_SIZE = int(os.getenv("EMAILS_STREAM_BATCH_SIZE", "200"))  # cursor batch for NDJSON listings
+    RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "256"))  # serialized responses kept per process
+    RESPONSE_CACHE_TTL = int(os.getenv("RESPONSE_CACHE_TTL", "300"))  # seconds an unused response is kept
+    RESPONSE_VERSION_TTL = float(os.getenv("RESPONSE_VERSION_TTL", "2"))  # seconds a worker trusts its copy of a user's version
+
+    # Stats
+    STATS_TOP_COMPANIES = int(os.getenv("STATS_TOP_COMPANIES", "10"))  # companies returned by /api/stats
+    STATS_WEEKS = int(os.getenv("STATS_WEEKS", "12"))  # weeks in the trend breakdown
+
+    # Instrumentation
+    INSTRUMENTATION_ENABLED = os.getenv("INSTRUMENTATION_ENABLED", "true").lower() == "true"  # stage timings, Server-Timing and /api/metrics
+    PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))  # fraction of requests profiled, 0 disables
+    PROFILER = os.getenv("PROFILER", "cprofile")  # cprofile (.prof) or pyinstrument (.html, pip install pyinstrument)
+    PROFILE_DIR = os.getenv("PROFILE_DIR", "/tmp/jobmail-profiles")  # where sampled profiles are written
@@ -1,11 +1,143 @@
-from pymongo import MongoClient, ASCENDING, DESCENDING
+from pymongo import MongoClient, ASCENDING, DESCENDING, monitoring
+from pymongo.errors import BulkWriteError
+from concurrent.futures import ThreadPoolExecutor
 from config import Config
 from datetime import datetime
+import threading
+import time
+
+
+class PoolMonitor(monitoring.ConnectionPoolListener):
+    """Counts connection pool events; pymongo keeps no pool stats of its own"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._checkout_started = {}
+        self.stats = {
+            'connections_open': 0,
+            'connections_created': 0,
+            'connections_closed': 0,
+            'checked_out': 0,
+            'checkouts': 0,
+            'checkout_failures': 0,
+            'checkout_wait_ms_total': 0.0,
+            'checkout_wait_ms_max': 0.0,
+            'pool_clears': 0
+        }
+    
+    def _add(self, key, amount=1):
+        with self._lock:
+            self.stats[key] += amount
+    
+    def connection_check_out_started(self, event):
+        with self._lock:
+            self._checkout_started[threading.get_ident()] = time.perf_counter()
+    
+    def connection_checked_out(self, event):
+        with self._lock:
+            started = self._checkout_started.pop(threading.get_ident(), None)
+            self.stats['checked_out'] += 1
+            self.stats['checkouts'] += 1
+            if started is not None:
+                waited = (time.perf_counter() - started) * 1000
+                self.stats['checkout_wait_ms_total'] += waited
+                self.stats['checkout_wait_ms_max'] = max(self.stats['checkout_wait_ms_max'], waited)
+    
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            self._checkout_started.pop(threading.get_ident(), None)
+            self.stats['checkout_failures'] += 1
+    
+    def connection_checked_in(self, event):
+        self._add('checked_out', -1)
+    
+    def connection_created(self, event):
+        with self._lock:
+            self.stats['connections_open'] += 1
+            self.stats['connections_created'] += 1
+    
+    def connection_closed(self, event):
+        with self._lock:
+            self.stats['connections_open'] -= 1
+            self.stats['connections_closed'] += 1
+    
+    def pool_cleared(self, event):
+        self._add('pool_clears')
+    
+    def pool_created(self, event):
+        pass
+    
+    def pool_ready(self, event):
+        pass
+    
+    def pool_closed(self, event):
+        pass
+    
+    def connection_ready(self, event):
+        pass
+    
+    def snapshot(self):
+        with self._lock:
+            stats = dict(self.stats)
+        checkouts = stats['checkouts']
+        stats['checkout_wait_ms_avg'] = round(stats['checkout_wait_ms_total'] / checkouts, 3) if checkouts else 0.0
+        return stats
+
+
+class CommandMonitor(monitoring.CommandListener):
+    """Per-collection operation counts and latencies"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._started = {}
+        self.ops = {}
+    
+    def started(self, event):
+        # getMore names its cursor id; the collection is in its own field
+        target = event.command.get('collection' if event.command_name == 'getMore' else event.command_name)
+        collection = target if isinstance(target, str) else event.database_name
+        with self._lock:
+            self._started[(event.connection_id, event.request_id)] = f"{collection}.{event.command_name}"
+    
+    def succeeded(self, event):
+        self._record(event, failed=False)
+    
+    def failed(self, event):
+        self._record(event, failed=True)
+    
+    def _record(self, event, failed):
+        with self._lock:
+            key = self._started.pop((event.connection_id, event.request_id), None)
+            if key is None:
+                return
+            millis = event.duration_micros / 1000
+            op = self.ops.get(key)
+            if op is None:
+                op = self.ops[key] = {'count': 0, 'errors': 0, 'total_ms': 0.0, 'max_ms': 0.0}
+            op['count'] += 1
+            op['errors'] += failed
+            op['total_ms'] += millis
+            op['max_ms'] = max(op['max_ms'], millis)
+    
+    def snapshot(self):
+        with self._lock:
+            return {
+                key: {
+                    'count': op['count'],
+                    'errors': op['errors'],
+                    'avg_ms': round(op['total_ms'] / op['count'], 3),
+                    'max_ms': round(op['max_ms'], 3)
+                }
+                for key, op in sorted(self.ops.items())
+            }
+
 
 class Database:
     _instance = None
     _client = None
     _db = None
+    pool_monitor = PoolMonitor()
+    command_monitor = CommandMonitor()
     
     def __new__(cls):
         if cls._instance is None:
@@ -26,7 +158,13 @@ class Database:
                     connectTimeoutMS=10000,
                     socketTimeoutMS=10000,
                     retryWrites=True,
-                    tlsAllowInvalidCertificates=False
+                    tlsAllowInvalidCertificates=False,
+                    maxPoolSize=Config.MONGO_MAX_POOL_SIZE,
+                    minPoolSize=Config.MONGO_MIN_POOL_SIZE,
+                    maxIdleTimeMS=Config.MONGO_MAX_IDLE_TIME_MS,
+                    waitQueueTimeoutMS=Config.MONGO_WAIT_QUEUE_TIMEOUT_MS,
+                    readPreference=Config.MONGO_READ_PREFERENCE,
+                    event_listeners=[self.pool_monitor, self.command_monitor]
                 )
                 self._db = self._client[Config.MONGODB_DB_NAME]
                 # Test connection
@@ -44,27 +182,178 @@ class Database:
         try:
             if self._db is not None:
                 self._db.emails.create_index([('user_email', ASCENDING), ('gmail_id', ASCENDING)], unique=True)
-                self._db.emails.create_index([('user_email', ASCENDING), ('date', DESCENDING)])
-                self._db.emails.create_index([('user_email', ASCENDING), ('status', ASCENDING)])
+                # _id breaks date ties so keyset pages walk the index without a sort stage
+                self._db.emails.create_index([('user_email', ASCENDING), ('date', DESCENDING), ('_id', DESCENDING)])
+                self._db.emails.create_index([('user_email', ASCENDING), ('status', ASCENDING), ('date', DESCENDING), ('_id', DESCENDING)])
+                self._db.emails.create_index([('user_email', ASCENDING), ('company', ASCENDING), ('date', DESCENDING), ('_id', DESCENDING)])
+                # The first two are superseded by the indexes above, which start
+                # with the same keys; no query reads (user_email, created_at) any more
+                existing = self._db.emails.index_information()
+                for name in ('user_email_1_date_-1', 'user_email_1_status_1', 'user_email_1_created_at_1'):
+                    if name in existing:
+                        self._db.emails.drop_index(name)
+                self._db.users.create_index([('email', ASCENDING)], unique=True)
+                # At most one queued/running sync per user; finished jobs expire after a week
+                self._db.sync_jobs.create_index(
+                    [('user_email', ASCENDING)],
+                    unique=True,
+                    partialFilterExpression={'active': True}
+                )
+                self._db.sync_jobs.create_index([('status', ASCENDING), ('created_at', ASCENDING)])
+                self._db.sync_jobs.create_index('finished_at', expireAfterSeconds=7 * 24 * 3600)
+                # user_stats and user_versions are keyed by user_email in _id, no extra index needed
+                self._db.sender_companies.create_index([('user_email', ASCENDING), ('sender', ASCENDING)], unique=True)
+                # Server-side sessions and OAuth states are keyed by _id and expire on their own
+                self._db.sessions.create_index('expires_at', expireAfterSeconds=0)
+                self._db.oauth_states.create_index('expires_at', expireAfterSeconds=0)
+                # Refreshed access tokens shared between workers, gone once expired
+                self._db.oauth_tokens.create_index('expiry', expireAfterSeconds=0)
                 print("✅ MongoDB indexes created")
         except Exception as e:
             print(f"⚠️  Index creation warning: {e}")
     
+    def startup(self):
+        """Connect, ensure indexes and warm the pool before serving requests"""
+        if self._client is not None:
+            return
+        start = time.perf_counter()
+        self._connect()
+        if self._client is None:
+            return
+        self.warm_pool(Config.MONGO_MIN_POOL_SIZE)
+        print(f"✅ MongoDB ready in {(time.perf_counter() - start) * 1000:.0f} ms "
+              f"({self.pool_monitor.stats['connections_open']} connections open)")
+    
+    def warm_pool(self, connections):
+        """Open connections up front with concurrent pings, so they all get checked out at once"""
+        if connections <= 1:
+            return
+        with ThreadPoolExecutor(max_workers=connections) as executor:
+            list(executor.map(lambda _: self._client.admin.command('ping'), range(connections)))
+    
+    def health(self):
+        """Ping round trip, server RTTs, pool and per-collection op stats"""
+        if self._client is None:
+            self._connect()
+        if self._client is None:
+            return {'connected': False}
+        
+        try:
+            start = time.perf_counter()
+            self._client.admin.command('ping')
+            ping_ms = round((time.perf_counter() - start) * 1000, 3)
+        except Exception as e:
+            return {'connected': False, 'error': str(e)}
+        
+        servers = {}
+        for address, server in self._client.topology_description.server_descriptions().items():
+            rtt = server.round_trip_time
+            servers[f"{address[0]}:{address[1]}"] = {
+                'type': server.server_type_name,
+                'rtt_ms': round(rtt * 1000, 3) if rtt is not None else None
+            }
+        
+        options = self._client.options.pool_options
+        return {
+            'connected': True,
+            'ping_ms': ping_ms,
+            'servers': servers,
+            'read_preference': self._client.read_preference.mongos_mode,
+            'pool': dict(
+                self.pool_monitor.snapshot(),
+                max_pool_size=options.max_pool_size,
+                min_pool_size=options.min_pool_size,
+                wait_queue_timeout_ms=Config.MONGO_WAIT_QUEUE_TIMEOUT_MS
+            ),
+            'operations': self.command_monitor.snapshot()
+        }
+    
     @property
     def emails(self):
         if self._client is None:
             self._connect()
-        return self._db.emails if self._db else None
+        return self._db.emails if self._db is not None else None
     
     @property
     def users(self):
         if self._client is None:
             self._connect()
-        return self._db.users if self._db else None
+        return self._db.users if self._db is not None else None
+    
+    @property
+    def sync_jobs(self):
+        if self._client is None:
+            self._connect()
+        return self._db.sync_jobs if self._db is not None else None
+    
+    @property
+    def user_stats(self):
+        if self._client is None:
+            self._connect()
+        return self._db.user_stats if self._db is not None else None
+    
+    @property
+    def user_versions(self):
+        if self._client is None:
+            self._connect()
+        return self._db.user_versions if self._db is not None else None
+    
+    @property
+    def sender_companies(self):
+        if self._client is None:
+            self._connect()
+        return self._db.sender_companies if self._db is not None else None
+    
+    @property
+    def sessions(self):
+        if self._client is None:
+            self._connect()
+        return self._db.sessions if self._db is not None else None
+    
+    @property
+    def oauth_states(self):
+        if self._client is None:
+            self._connect()
+        return self._db.oauth_states if self._db is not None else None
+    
+    @property
+    def oauth_tokens(self):
+        if self._client is None:
+            self._connect()
+        return self._db.oauth_tokens if self._db is not None else None
     
     def close(self):
         if self._client:
             self._client.close()
 
 # Create a single database instance
-db = Database()
\ No newline at end of file
+db = Database()
+
+def bulk_write_batches(collection, operations, batch_size=None):
+    """Send operations as unordered bulk_write batches.
+    
+    A failing write doesn't stop the rest of its batch. Returns counts plus
+    one error entry per batch that reported write errors.
+    """
+    batch_size = batch_size or Config.MONGO_BULK_BATCH_SIZE
+    report = {'batches': 0, 'upserted': 0, 'modified': 0, 'errors': []}
+    
+    for start in range(0, len(operations), batch_size):
+        batch = operations[start:start + batch_size]
+        report['batches'] += 1
+        try:
+            result = collection.bulk_write(batch, ordered=False)
+            details = result.bulk_api_result
+        except BulkWriteError as e:
+            details = e.details
+            write_errors = details.get('writeErrors', [])
+            report['errors'].append({
+                'batch': report['batches'],
+                'failed': len(write_errors),
+                'message': write_errors[0].get('errmsg') if write_errors else str(e)
+            })
+            print(f"⚠️  Bulk write batch {report['batches']}: {len(write_errors)} of {len(batch)} writes failed")
+        report['upserted'] += details.get('nUpserted', 0)
+        report['modified'] += details.get('nModified', 0)
+    
+    return report
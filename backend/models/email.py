@@ -1,16 +1,39 @@
 from datetime import datetime
-from bson import ObjectId
+from enum import Enum
+from functools import lru_cache
+
+class EmailStatus(str, Enum):
+    """Classifier labels. Members are str, so they encode to BSON and JSON as-is"""
+    REJECTION = 'Rejection'
+    SELECTION = 'Selection'
+    PENDING = 'Pending'
+
+_STATUS_BY_VALUE = {status.value: status for status in EmailStatus}
+
+@lru_cache(maxsize=8192)
+def format_date(value):
+    """'YYYY-MM-DD' for a datetime; sync stores day-precision dates, so most rows hit the cache"""
+    return value.strftime('%Y-%m-%d')
 
 class Email:
-    def __init__(self, user_email, gmail_id, subject, sender, company, status, date, snippet):
+    __slots__ = ('user_email', 'gmail_id', 'subject', 'sender', 'company', 'status', 'date', 'snippet',
+                 'fetch_tier', 'bytes_saved', 'created_at')
+    
+    def __init__(self, user_email, gmail_id, subject, sender, company, status, date, snippet,
+                 fetch_tier=None, bytes_saved=0):
         self.user_email = user_email
         self.gmail_id = gmail_id
         self.subject = subject
         self.sender = sender
         self.company = company
-        self.status = status
+        # Shared enum members instead of a string per email; unknown labels are kept as given
+        self.status = _STATUS_BY_VALUE.get(status, status)
         self.date = date
         self.snippet = snippet
+        # Which Gmail format the sync needed ('metadata' or 'full') and the
+        # estimated bytes it didn't have to download
+        self.fetch_tier = fetch_tier
+        self.bytes_saved = bytes_saved
         self.created_at = datetime.utcnow()
     
     def to_dict(self):
@@ -20,23 +43,38 @@ class Email:
             'subject': self.subject,
             'sender': self.sender,
             'company': self.company,
-            'status': self.status,
+            'status': self.status._value_ if isinstance(self.status, EmailStatus) else self.status,
             'date': self.date,
             'snippet': self.snippet,
+            'fetch_tier': self.fetch_tier,
+            'bytes_saved': self.bytes_saved,
             'created_at': self.created_at
         }
     
     @staticmethod
     def from_dict(data):
         """Convert MongoDB document to Email object"""
-        return {
-            'id': str(data.get('_id')),
-            'gmail_id': data.get('gmail_id'),
-            'subject': data.get('subject'),
-            'sender': data.get('sender'),
-            'company': data.get('company'),
-            'status': data.get('status'),
-            'date': data.get('date').strftime('%Y-%m-%d') if isinstance(data.get('date'), datetime) else data.get('date'),
-            'snippet': data.get('snippet'),
-            'read': data.get('read', False)
-        }
\ No newline at end of file
+        return Email.from_dicts((data,))[0]
+    
+    @staticmethod
+    def from_dicts(docs):
+        """API rows for a list or cursor of MongoDB documents, with the
+        per-row lookups hoisted out of the loop; from_dict is the one-row case."""
+        fmt = format_date
+        emails = []
+        append = emails.append
+        for data in docs:
+            get = data.get
+            date = get('date')
+            append({
+                'id': str(get('_id')),
+                'gmail_id': get('gmail_id'),
+                'subject': get('subject'),
+                'sender': get('sender'),
+                'company': get('company'),
+                'status': get('status'),
+                'date': fmt(date) if isinstance(date, datetime) else date,
+                'snippet': get('snippet'),
+                'read': get('read', False)
+            })
+        return emails
@@ -0,0 +1,168 @@
+"""Re-run EmailClassifier over stored emails and write back changed statuses.
+
+Usage (from the backend directory):
+    python reclassify.py --dry-run               # show what would change
+    python reclassify.py --processes 4           # reclassify everything
+    python reclassify.py --resume                # continue an interrupted run
+    python reclassify.py --user someone@gmail.com
+"""
+from services.classifier import EmailClassifier
+from services.stats_service import record_email_changes, invalidate_stats
+from services.response_cache import data_versions
+from database import db, bulk_write_batches
+from config import Config
+from pymongo import UpdateOne
+from bson import ObjectId
+from collections import Counter, defaultdict, deque
+from datetime import datetime
+import argparse
+import json
+import os
+import sys
+
+DEFAULT_CHECKPOINT = '.reclassify_checkpoint.json'
+
+
+def iter_emails(query, batch_size, start_after=None):
+    """Stream the collection in _id order, one bounded query per batch"""
+    last_id = start_after
+    while True:
+        batch_query = dict(query)
+        if last_id is not None:
+            batch_query['_id'] = {'$gt': last_id}
+        batch = list(
+            db.emails.find(batch_query, {
+                'subject': 1, 'snippet': 1, 'status': 1, 'gmail_id': 1, 'user_email': 1,
+                'company': 1, 'date': 1, 'read': 1
+            })
+            .sort('_id', 1)
+            .limit(batch_size)
+        )
+        if not batch:
+            return
+        yield from batch
+        last_id = batch[-1]['_id']
+
+
+def load_checkpoint(path, user):
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        checkpoint = json.load(f)
+    if checkpoint.get('user') != user:
+        print(f"❌ Checkpoint {path} was written for user={checkpoint.get('user')}, not {user}")
+        sys.exit(1)
+    return checkpoint
+
+
+def save_checkpoint(path, user, last_id, processed, changed):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump({
+            'user': user,
+            'last_id': str(last_id),
+            'processed': processed,
+            'changed': changed,
+            'updated_at': datetime.utcnow().isoformat()
+        }, f)
+    os.replace(tmp_path, path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Reclassify stored emails with the current keyword lists')
+    parser.add_argument('--user', help='only reclassify this user_email')
+    parser.add_argument('--batch-size', type=int, default=1000, help='documents per query and per bulk write')
+    parser.add_argument('--processes', type=int, default=Config.CLASSIFIER_PROCESSES)
+    parser.add_argument('--dry-run', action='store_true', help='print the changes without writing them')
+    parser.add_argument('--show', type=int, default=20, help='changed rows to print in dry-run mode')
+    parser.add_argument('--resume', action='store_true', help='continue from the checkpoint file')
+    parser.add_argument('--checkpoint', default=DEFAULT_CHECKPOINT)
+    args = parser.parse_args()
+
+    if db.emails is None:
+        print("❌ Could not connect to MongoDB")
+        sys.exit(1)
+
+    query = {'user_email': args.user} if args.user else {}
+    start_after = None
+    processed = changed = 0
+
+    if args.resume:
+        checkpoint = load_checkpoint(args.checkpoint, args.user)
+        if checkpoint:
+            start_after = ObjectId(checkpoint['last_id'])
+            processed, changed = checkpoint['processed'], checkpoint['changed']
+            print(f"↪️  Resuming after {start_after} ({processed} already processed)")
+
+    classifier = EmailClassifier()
+    transitions = Counter()
+    operations = []
+    # user_email -> (added, removed) email views for the stats counters
+    stat_changes = defaultdict(lambda: ([], []))
+    last_id = start_after
+
+    # Documents wait here until classify_many yields their label (same order)
+    in_flight = deque()
+
+    def pairs():
+        for doc in iter_emails(query, args.batch_size, start_after):
+            in_flight.append(doc)
+            yield doc.get('subject') or '', doc.get('snippet') or ''
+
+    def flush():
+        if operations and not args.dry_run:
+            report = bulk_write_batches(db.emails, operations, args.batch_size)
+            if report['errors']:
+                print(f"⚠️  {sum(e['failed'] for e in report['errors'])} writes failed")
+            for user_email, (added, removed) in stat_changes.items():
+                if report['errors']:
+                    invalidate_stats(user_email)
+                else:
+                    record_email_changes(user_email, added, removed)
+                data_versions.bump(user_email)
+        operations.clear()
+        stat_changes.clear()
+        if not args.dry_run and last_id is not None:
+            save_checkpoint(args.checkpoint, args.user, last_id, processed, changed)
+
+    labels = classifier.classify_many(
+        pairs(),
+        processes=args.processes,
+        chunk_size=args.batch_size,
+        threshold=args.batch_size
+    )
+
+    for status in labels:
+        doc = in_flight.popleft()
+        processed += 1
+        last_id = doc['_id']
+
+        if status != doc.get('status'):
+            changed += 1
+            transitions[(doc.get('status'), status)] += 1
+            if args.dry_run and changed <= args.show:
+                print(f"  {doc.get('user_email')} {doc.get('gmail_id')}: {doc.get('status')} -> {status}"
+                      f"  ({(doc.get('subject') or '')[:60]})")
+            operations.append(UpdateOne({'_id': doc['_id']}, {'$set': {'status': status}}))
+            added, removed = stat_changes[doc.get('user_email')]
+            removed.append(doc)
+            added.append(dict(doc, status=status))
+
+        if processed % args.batch_size == 0:
+            flush()
+            print(f"… {processed} processed, {changed} changed")
+
+    flush()
+
+    print("\n" + "=" * 60)
+    print(f"{'🔍 Dry run' if args.dry_run else '✅ Done'}: {processed} processed, {changed} changed")
+    for (old, new), count in transitions.most_common():
+        print(f"  {old} -> {new}: {count}")
+    print("=" * 60)
+
+    if not args.dry_run and os.path.exists(args.checkpoint):
+        os.remove(args.checkpoint)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,7 +1,12 @@
-from flask import Blueprint, redirect, request, session, jsonify, url_for
+from flask import Blueprint, redirect, request, session, jsonify
 from google_auth_oauthlib.flow import Flow
-from google.oauth2.credentials import Credentials
+from services.gmail_service import GmailService
+from services.credentials_manager import credentials_manager
+from services.cache import TTLCache
+from services.session_store import create_store
 from config import Config
+from datetime import datetime
+import hashlib
 import os
 import secrets
 
@@ -10,8 +15,44 @@ auth_bp = Blueprint('auth', __name__)
 # Disable HTTPS requirement for local development
 os.environ['OAUTHLIB_INSECURE_TRANSPORT'] = '1'
 
-# Temporary state storage (use Redis in production)
-state_storage = {}
+# Pending OAuth states, shared by every worker and single-use
+oauth_states = create_store('oauth_states')
+
+# Email address per OAuth grant, for sessions that don't carry one yet
+identity_cache = TTLCache(maxsize=Config.IDENTITY_CACHE_SIZE, ttl=Config.IDENTITY_CACHE_TTL)
+
+def _identity_key(credentials):
+    secret = credentials.get('refresh_token') or credentials.get('token') or ''
+    return hashlib.sha256(secret.encode('utf-8')).hexdigest()
+
+def get_session_credentials():
+    """session['credentials'] with the newest access token this process has.
+    
+    A token refreshed during an earlier request is written back here, so
+    new clients and sync jobs don't start from an expired one.
+    """
+    credentials = session['credentials']
+    current = credentials_manager.current(credentials)
+    if current is not credentials:
+        session['credentials'] = current
+    return current
+
+def get_current_user_email():
+    """Email address of the signed-in user, without a Google call when we know it"""
+    user_email = session.get('user_email')
+    if user_email:
+        return user_email
+    
+    credentials = get_session_credentials()
+    key = _identity_key(credentials)
+    user_email = identity_cache.get(key)
+    if user_email is None:
+        with GmailService(credentials) as gmail_service:
+            user_email = gmail_service.get_user_info().get('emailAddress')
+        identity_cache.set(key, user_email)
+    
+    session['user_email'] = user_email
+    return user_email
 
 def get_flow():
     """Create OAuth flow instance"""
@@ -49,12 +90,8 @@ def login():
             state=state
         )
         
-        # Store state temporarily (expires in 10 minutes)
-        state_storage[state] = True
-        
-        # Also try to store in session as backup
-        session['oauth_state'] = state
-        session.permanent = True
+        # Store state until the callback (expires after OAUTH_STATE_TTL)
+        oauth_states.set(state, {'created_at': datetime.utcnow()}, Config.OAUTH_STATE_TTL)
         
         return jsonify({'auth_url': authorization_url})
     
@@ -72,22 +109,10 @@ def callback():
         if not state_from_url:
             return redirect(f"{Config.FRONTEND_URL}?auth=error&message=Missing+state+parameter")
         
-        # Check if state exists in storage or session
-        state_valid = (
-            state_from_url in state_storage or 
-            session.get('oauth_state') == state_from_url
-        )
-        
-        if not state_valid:
-            print(f"Invalid state: {state_from_url}")
-            print(f"Session state: {session.get('oauth_state')}")
-            print(f"State storage: {state_from_url in state_storage}")
-            # Don't fail - proceed anyway for testing
-            # In production, you'd want to be stricter
-        
-        # Clean up state storage
-        if state_from_url in state_storage:
-            del state_storage[state_from_url]
+        # Consume the state; whichever worker handled /login, it's in the shared store
+        if oauth_states.pop(state_from_url) is None:
+            print(f"Invalid or expired state: {state_from_url}")
+            return redirect(f"{Config.FRONTEND_URL}?auth=error&message=Invalid+or+expired+state")
         
         # Create flow and fetch token
         flow = get_flow()
@@ -96,6 +121,9 @@ def callback():
         # Get credentials
         credentials = flow.credentials
         
+        # Fresh session id for the signed-in user, against session fixation
+        session.regenerate()
+        
         # Store credentials in session
         session['credentials'] = {
             'token': credentials.token,
@@ -103,13 +131,17 @@ def callback():
             'token_uri': credentials.token_uri,
             'client_id': credentials.client_id,
             'client_secret': credentials.client_secret,
-            'scopes': credentials.scopes
+            'scopes': credentials.scopes,
+            'expiry': credentials.expiry
         }
         
         session.permanent = True
         
-        # Clear oauth_state
-        session.pop('oauth_state', None)
+        # Resolve the user's address once so API requests never need getProfile
+        try:
+            get_current_user_email()
+        except Exception as e:
+            print(f"Could not resolve user email at login: {str(e)}")
         
         # Redirect to frontend with success
         return redirect(f"{Config.FRONTEND_URL}?auth=success")
@@ -131,5 +163,8 @@ def auth_status():
 @auth_bp.route('/logout', methods=['POST'])
 def logout():
     """Logout user"""
+    if 'credentials' in session:
+        identity_cache.pop(_identity_key(session['credentials']))
+        credentials_manager.forget(session['credentials'])
     session.clear()
     return jsonify({'message': 'Logged out successfully'})
\ No newline at end of file
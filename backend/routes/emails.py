@@ -1,199 +1,271 @@
-from flask import Blueprint, jsonify, session, request
-from services.gmail_service import GmailService
-from services.classifier import EmailClassifier
+from flask import Blueprint, Response, jsonify, session, request
+from routes.auth import get_current_user_email, get_session_credentials
+from services.stats_service import get_stats as get_user_stats, format_stats, record_read, week_key
+from services.sync_worker import sync_worker, serialize_job, ACTIVE_STATUSES
+from services.response_cache import response_cache, data_versions
+from services.instrumentation import span
 from models.email import Email
 from database import db
+from config import Config
+from bson import ObjectId
 from datetime import datetime
+import base64
+import json
 import re
 
 emails_bp = Blueprint('emails', __name__)
 
+# Any of these switches /api/emails to paginated responses
+PAGE_PARAMS = {'limit', 'cursor', 'fields', 'status', 'company', 'date_from', 'date_to'}
+EMAIL_FIELDS = ['gmail_id', 'subject', 'sender', 'company', 'status', 'date', 'snippet', 'read']
+NDJSON_MIMETYPE = 'application/x-ndjson'
+
 @emails_bp.route('/emails', methods=['GET'])
 def get_emails():
     if 'credentials' not in session:
         return jsonify({'error': 'Not authenticated'}), 401
     
     try:
-        gmail_service = GmailService(session['credentials'])
-        classifier = EmailClassifier()
-        
         # Get user email
-        user_info = gmail_service.get_user_info()
-        user_email = user_info.get('emailAddress')
+        user_email = get_current_user_email()
         
         # Check if we should force refresh
         force_refresh = request.args.get('refresh', 'false').lower() == 'true'
         
+        if request.args.get('format') == 'ndjson' or NDJSON_MIMETYPE in request.headers.get('Accept', ''):
+            # One JSON object per line, straight off the Mongo cursor
+            job = None
+            if force_refresh or db.emails.find_one({'user_email': user_email}, {'_id': 1}) is None:
+                job = sync_worker.enqueue(user_email, get_session_credentials(), force_refresh)
+            return Response(
+                stream_emails(user_email, job),
+                mimetype=NDJSON_MIMETYPE,
+                headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+            )
+        
+        if not force_refresh and PAGE_PARAMS.intersection(request.args):
+            # Paginated read straight from the cache, never triggers a sync
+            try:
+                return response_cache.serve(user_email, lambda: list_emails_page(user_email, request.args))
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+        
         if not force_refresh:
-            # Check if we have cached emails
-            cached_emails = list(db.emails.find({'user_email': user_email}).sort('date', -1))
-            if cached_emails:
-                return jsonify({
-                    'emails': [Email.from_dict(e) for e in cached_emails],
-                    'total': len(cached_emails),
-                    'cached': True
-                })
+            # Unchanged since the client's last poll: 304 without touching the emails
+            response = response_cache.serve(user_email, lambda: cached_emails_payload(user_email))
+            if response is not None:
+                return response
         
-        # Fetch fresh emails from Gmail
-        messages = gmail_service.fetch_job_emails(max_results=100)
+        # Syncing runs on the background worker (one job per user); give it a
+        # moment to store the first chunk so the dashboard has data right away
+        job = sync_worker.enqueue(user_email, get_session_credentials(), force_refresh)
+        with span('sync.wait'):
+            job = sync_worker.wait(job['_id'], timeout=Config.SYNC_INLINE_WAIT, min_stored=Config.SYNC_CHUNK_SIZE)
         
-        emails_data = []
-        for msg in messages:
-            # Check if email already exists
-            existing = db.emails.find_one({
-                'user_email': user_email,
-                'gmail_id': msg['id']
-            })
-            
-            if existing and not force_refresh:
-                emails_data.append(Email.from_dict(existing))
-                continue
-            
-            # Parse email details
-            subject = msg.get('subject', 'No Subject')
-            sender = msg.get('from', 'Unknown')
-            body = msg.get('snippet', '')
-            date_str = msg.get('date', '')
-            
-            # Extract company name
-            company = extract_company(sender)
-            
-            # Classify email
-            status = classifier.classify(subject, body)
-            
-            # Parse date
-            try:
-                email_date = datetime.strptime(date_str[:16], '%a, %d %b %Y')
-            except:
-                email_date = datetime.utcnow()
-            
-            # Create email object
-            email_obj = Email(
-                user_email=user_email,
-                gmail_id=msg['id'],
-                subject=subject,
-                sender=sender,
-                company=company,
-                status=status,
-                date=email_date,
-                snippet=body[:500]
-            )
-            
-            # Upsert to database
-            db.emails.update_one(
-                {'user_email': user_email, 'gmail_id': msg['id']},
-                {'$set': email_obj.to_dict()},
-                upsert=True
-            )
-            
-            email_dict = email_obj.to_dict()
-            email_dict['id'] = msg['id']
-            emails_data.append(Email.from_dict(email_dict))
+        with span('mongo.query'):
+            docs = list(db.emails.find({'user_email': user_email}).sort('date', -1))
+        emails_data = Email.from_dicts(docs)
         
         return jsonify({
             'emails': emails_data,
             'total': len(emails_data),
+            # stored also counts messages that were already in the database
+            'new': job.get('inserted', 0),
+            'full_sync': job.get('full_sync'),
+            'syncing': job['status'] in ACTIVE_STATUSES,
+            'sync_job': serialize_job(job),
             'cached': False
         })
-        
+    
     except Exception as e:
         print(f"Error in get_emails: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+def cached_emails_payload(user_email):
+    """Every stored email for the legacy listing, None if there are none yet"""
+    with span('mongo.query'):
+        cached_emails = list(db.emails.find({'user_email': user_email}).sort('date', -1))
+    if not cached_emails:
+        return None
+    return {
+        'emails': Email.from_dicts(cached_emails),
+        'total': len(cached_emails),
+        'cached': True
+    }
+
+def stream_emails(user_email, job=None):
+    """Generate a user's stored emails as NDJSON lines, newest first.
+    
+    Every line has a type: 'email' rows, then a final 'end' line. The
+    stream ends once the stored rows are sent, so it never holds a
+    worker for the length of a sync; with a job, 'end' says whether it is
+    still running and clients poll /api/sync/<id> for the rest.
+    """
+    def line(event):
+        return json.dumps(event) + '\n'
+    
+    rows = 0
+    cursor = (
+        db.emails.find({'user_email': user_email})
+        .sort([('date', -1), ('_id', -1)])
+        .batch_size(Config.EMAILS_STREAM_BATCH_SIZE)
+    )
+    try:
+        for doc in cursor:
+            rows += 1
+            yield line({'type': 'email', 'email': Email.from_dict(doc)})
+    finally:
+        cursor.close()
+    
+    if job is not None:
+        # The job was queued before the rows were read; report where it is now
+        job = db.sync_jobs.find_one({'_id': job['_id']}, {'credentials': 0}) or job
+    
+    yield line({
+        'type': 'end',
+        'total': rows,
+        'syncing': job is not None and job['status'] in ACTIVE_STATUSES,
+        'sync_job': serialize_job(job) if job else None
+    })
+
+def list_emails_page(user_email, args):
+    """One page of a user's emails, newest first.
+    
+    Pages are keyset-paginated on (date, _id), so each page costs the same
+    however deep into the history it is. Emails without a usable date
+    (null, missing or a string) follow the dated ones, newest _id first,
+    as they do in the full listing. Supports a fields projection and
+    filters on status, company and date range.
+    """
+    limit = min(int(args.get('limit', Config.EMAILS_PAGE_SIZE)), Config.EMAILS_MAX_PAGE_SIZE)
+    if limit < 1:
+        raise ValueError('limit must be positive')
+    
+    fields = EMAIL_FIELDS
+    if args.get('fields'):
+        fields = [f.strip() for f in args['fields'].split(',') if f.strip()]
+        unknown = set(fields) - set(EMAIL_FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}")
+    
+    query = {'user_email': user_email}
+    if args.get('status'):
+        statuses = args['status'].split(',')
+        query['status'] = statuses[0] if len(statuses) == 1 else {'$in': statuses}
+    if args.get('company'):
+        query['company'] = args['company']
+    
+    date_range = {}
+    if args.get('date_from'):
+        date_range['$gte'] = datetime.strptime(args['date_from'], '%Y-%m-%d')
+    if args.get('date_to'):
+        date_range['$lte'] = datetime.strptime(args['date_to'], '%Y-%m-%d')
+    
+    cursor_date, cursor_id = decode_cursor(args['cursor']) if args.get('cursor') else (None, None)
+    # A cursor without a date points into the undated tail
+    in_undated = cursor_id is not None and cursor_date is None
+    
+    # date is always needed to build the next cursor
+    projection = dict.fromkeys(set(fields) | {'date'}, 1)
+    docs = []
+    
+    if not in_undated:
+        # $lt only compares values of the same BSON type, so walk real dates first
+        dated = dict(query, date=dict(date_range, **{'$type': 'date'}))
+        if cursor_id is not None:
+            dated['$or'] = [
+                {'date': {'$lt': cursor_date}},
+                {'date': cursor_date, '_id': {'$lt': cursor_id}}
+            ]
+        with span('mongo.query'):
+            docs = list(
+                db.emails.find(dated, projection)
+                .sort([('date', -1), ('_id', -1)])
+                .limit(limit + 1)
+            )
+    
+    if len(docs) <= limit and not date_range:
+        # Only reached on the last dated page; undated rows are rare
+        undated = dict(query, date={'$not': {'$type': 'date'}})
+        if in_undated:
+            undated['_id'] = {'$lt': cursor_id}
+        with span('mongo.query'):
+            docs += list(
+                db.emails.find(undated, projection)
+                .sort('_id', -1)
+                .limit(limit + 1 - len(docs))
+            )
+    
+    has_more = len(docs) > limit
+    docs = docs[:limit]
+    
+    keys = ['id'] + fields
+    emails_data = [{key: email[key] for key in keys} for email in Email.from_dicts(docs)]
+    
+    return {
+        'emails': emails_data,
+        'count': len(emails_data),
+        'has_more': has_more,
+        'next_cursor': encode_cursor(docs[-1]) if has_more else None,
+        'cached': True
+    }
+
+def encode_cursor(doc):
+    date = doc.get('date')
+    raw = json.dumps({'d': date.isoformat() if isinstance(date, datetime) else None, 'i': str(doc['_id'])})
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+def decode_cursor(token):
+    """(date, _id) of a cursor; date is None for the undated tail"""
+    try:
+        raw = json.loads(base64.urlsafe_b64decode(token.encode('ascii')))
+        date = datetime.fromisoformat(raw['d']) if raw['d'] is not None else None
+        return date, ObjectId(raw['i'])
+    except Exception:
+        raise ValueError('Invalid cursor')
+
 @emails_bp.route('/stats', methods=['GET'])
 def get_stats():
     if 'credentials' not in session:
         return jsonify({'error': 'Not authenticated'}), 401
     
     try:
-        gmail_service = GmailService(session['credentials'])
-        user_info = gmail_service.get_user_info()
-        user_email = user_info.get('emailAddress')
-        
-        # Aggregate stats from MongoDB
-        pipeline = [
-            {'$match': {'user_email': user_email}},
-            {'$group': {
-                '_id': '$status',
-                'count': {'$sum': 1}
-            }}
-        ]
-        
-        results = list(db.emails.aggregate(pipeline))
-        
-        stats = {
-            'total': 0,
-            'rejection': 0,
-            'selection': 0,
-            'pending': 0,
-            'unread': 0
-        }
-        
-        for result in results:
-            status = result['_id']
-            count = result['count']
-            stats['total'] += count
-            if status == 'Rejection':
-                stats['rejection'] = count
-            elif status == 'Selection':
-                stats['selection'] = count
-            elif status == 'Pending':
-                stats['pending'] = count
-        
-        # Count unread
-        stats['unread'] = db.emails.count_documents({
-            'user_email': user_email,
-            'read': False
-        })
-        
-        return jsonify(stats)
+        user_email = get_current_user_email()
         
+        # Served from the per-user stats document, kept current on every write,
+        # and answered with a 304 while the user's data version is unchanged
+        # The weekly trend ends at the current week, so a new week is a new response
+        return response_cache.serve(
+            user_email,
+            lambda: stats_payload(user_email),
+            salt=week_key(datetime.utcnow())
+        )
+    
     except Exception as e:
         print(f"Error in get_stats: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+def stats_payload(user_email):
+    with span('stats.query'):
+        stats = get_user_stats(user_email)
+    return format_stats(stats)
+
 @emails_bp.route('/emails/<email_id>/read', methods=['POST'])
 def mark_as_read(email_id):
     if 'credentials' not in session:
         return jsonify({'error': 'Not authenticated'}), 401
     
     try:
-        gmail_service = GmailService(session['credentials'])
-        user_info = gmail_service.get_user_info()
-        user_email = user_info.get('emailAddress')
+        user_email = get_current_user_email()
         
-        db.emails.update_one(
-            {'user_email': user_email, 'gmail_id': email_id},
+        result = db.emails.update_one(
+            {'user_email': user_email, 'gmail_id': email_id, 'read': {'$ne': True}},
             {'$set': {'read': True}}
         )
+        if result.modified_count:
+            record_read(user_email)
+            data_versions.bump(user_email)
         
         return jsonify({'success': True})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
-
-def extract_company(sender):
-    """Extract company name from email sender"""
-    # Try to extract from email format "Company Name <email@company.com>"
-    if '<' in sender and '>' in sender:
-        company_name = sender.split('<')[0].strip()
-        if company_name and not '@' in company_name:
-            return company_name
-        
-        # Extract from email domain
-        email = sender.split('<')[1].split('>')[0]
-        domain = email.split('@')[1] if '@' in email else ''
-        company = domain.split('.')[0] if domain else 'Unknown'
-        
-        # Clean up common email domains
-        if company.lower() in ['gmail', 'yahoo', 'outlook', 'hotmail', 'mail']:
-            return 'Unknown'
-        
-        return company.capitalize()
-    
-    # Try to extract from plain email
-    if '@' in sender:
-        domain = sender.split('@')[1].split('.')[0]
-        if domain.lower() not in ['gmail', 'yahoo', 'outlook', 'hotmail', 'mail']:
-            return domain.capitalize()
-    
-    return 'Unknown'
\ No newline at end of file
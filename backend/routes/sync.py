@@ -0,0 +1,43 @@
+from flask import Blueprint, jsonify, session, request
+from routes.auth import get_current_user_email, get_session_credentials
+from services.sync_worker import sync_worker, serialize_job
+
+sync_bp = Blueprint('sync', __name__)
+
+@sync_bp.route('/sync', methods=['POST'])
+def start_sync():
+    """Queue a background Gmail sync for the current user"""
+    if 'credentials' not in session:
+        return jsonify({'error': 'Not authenticated'}), 401
+    
+    try:
+        user_email = get_current_user_email()
+        
+        options = request.get_json(silent=True) or {}
+        force_refresh = bool(options.get('force_refresh', False))
+        
+        # Repeated clicks get the already-active job back instead of a new one
+        job = sync_worker.enqueue(user_email, get_session_credentials(), force_refresh)
+        
+        return jsonify(serialize_job(job)), 202
+    except Exception as e:
+        print(f"Error in start_sync: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@sync_bp.route('/sync/<job_id>', methods=['GET'])
+def sync_status(job_id):
+    """Report progress of a sync job"""
+    if 'credentials' not in session:
+        return jsonify({'error': 'Not authenticated'}), 401
+    
+    try:
+        user_email = get_current_user_email()
+        
+        job = sync_worker.get_job(job_id, user_email)
+        if job is None:
+            return jsonify({'error': 'Sync job not found'}), 404
+        
+        return jsonify(serialize_job(job))
+    except Exception as e:
+        print(f"Error in sync_status: {str(e)}")
+        return jsonify({'error': str(e)}), 500
@@ -0,0 +1,465 @@
+"""asyncio sync pipeline: fetch -> parse -> classify -> write.
+
+An alternative to sync_service.run_sync selected with SYNC_PIPELINE=async.
+Gmail is called over aiohttp and MongoDB through motor; both are optional
+dependencies (pip install -r requirements-async.txt) that are only imported here.
+"""
+from services.gmail_service import (
+    GmailService, HistoryExpired, DEFAULT_API_ENDPOINT, JOB_QUERY, METADATA_HEADERS,
+    RETRYABLE_STATUS, RETRYABLE_REASONS, RATE_LIMIT_REASONS
+)
+from services.client_pool import gmail_client_pool
+from services.rate_limiter import gmail_rate_limiter, QUOTA_UNITS
+from services.credentials_manager import credentials_from_dict
+from services.classifier import EmailClassifier
+from services.mime import parse_message
+from services.stats_service import stats_update
+from services.response_cache import data_versions, version_update
+from services.instrumentation import span
+from services.sync_service import EXISTING_PROJECTION, existing_query, prepare_writes
+from services.company import resolve_companies, sender_query, sender_company_writes
+from google.auth.transport.requests import Request
+from pymongo.errors import BulkWriteError
+from collections import Counter
+from datetime import datetime
+from config import Config
+import asyncio
+import time
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+try:
+    from motor.motor_asyncio import AsyncIOMotorClient
+except ImportError:
+    AsyncIOMotorClient = None
+
+def missing_dependencies():
+    """Optional packages SYNC_PIPELINE=async needs that aren't installed"""
+    return [name for name, module in (('aiohttp', aiohttp), ('motor', AsyncIOMotorClient)) if module is None]
+
+
+# Passed down a queue when the stage feeding it has finished
+_DONE = object()
+
+
+class GmailRequestError(Exception):
+    """A Gmail REST call answered with an error status"""
+    
+    def __init__(self, status, message, reasons=(), retry_after=0):
+        super().__init__(f"HTTP {status}: {message}")
+        self.status = status
+        self.reasons = set(reasons)
+        self.retry_after = retry_after
+    
+    @property
+    def retryable(self):
+        if self.status in RETRYABLE_STATUS:
+            return True
+        return self.status == 403 and bool(self.reasons & RETRYABLE_REASONS)
+    
+    @property
+    def rate_limited(self):
+        return self.status == 429 or (self.status == 403 and bool(self.reasons & RATE_LIMIT_REASONS))
+
+
+class AsyncGmailClient:
+    """The handful of Gmail REST calls a sync needs, on an aiohttp session.
+    
+    Retries, backoff and the shared quota limiter follow GmailService; an
+    expired access token is refreshed once on 401 when the credentials
+    carry a refresh token.
+    """
+    
+    def __init__(self, session, credentials_dict, api_endpoint=None):
+        self.session = session
+        self.credentials = credentials_from_dict(credentials_dict)
+        self.base_url = (api_endpoint or DEFAULT_API_ENDPOINT).rstrip('/') + '/gmail/v1/users/me'
+        # Same key as GmailService, so both pipelines share a user's bucket
+        self.rate_key = gmail_client_pool.key_for(credentials_dict, api_endpoint)
+        self.requests = 0
+    
+    async def get(self, path, params=None, units=1, stage='gmail.list'):
+        refreshed = False
+        for attempt in range(Config.GMAIL_MAX_RETRIES + 1):
+            if Config.GMAIL_RATE_LIMIT:
+                with span('gmail.quota_wait'):
+                    await gmail_rate_limiter.acquire_async(self.rate_key, units)
+            if not self.credentials.valid and self.credentials.refresh_token:
+                await asyncio.to_thread(self.credentials.refresh, Request())
+            headers = {'Authorization': f'Bearer {self.credentials.token}'}
+            
+            try:
+                with span(stage):
+                    async with self.session.get(self.base_url + path, params=params, headers=headers) as resp:
+                        self.requests += 1
+                        if resp.status == 200:
+                            return await resp.json()
+                        error = await self._error(resp)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                error = e
+            
+            if isinstance(error, GmailRequestError) and error.status == 401 \
+                    and self.credentials.refresh_token and not refreshed:
+                await asyncio.to_thread(self.credentials.refresh, Request())
+                refreshed = True
+                continue
+            
+            if isinstance(error, GmailRequestError) and error.rate_limited:
+                gmail_rate_limiter.throttled(self.rate_key, error.retry_after)
+            retryable = error.retryable if isinstance(error, GmailRequestError) else True
+            if attempt == Config.GMAIL_MAX_RETRIES or not retryable:
+                raise error
+            await asyncio.sleep(GmailService._backoff_delay(attempt, getattr(error, 'retry_after', 0)))
+    
+    @staticmethod
+    async def _error(resp):
+        try:
+            body = (await resp.json(content_type=None)).get('error', {})
+        except Exception:
+            body = {}
+        try:
+            retry_after = float(resp.headers.get('Retry-After', 0))
+        except ValueError:
+            retry_after = 0
+        reasons = [e.get('reason') for e in body.get('errors', []) if isinstance(e, dict)]
+        return GmailRequestError(resp.status, body.get('message', resp.reason), reasons, retry_after)
+    
+    async def get_message(self, message_id, fmt='full'):
+        params = [('format', fmt)]
+        if fmt == 'metadata':
+            params += [('metadataHeaders', name) for name in METADATA_HEADERS]
+        return await self.get(f'/messages/{message_id}', params, QUOTA_UNITS['messages.get'], 'gmail.get')
+
+
+class AsyncSyncPipeline:
+    """One user's sync as asyncio stages (list, fetch, parse, classify,
+    write) joined by bounded queues.
+    
+    There are concurrency fetchers, so that is the number of Gmail
+    requests in flight for this user. It comes from the users document's
+    sync_concurrency when set, else ASYNC_SYNC_CONCURRENCY. Full queues
+    block the stage feeding them, which keeps memory flat however large
+    the mailbox is.
+    """
+    
+    def __init__(self, credentials, force_refresh=False, progress=None, concurrency=None,
+                 api_endpoint=None, database=None):
+        if aiohttp is None:
+            raise RuntimeError('SYNC_PIPELINE=async needs aiohttp (pip install -r requirements-async.txt)')
+        if database is None and AsyncIOMotorClient is None:
+            raise RuntimeError('SYNC_PIPELINE=async needs motor (pip install -r requirements-async.txt)')
+        
+        self.credentials = credentials
+        self.force_refresh = force_refresh
+        self.progress = progress
+        self.concurrency = concurrency
+        self.api_endpoint = api_endpoint or Config.GMAIL_API_ENDPOINT
+        self.db = database
+        self.classifier = EmailClassifier()
+        
+        self.user_email = None
+        self.full_sync = True
+        self.truncated = False
+        # Messages dropped by _fetch; like truncated, they hold the cursor back
+        self.failed = 0
+        self.deadline = None
+        self.stored = 0
+        # Emails that weren't in the database before this sync
+        self.inserted = 0
+        self.write_errors = []
+        self.fetch_tiers = Counter()
+        self.bytes_saved = 0
+    
+    async def run(self):
+        mongo_client = None
+        if self.db is None:
+            mongo_client = AsyncIOMotorClient(Config.MONGODB_URI, serverSelectionTimeoutMS=5000)
+            self.db = mongo_client[Config.MONGODB_DB_NAME]
+        
+        try:
+            timeout = aiohttp.ClientTimeout(total=60)
+            async with aiohttp.ClientSession(timeout=timeout) as session:
+                gmail = AsyncGmailClient(session, self.credentials, self.api_endpoint)
+                
+                # Snapshot the profile before listing so the cursor never skips mail
+                profile = await gmail.get('/profile', units=QUOTA_UNITS['getProfile'], stage='gmail.profile')
+                self.user_email = profile['emailAddress']
+                user = await self.db.users.find_one(
+                    {'email': self.user_email}, {'history_id': 1, 'sync_concurrency': 1}
+                ) or {}
+                concurrency = self.concurrency or user.get('sync_concurrency') or Config.ASYNC_SYNC_CONCURRENCY
+                
+                if Config.SYNC_TIME_BUDGET:
+                    self.deadline = time.monotonic() + Config.SYNC_TIME_BUDGET
+                
+                queue_size = Config.ASYNC_SYNC_QUEUE_SIZE
+                ids = asyncio.Queue(queue_size)
+                raw = asyncio.Queue(queue_size)
+                parsed = asyncio.Queue(queue_size)
+                writes = asyncio.Queue(2)
+                
+                await _run_stages(
+                    [self._list(gmail, user.get('history_id'), ids, concurrency)] +
+                    [self._fetch(gmail, ids, raw) for _ in range(concurrency)] +
+                    [self._parse(raw, parsed, concurrency),
+                     self._classify(parsed, writes),
+                     self._write(writes)]
+                )
+            
+            if not (self.truncated or self.failed or self.write_errors):
+                await self.db.users.update_one(
+                    {'email': self.user_email},
+                    {'$set': {'history_id': profile.get('historyId'), 'last_sync_at': datetime.utcnow()}},
+                    upsert=True
+                )
+        finally:
+            if mongo_client is not None:
+                mongo_client.close()
+        
+        return {
+            'user_email': self.user_email,
+            'stored': self.stored,
+            'inserted': self.inserted,
+            'full_sync': self.full_sync,
+            'truncated': self.truncated,
+            'fetch_failures': self.failed,
+            'write_errors': self.write_errors,
+            'fetch_tiers': dict(self.fetch_tiers),
+            'bytes_saved': self.bytes_saved,
+            'gmail_requests': gmail.requests
+        }
+    
+    def _out_of_time(self):
+        if self.deadline and time.monotonic() >= self.deadline:
+            self.truncated = True
+        return self.truncated
+    
+    async def _list(self, gmail, history_id, ids, fetchers):
+        """Stage 1: message ids, from history.list or the job search"""
+        await self._list_ids(gmail, history_id, ids)
+        # Not in a finally: when a stage fails, _run_stages cancels the
+        # fetchers too, and waiting for room in a full ids queue would hang
+        for _ in range(fetchers):
+            await ids.put(_DONE)
+    
+    async def _list_ids(self, gmail, history_id, ids):
+        if history_id:
+            try:
+                message_ids = await self._list_added(gmail, history_id)
+                self.full_sync = False
+                for message_id in message_ids:
+                    await ids.put(message_id)
+                return
+            except HistoryExpired:
+                print(f"⚠️  History cursor {history_id} expired, running full sync")
+        
+        remaining = Config.SYNC_MAX_MESSAGES
+        page_token = None
+        while remaining > 0 and not self._out_of_time():
+            params = {'q': JOB_QUERY, 'maxResults': min(500, remaining)}
+            if page_token:
+                params['pageToken'] = page_token
+            results = await gmail.get('/messages', params, QUOTA_UNITS['messages.list'])
+            for message in results.get('messages', [])[:remaining]:
+                await ids.put(message['id'])
+                remaining -= 1
+            page_token = results.get('nextPageToken')
+            if not page_token:
+                break
+    
+    async def _list_added(self, gmail, history_id):
+        message_ids = []
+        seen = set()
+        page_token = None
+        while True:
+            params = {'startHistoryId': history_id, 'historyTypes': 'messageAdded', 'maxResults': 500}
+            if page_token:
+                params['pageToken'] = page_token
+            try:
+                results = await gmail.get('/history', params, QUOTA_UNITS['history.list'])
+            except GmailRequestError as e:
+                if e.status == 404:
+                    raise HistoryExpired(history_id) from e
+                raise
+            
+            for record in results.get('history', []):
+                for added in record.get('messagesAdded', []):
+                    message_id = added['message']['id']
+                    if message_id not in seen:
+                        seen.add(message_id)
+                        message_ids.append(message_id)
+            
+            page_token = results.get('nextPageToken')
+            if not page_token:
+                return message_ids
+    
+    async def _fetch(self, gmail, ids, raw):
+        """Stage 2 (concurrency copies): download messages, metadata first when tiered"""
+        while True:
+            message_id = await ids.get()
+            if message_id is _DONE:
+                await raw.put(_DONE)
+                return
+            if self._out_of_time():
+                continue  # drain what's left; the next sync picks it up
+            
+            try:
+                if not Config.GMAIL_TIERED_FETCH:
+                    await raw.put((await gmail.get_message(message_id), 'full', 0))
+                    continue
+                
+                message = await gmail.get_message(message_id, 'metadata')
+                try:
+                    email = parse_message(message)
+                except Exception as e:
+                    # One malformed message mustn't take the pipeline down
+                    print(f"⚠️  Could not parse message {message_id}: {e}")
+                    self.failed += 1
+                    continue
+                unsure = (GmailService._is_job_email(email) and
+                          not self.classifier.classify_with_confidence(email['subject'], email['snippet'])[1])
+                if unsure:
+                    await raw.put((await gmail.get_message(message_id), 'full', 0))
+                else:
+                    await raw.put((message, 'metadata', message.get('sizeEstimate', 0)))
+            except (GmailRequestError, aiohttp.ClientError, asyncio.TimeoutError) as e:
+                print(f"⚠️  Skipping message {message_id}: {e}")
+                # A message deleted since it was listed is not worth another sync
+                if not (isinstance(e, GmailRequestError) and e.status == 404):
+                    self.failed += 1
+    
+    async def _parse(self, raw, parsed, fetchers):
+        """Stage 3: MIME parsing, once every fetcher has finished"""
+        remaining = fetchers
+        while remaining:
+            item = await raw.get()
+            if item is _DONE:
+                remaining -= 1
+                continue
+            message, tier, bytes_saved = item
+            try:
+                with span('mime.parse'):
+                    email = parse_message(message)
+            except Exception as e:
+                print(f"⚠️  Could not parse message {message.get('id')}: {e}")
+                continue
+            email['fetch_tier'] = tier
+            email['bytes_saved'] = bytes_saved
+            await parsed.put(email)
+        await parsed.put(_DONE)
+    
+    async def _classify(self, parsed, writes):
+        """Stage 4: classify SYNC_CHUNK_SIZE emails at a time and build their upserts"""
+        done = False
+        while not done:
+            chunk = []
+            while len(chunk) < Config.SYNC_CHUNK_SIZE:
+                email = await parsed.get()
+                if email is _DONE:
+                    done = True
+                    break
+                # history.list returns every new message, the search only job mail
+                if self.full_sync or GmailService._is_job_email(email):
+                    chunk.append(email)
+            if not chunk:
+                continue
+            
+            existing = {
+                doc['gmail_id']: doc async for doc in self.db.emails.find(
+                    existing_query(self.user_email, chunk), EXISTING_PROJECTION
+                )
+            }
+            known = {
+                doc['sender']: doc['company'] async for doc in self.db.sender_companies.find(
+                    sender_query(self.user_email, {e.get('from', 'Unknown') for e in chunk}),
+                    {'sender': 1, 'company': 1, '_id': 0}
+                )
+            }
+            with span('company'):
+                companies, new_senders = resolve_companies(chunk, known)
+            if new_senders:
+                try:
+                    await self.db.sender_companies.bulk_write(
+                        sender_company_writes(self.user_email, new_senders), ordered=False
+                    )
+                except BulkWriteError:
+                    pass  # a concurrent sync stored the same sender first
+            
+            operations, added, removed = prepare_writes(
+                self.user_email, chunk, existing, self.classifier, self.force_refresh, companies
+            )
+            await writes.put((chunk, operations, added, removed))
+        await writes.put(_DONE)
+    
+    async def _write(self, writes):
+        """Stage 5: unordered bulk upserts, stats counters and progress"""
+        while True:
+            item = await writes.get()
+            if item is _DONE:
+                return
+            chunk, operations, added, removed = item
+            
+            with span('mongo.upsert'):
+                report = await self._bulk_write(operations)
+            self.write_errors.extend(report['errors'])
+            self.inserted += report['upserted']
+            if report['errors']:
+                await self.db.user_stats.delete_one({'_id': self.user_email})
+            else:
+                update = stats_update(added, removed)
+                if update:
+                    await self.db.user_stats.update_one({'_id': self.user_email}, update)
+            if operations:
+                await self.db.user_versions.update_one({'_id': self.user_email}, version_update(), upsert=True)
+                data_versions.forget(self.user_email)
+            
+            self.stored += len(chunk)
+            self.fetch_tiers.update(email['fetch_tier'] for email in chunk)
+            self.bytes_saved += sum(email['bytes_saved'] for email in chunk)
+            if self.progress:
+                # progress() does blocking pymongo I/O of its own
+                await asyncio.to_thread(self.progress, self.stored, self.inserted)
+    
+    async def _bulk_write(self, operations):
+        """database.bulk_write_batches on motor"""
+        batch_size = Config.MONGO_BULK_BATCH_SIZE
+        report = {'batches': 0, 'upserted': 0, 'modified': 0, 'errors': []}
+        
+        for start in range(0, len(operations), batch_size):
+            batch = operations[start:start + batch_size]
+            report['batches'] += 1
+            try:
+                result = await self.db.emails.bulk_write(batch, ordered=False)
+                details = result.bulk_api_result
+            except BulkWriteError as e:
+                details = e.details
+                write_errors = details.get('writeErrors', [])
+                report['errors'].append({
+                    'batch': report['batches'],
+                    'failed': len(write_errors),
+                    'message': write_errors[0].get('errmsg') if write_errors else str(e)
+                })
+            report['upserted'] += details.get('nUpserted', 0)
+            report['modified'] += details.get('nModified', 0)
+        
+        return report
+
+
+async def _run_stages(coroutines):
+    """Run pipeline stages together; if one fails the others are cancelled"""
+    tasks = [asyncio.ensure_future(coroutine) for coroutine in coroutines]
+    try:
+        await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+
+
+def run_sync_async(credentials, force_refresh=False, progress=None):
+    """Drop-in for sync_service.run_sync that runs the asyncio pipeline"""
+    return asyncio.run(AsyncSyncPipeline(credentials, force_refresh, progress).run())
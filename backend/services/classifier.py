@@ -1,7 +1,100 @@
+from concurrent.futures import ProcessPoolExecutor
+from collections import deque
+from itertools import islice
+from config import Config
+from functools import lru_cache
 import re
+import string
+
+# Punctuation becomes whitespace so phrases match on whole words only
+_PUNCTUATION = str.maketrans({ch: ' ' for ch in string.punctuation + '\u2018\u2019\u201c\u201d\u2013\u2014\u2026'})
+
+class KeywordMatcher:
+    """Scores a text against keyword lists in a single pass.
+    
+    In word-boundary mode the text is tokenized once and every keyword is
+    looked up through an index of first words, so 'offer' no longer
+    matches inside 'offered'. Plurals of a keyword's last word are folded
+    back onto it, so 'offers' and 'interviews next week' still count.
+    With word_boundaries=False keywords match as plain substrings, like
+    the original classifier.
+    """
+    
+    def __init__(self, keywords_by_label, word_boundaries=True):
+        self.labels = list(keywords_by_label)
+        self.word_boundaries = word_boundaries
+        
+        # keyword -> labels it counts towards
+        self._keywords = {}
+        for label, keywords in keywords_by_label.items():
+            for keyword in keywords:
+                self._keywords.setdefault(keyword.lower(), []).append(label)
+        
+        # first word -> [(keyword, padded phrase or None for single words)]
+        self._by_first_word = {}
+        # plural token -> the keyword word it folds onto
+        self._plurals = {}
+        keyword_words = set()
+        for keyword in self._keywords:
+            words = keyword.translate(_PUNCTUATION).split()
+            phrase = f" {' '.join(words)} " if len(words) > 1 else None
+            self._by_first_word.setdefault(words[0], []).append((keyword, phrase))
+            keyword_words.update(words)
+            for plural in (words[-1] + 's', words[-1] + 'es'):
+                self._plurals.setdefault(plural, words[-1])
+        self._first_words = frozenset(self._by_first_word)
+        # A word that is itself part of a keyword is never folded
+        for word in keyword_words:
+            self._plurals.pop(word, None)
+        self._plural_words = frozenset(self._plurals)
+    
+    def find(self, text):
+        """Set of keywords present in text"""
+        text = text.lower()
+        if not self.word_boundaries:
+            return {kw for kw in self._keywords if kw in text}
+        
+        tokens = text.translate(_PUNCTUATION).split()
+        if not self._plural_words.isdisjoint(tokens):
+            plurals = self._plurals
+            tokens = [plurals.get(token, token) for token in tokens]
+        found = set()
+        joined = None
+        for word in self._first_words.intersection(tokens):
+            for keyword, phrase in self._by_first_word[word]:
+                if phrase is None:
+                    found.add(keyword)
+                    continue
+                if joined is None:
+                    joined = f" {' '.join(tokens)} "
+                if phrase in joined:
+                    found.add(keyword)
+        return found
+    
+    def scores(self, text):
+        """Number of distinct keywords matched per label"""
+        scores = dict.fromkeys(self.labels, 0)
+        for keyword in self.find(text):
+            for label in self._keywords[keyword]:
+                scores[label] += 1
+        return scores
+
+@lru_cache(maxsize=8)
+def _compile_matcher(rejection, selection, pending, word_boundaries):
+    return KeywordMatcher({
+        'Rejection': rejection,
+        'Selection': selection,
+        'Pending': pending
+    }, word_boundaries=word_boundaries)
+
+def _classify_chunk(keywords, word_boundaries, pairs):
+    """Process pool entry point: classify a chunk of (subject, body) pairs"""
+    classifier = EmailClassifier(word_boundaries=word_boundaries)
+    classifier.matcher = _compile_matcher(*keywords, word_boundaries)
+    return [classifier.classify(subject, body) for subject, body in pairs]
 
 class EmailClassifier:
-    def __init__(self):
+    def __init__(self, word_boundaries=None):
         self.rejection_keywords = [
             'regret', 'unfortunately', 'not selected', 'not moving forward',
             'decided to pursue', 'other candidates', 'not a fit', 'decline',
@@ -22,22 +115,23 @@ class EmailClassifier:
             'application submitted', 'will be in touch', 'currently reviewing',
             'being reviewed', 'considering', 'processing', 'evaluating'
         ]
+        
+        if word_boundaries is None:
+            word_boundaries = Config.CLASSIFIER_WORD_BOUNDARIES
+        self.word_boundaries = word_boundaries
+        
+        # Compiled once per keyword set and shared by every classifier instance
+        self.matcher = _compile_matcher(
+            tuple(self.rejection_keywords),
+            tuple(self.selection_keywords),
+            tuple(self.pending_keywords),
+            word_boundaries
+        )
     
     def classify(self, subject, body):
         """Classify email based on subject and body content"""
-        text = f"{subject} {body}".lower()
-        
-        # Count keyword matches
-        rejection_score = sum(1 for kw in self.rejection_keywords if kw in text)
-        selection_score = sum(1 for kw in self.selection_keywords if kw in text)
-        pending_score = sum(1 for kw in self.pending_keywords if kw in text)
-        
-        # Determine classification
-        scores = {
-            'Rejection': rejection_score,
-            'Selection': selection_score,
-            'Pending': pending_score
-        }
+        # Count keyword matches for every category in one pass
+        scores = self.matcher.scores(f"{subject} {body}")
         
         max_score = max(scores.values())
         
@@ -46,3 +140,58 @@ class EmailClassifier:
         
         # Return category with highest score
         return max(scores, key=scores.get)
+    
+    def classify_with_confidence(self, subject, body):
+        """classify() plus whether the winning label beat the runner-up by
+        at least CLASSIFIER_MIN_MARGIN keywords (no match or a tie is unsure)"""
+        scores = self.matcher.scores(f"{subject} {body}")
+        top, runner_up = sorted(scores.values(), reverse=True)[:2]
+        
+        if top == 0:
+            return 'Pending', False
+        
+        return max(scores, key=scores.get), top - runner_up >= Config.CLASSIFIER_MIN_MARGIN
+    
+    def classify_many(self, emails, processes=None, chunk_size=None, threshold=None):
+        """Classify an iterable of (subject, body) pairs, yielding labels in input order.
+        
+        Small inputs are classified inline. Once more than threshold pairs
+        have been read, the rest is fanned out to a process pool in chunks,
+        with a bounded number of chunks in flight so huge inputs stream
+        through in constant memory.
+        """
+        processes = processes or Config.CLASSIFIER_PROCESSES
+        chunk_size = chunk_size or Config.CLASSIFIER_CHUNK_SIZE
+        threshold = Config.CLASSIFIER_PARALLEL_THRESHOLD if threshold is None else threshold
+        
+        emails = iter(emails)
+        head = list(islice(emails, threshold + 1))
+        if len(head) <= threshold or processes <= 1:
+            for subject, body in head:
+                yield self.classify(subject, body)
+            for subject, body in emails:
+                yield self.classify(subject, body)
+            return
+        
+        keywords = (tuple(self.rejection_keywords), tuple(self.selection_keywords), tuple(self.pending_keywords))
+        chunks = self._chunks(head, emails, chunk_size)
+        
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            pending = deque()
+            for chunk in chunks:
+                pending.append(pool.submit(_classify_chunk, keywords, self.word_boundaries, chunk))
+                # Keep a couple of chunks queued per process, no more
+                if len(pending) >= processes * 2:
+                    yield from pending.popleft().result()
+            while pending:
+                yield from pending.popleft().result()
+    
+    @staticmethod
+    def _chunks(head, rest, chunk_size):
+        for start in range(0, len(head), chunk_size):
+            yield head[start:start + chunk_size]
+        while True:
+            chunk = list(islice(rest, chunk_size))
+            if not chunk:
+                return
+            yield chunk
@@ -0,0 +1,146 @@
+from googleapiclient.discovery import build_from_document
+from googleapiclient import discovery_cache
+from services.credentials_manager import credentials_from_dict
+from collections import OrderedDict
+from functools import lru_cache
+from config import Config
+import hashlib
+import json
+import threading
+import time
+
+
+@lru_cache(maxsize=None)
+def discovery_document():
+    """Gmail discovery document bundled with googleapiclient, parsed once.
+
+    build() re-reads and re-parses this file on every call; sharing the
+    parsed dict makes building a client nearly free and never touches the
+    network.
+    """
+    return json.loads(discovery_cache.get_static_doc('gmail', 'v1'))
+
+
+class PooledClient:
+    """A built Gmail service and the credentials its HTTP transport signs with"""
+
+    def __init__(self, key, credentials, service):
+        self.key = key
+        self.credentials = credentials
+        self.service = service
+        self.created_at = time.monotonic()
+
+
+class GmailClientPool:
+    """Process-wide pool of built Gmail clients keyed by OAuth grant.
+
+    httplib2 transports aren't thread-safe, so a client is checked out by
+    one caller at a time and returned with release(); idle clients keep
+    their open connections for the next request. Idle clients expire after
+    ttl seconds and the least recently used grants are evicted once more
+    than maxsize clients are idle.
+    """
+
+    def __init__(self, maxsize=None, ttl=None):
+        self.maxsize = maxsize or Config.GMAIL_CLIENT_POOL_SIZE
+        self.ttl = ttl or Config.GMAIL_CLIENT_POOL_TTL
+        self._idle = OrderedDict()  # key -> [PooledClient]
+        self._idle_count = 0
+        self._lock = threading.Lock()
+        self._stats = {
+            'hits': 0,
+            'misses': 0,
+            'evictions': 0,
+            'expired': 0,
+            'token_rotations': 0,
+            'builds': 0,
+            'build_seconds_total': 0.0,
+            'build_seconds_max': 0.0
+        }
+
+    @staticmethod
+    def key_for(credentials_dict, api_endpoint=None):
+        grant = credentials_dict.get('refresh_token') or credentials_dict.get('token') or ''
+        raw = f"{credentials_dict.get('client_id')}|{grant}|{api_endpoint or ''}"
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def acquire(self, credentials_dict, api_endpoint=None):
+        """Check out an idle client for this grant, building one if needed"""
+        key = self.key_for(credentials_dict, api_endpoint)
+        token = credentials_dict.get('token')
+        now = time.monotonic()
+
+        with self._lock:
+            clients = self._idle.get(key)
+            while clients:
+                client = clients.pop()
+                self._idle_count -= 1
+                if now - client.created_at > self.ttl:
+                    self._stats['expired'] += 1
+                    continue
+                if client.credentials.token != token and not client.credentials.valid:
+                    # The caller holds a newer access token than our expired one
+                    client.credentials.token = token
+                    client.credentials.expiry = credentials_dict.get('expiry')
+                    self._stats['token_rotations'] += 1
+                self._stats['hits'] += 1
+                self._idle.move_to_end(key)
+                return client
+            self._stats['misses'] += 1
+
+        return self._build(key, credentials_dict, api_endpoint)
+
+    def release(self, client):
+        """Return a client to the pool for reuse"""
+        if time.monotonic() - client.created_at > self.ttl:
+            return
+        with self._lock:
+            self._idle.setdefault(client.key, []).append(client)
+            self._idle.move_to_end(client.key)
+            self._idle_count += 1
+            while self._idle_count > self.maxsize:
+                oldest_key, oldest = next(iter(self._idle.items()))
+                oldest.pop(0)
+                self._idle_count -= 1
+                self._stats['evictions'] += 1
+                if not oldest:
+                    del self._idle[oldest_key]
+
+    def clear(self):
+        with self._lock:
+            self._idle.clear()
+            self._idle_count = 0
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['idle'] = self._idle_count
+            stats['grants'] = len(self._idle)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_ratio'] = round(stats['hits'] / lookups, 3) if lookups else None
+        stats['build_seconds_avg'] = (
+            stats['build_seconds_total'] / stats['builds'] if stats['builds'] else None
+        )
+        return stats
+
+    def _build(self, key, credentials_dict, api_endpoint):
+        start = time.perf_counter()
+        credentials = credentials_from_dict(credentials_dict)
+        client_options = {'api_endpoint': api_endpoint} if api_endpoint else None
+        service = build_from_document(
+            discovery_document(),
+            credentials=credentials,
+            client_options=client_options
+        )
+        elapsed = time.perf_counter() - start
+
+        with self._lock:
+            self._stats['builds'] += 1
+            self._stats['build_seconds_total'] += elapsed
+            self._stats['build_seconds_max'] = max(self._stats['build_seconds_max'], elapsed)
+
+        return PooledClient(key, credentials, service)
+
+
+# Create a single pool instance
+gmail_client_pool = GmailClientPool()
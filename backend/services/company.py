@@ -0,0 +1,211 @@
+from functools import lru_cache
+from pymongo import UpdateOne
+from config import Config
+from datetime import datetime
+import json
+import re
+
+# "Display Name <user@domain>", the name optionally quoted
+_SENDER_RE = re.compile(r'^\s*"?(?P<name>[^"<]*?)"?\s*<(?P<address>[^>]*)>')
+_ADDRESS_RE = re.compile(r'(?P<local>[^\s<>@"]+)@(?P<domain>[^\s<>@"]+)')
+# "Thank you for applying to Acme", "Your interview at Acme Corp", ...
+_SUBJECT_COMPANY_RE = re.compile(
+    r"\b(?:applying|applied|application|interest|interview|role|position|opportunity|offer)"
+    r"\b.*?\b(?:to|at|with|from|in)\s+(?P<company>[A-Z][\w&.'-]*(?:\s+[A-Z][\w&.'-]*){0,3})"
+)
+# What ATS senders put after the company: "Acme via Greenhouse", "Acme Hiring Team"
+_NAME_VIA_RE = re.compile(r'\s+(?:via|[-|@])\s+.*$', re.IGNORECASE)
+_NAME_TEAM_RE = re.compile(
+    r'(?:\s+(?:hiring|recruiting|recruitment|talent|acquisition|careers?|jobs|people|team|hr))+$',
+    re.IGNORECASE
+)
+
+FREEMAIL_DOMAINS = {'gmail', 'googlemail', 'yahoo', 'outlook', 'hotmail', 'live', 'mail', 'icloud',
+                    'aol', 'proton', 'protonmail', 'gmx'}
+# Applicant tracking systems send on behalf of the company that is hiring
+ATS_DOMAINS = {
+    'greenhouse.io', 'greenhouse-mail.io', 'lever.co', 'myworkday.com', 'workday.com',
+    'smartrecruiters.com', 'smartrecruiters.net', 'ashbyhq.com', 'icims.com', 'jobvite.com',
+    'taleo.net', 'successfactors.com', 'bamboohr.com', 'workable.com', 'workablemail.com',
+    'recruitee.com', 'breezy.hr', 'applytojob.com', 'jazzhr.com', 'teamtailor.com',
+    'personio.de', 'rippling.com', 'eightfold.ai'
+}
+# Workday sends from tenant@myworkday.com
+ATS_TENANT_LOCAL_PARTS = {'myworkday.com'}
+# Labels that are never the company: ATS regions, mail hosts, no-reply boxes
+GENERIC_LABELS = {
+    'us', 'eu', 'uk', 'mail', 'email', 'e', 'hire', 'jobs', 'careers', 'career', 'talent', 'apply',
+    'notifications', 'notification', 'noreply', 'no-reply', 'donotreply', 'do-not-reply', 'reply',
+    'recruiting', 'recruitment', 'hiring', 'people', 'hr', 'info', 'hello', 'team', 'support',
+    'news', 'www', 'app', 'em', 'ashby', 'sap'
+}
+_WORKDAY_POD_RE = re.compile(r'^wd\d+$')
+# Second-level labels under a country code: acme.co.uk is "acme"
+_SECOND_LEVEL = {'co', 'com', 'net', 'org', 'ac', 'gov'}
+
+
+def parse_sender(sender):
+    """Split a From header into (display name, local part, domain), all lowercase but the name"""
+    name, address = '', sender or ''
+    match = _SENDER_RE.match(address)
+    if match:
+        name, address = match.group('name').strip(), match.group('address')
+    match = _ADDRESS_RE.search(address)
+    if not match:
+        return name, '', ''
+    return name, match.group('local').lower(), match.group('domain').lower().rstrip('.')
+
+def company_from_subject(subject):
+    """Company named in an ATS subject line, or None"""
+    match = _SUBJECT_COMPANY_RE.search(subject or '')
+    if not match:
+        return None
+    return match.group('company').rstrip(".'-") or None
+
+def _clean_name(name):
+    return _NAME_TEAM_RE.sub('', _NAME_VIA_RE.sub('', name)).strip(' -|,')
+
+
+class CompanyResolver:
+    """Resolves a sender to the company behind it.
+    
+    In order: the domain index (exact domain or a parent domain), ATS
+    rules, the display name, then the domain's registrable label. Senders
+    are memoized in an LRU; an ATS sender whose name doesn't identify the
+    company resolves to None and the caller falls back to the subject.
+    """
+    
+    def __init__(self, index_file=None, memo_size=None):
+        self.domains = {}
+        self.ats_domains = set(ATS_DOMAINS)
+        self.freemail = set(FREEMAIL_DOMAINS)
+        self._ats_names = {domain.split('.')[0] for domain in self.ats_domains}
+        self.resolve_sender = lru_cache(maxsize=memo_size or Config.COMPANY_MEMO_SIZE)(self._resolve_sender)
+        index_file = index_file or Config.COMPANY_INDEX_FILE
+        if index_file:
+            self.load_index(index_file)
+    
+    def load_index(self, path):
+        """Merge a JSON index: {"domains": {domain: company}, "ats_domains": [...], "freemail": [...]}"""
+        with open(path) as f:
+            index = json.load(f)
+        self.domains.update({domain.lower(): company for domain, company in index.get('domains', {}).items()})
+        self.ats_domains.update(domain.lower() for domain in index.get('ats_domains', []))
+        self.freemail.update(label.lower() for label in index.get('freemail', []))
+        self._ats_names = {domain.split('.')[0] for domain in self.ats_domains}
+        self.resolve_sender.cache_clear()
+        print(f"✅ Company index loaded: {len(self.domains)} domains, {len(self.ats_domains)} ATS domains")
+    
+    def resolve(self, sender, subject=''):
+        """Company name for a sender, 'Unknown' when nothing identifies one"""
+        company = self.resolve_sender(sender)
+        if company is None:
+            company = company_from_subject(subject) or 'Unknown'
+        return company
+    
+    def _resolve_sender(self, sender):
+        name, local, domain = parse_sender(sender)
+        
+        for suffix in self._suffixes(domain):
+            if suffix in self.domains:
+                return self.domains[suffix]
+            if suffix in self.ats_domains:
+                return self._resolve_ats(name, local, domain, suffix)
+        
+        company = self._name_company(name)
+        if company:
+            return company
+        if not domain:
+            return 'Unknown'
+        
+        label = self._registrable_label(domain)
+        if not label or label in self.freemail:
+            return 'Unknown'
+        return label.capitalize()
+    
+    def _name_company(self, name):
+        """The display name without 'via X'/'Hiring Team', '' if that leaves
+        nothing or only a generic word like 'Careers' or 'Jobs'"""
+        cleaned = _clean_name(name) if '@' not in name else ''
+        if cleaned and not self._is_generic(cleaned):
+            return cleaned
+        return ''
+    
+    def _resolve_ats(self, name, local, domain, ats_domain):
+        company = self._name_company(name)
+        if company:
+            return company
+        
+        # Tenant subdomains: acme.wd5.myworkday.com, acme.bamboohr.com
+        for label in domain[:-len(ats_domain)].rstrip('.').split('.'):
+            if label and not self._is_generic(label) and not _WORKDAY_POD_RE.match(label):
+                return label.capitalize()
+        if ats_domain in ATS_TENANT_LOCAL_PARTS and not self._is_generic(local):
+            return local.capitalize()
+        return None
+    
+    def _is_generic(self, word):
+        word = word.lower()
+        return word in GENERIC_LABELS or word in self._ats_names
+    
+    @staticmethod
+    def _suffixes(domain):
+        """domain and its parents, most specific first: a.b.com, b.com"""
+        labels = domain.split('.')
+        return ['.'.join(labels[i:]) for i in range(len(labels) - 1)]
+    
+    @staticmethod
+    def _registrable_label(domain):
+        labels = domain.split('.')
+        if len(labels) >= 3 and labels[-2] in _SECOND_LEVEL and len(labels[-1]) == 2:
+            return labels[-3]
+        return labels[-2] if len(labels) >= 2 else labels[0]
+    
+    def stats(self):
+        info = self.resolve_sender.cache_info()
+        return {'size': info.currsize, 'maxsize': info.maxsize, 'hits': info.hits, 'misses': info.misses}
+
+
+# Create a single resolver instance
+company_resolver = CompanyResolver()
+
+def extract_company(sender, subject=''):
+    """Extract company name from email sender"""
+    return company_resolver.resolve(sender, subject)
+
+def sender_query(user_email, senders):
+    return {'user_email': user_email, 'sender': {'$in': list(senders)}}
+
+def resolve_companies(messages, known):
+    """Company for each message, by gmail id.
+    
+    known maps sender to the company already stored for this user (None
+    for ATS senders that need the subject). Returns (companies, new) where
+    new holds the senders resolved here, to be persisted.
+    """
+    companies = {}
+    new = {}
+    for msg in messages:
+        sender = msg.get('from', 'Unknown')
+        if sender in known:
+            company = known[sender]
+        elif sender in new:
+            company = new[sender]
+        else:
+            company = new[sender] = company_resolver.resolve_sender(sender)
+        if company is None:
+            company = company_from_subject(msg.get('subject', '')) or 'Unknown'
+        companies[msg['id']] = company
+    return companies, new
+
+def sender_company_writes(user_email, new):
+    """Upserts persisting newly resolved senders for user_email"""
+    now = datetime.utcnow()
+    return [
+        UpdateOne(
+            {'user_email': user_email, 'sender': sender},
+            {'$set': {'company': company, 'resolved_at': now}},
+            upsert=True
+        )
+        for sender, company in new.items()
+    ]
@@ -0,0 +1,168 @@
+from google.oauth2.credentials import Credentials
+from services.cache import TTLCache
+from database import db
+from config import Config
+from datetime import datetime, timedelta
+import hashlib
+import threading
+import time
+
+# A token this close to expiry is treated as expired, like google-auth does
+REFRESH_MARGIN = timedelta(minutes=5)
+
+
+class ManagedCredentials(Credentials):
+    """Credentials whose refresh goes through the credentials manager.
+    
+    google-auth refreshes from several places (before a request once the
+    expiry passes, after a 401); all of them end up here, so a grant is
+    refreshed once however many clients hold a copy of it.
+    """
+    
+    def refresh(self, request):
+        credentials_manager.refresh(self, request)
+    
+    def _refresh_now(self, request):
+        super().refresh(request)
+
+
+def credentials_from_dict(credentials_dict):
+    return ManagedCredentials(**credentials_dict)
+
+def _fresh(expiry, now=None):
+    return expiry is not None and expiry - REFRESH_MARGIN > (now or datetime.utcnow())
+
+
+class CredentialsManager:
+    """Latest access token per OAuth grant, refreshed at most once per expiry.
+    
+    Refreshes take a per-grant lock (striped, so memory stays bounded);
+    callers that queued behind a refresh reuse its token instead of
+    calling the token endpoint again. New tokens are persisted in the
+    oauth_tokens collection, so other workers pick them up before
+    refreshing themselves.
+    """
+    
+    def __init__(self, maxsize=None, stripes=64):
+        self._tokens = TTLCache(maxsize=maxsize or Config.CREDENTIALS_CACHE_SIZE, ttl=3600)
+        self._locks = [threading.Lock() for _ in range(stripes)]
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            'refreshes': 0,
+            'refresh_failures': 0,
+            'refresh_ms_total': 0.0,
+            'refresh_ms_max': 0.0,
+            'coalesced': 0,
+            'shared': 0
+        }
+    
+    @staticmethod
+    def key_for(client_id, refresh_token):
+        return hashlib.sha256(f"{client_id}|{refresh_token}".encode('utf-8')).hexdigest()
+    
+    def current(self, credentials_dict):
+        """credentials_dict with the newest token this process knows of.
+        
+        Returns the same dict when nothing newer is known, so callers can
+        tell whether to write it back to the session.
+        """
+        refresh_token = credentials_dict.get('refresh_token')
+        if not refresh_token:
+            return credentials_dict
+        entry = self._tokens.get(self.key_for(credentials_dict.get('client_id'), refresh_token))
+        if entry is None or entry[0] == credentials_dict.get('token'):
+            return credentials_dict
+        known_expiry = credentials_dict.get('expiry')
+        if known_expiry is not None and (entry[1] is None or known_expiry >= entry[1]):
+            return credentials_dict
+        return dict(credentials_dict, token=entry[0], expiry=entry[1])
+    
+    def refresh(self, credentials, request):
+        """Give credentials a valid token, calling the token endpoint only if nobody else has"""
+        if not credentials.refresh_token:
+            credentials._refresh_now(request)
+            return
+        
+        key = self.key_for(credentials.client_id, credentials.refresh_token)
+        stale_token = credentials.token
+        with self._locks[int(key[:8], 16) % len(self._locks)]:
+            # Refreshed by another thread while we waited for the lock
+            entry = self._tokens.get(key)
+            if entry and entry[0] != stale_token and _fresh(entry[1]):
+                credentials.token, credentials.expiry = entry
+                self._count('coalesced')
+                return
+            
+            # ... or by another worker process
+            doc = self._load(key)
+            if doc and doc['token'] != stale_token and _fresh(doc['expiry']):
+                credentials.token, credentials.expiry = doc['token'], doc['expiry']
+                self._remember(key, credentials)
+                self._count('shared')
+                return
+            
+            start = time.perf_counter()
+            try:
+                credentials._refresh_now(request)
+            except Exception:
+                self._count('refresh_failures')
+                raise
+            elapsed = (time.perf_counter() - start) * 1000
+            with self._stats_lock:
+                self._stats['refreshes'] += 1
+                self._stats['refresh_ms_total'] += elapsed
+                self._stats['refresh_ms_max'] = max(self._stats['refresh_ms_max'], elapsed)
+            
+            self._remember(key, credentials)
+            self._save(key, credentials)
+    
+    def forget(self, credentials_dict):
+        """Drop a grant's token, e.g. at logout"""
+        if credentials_dict.get('refresh_token'):
+            key = self.key_for(credentials_dict.get('client_id'), credentials_dict['refresh_token'])
+            self._tokens.pop(key)
+            if db.oauth_tokens is not None:
+                db.oauth_tokens.delete_one({'_id': key})
+    
+    def _remember(self, key, credentials):
+        ttl = (credentials.expiry - datetime.utcnow()).total_seconds() if credentials.expiry else 3600
+        self._tokens.set(key, (credentials.token, credentials.expiry), ttl=max(ttl, 1))
+    
+    @staticmethod
+    def _load(key):
+        try:
+            collection = db.oauth_tokens
+            return collection.find_one({'_id': key}) if collection is not None else None
+        except Exception as e:
+            print(f"⚠️  Could not read shared token: {e}")
+            return None
+    
+    @staticmethod
+    def _save(key, credentials):
+        try:
+            collection = db.oauth_tokens
+            if collection is not None:
+                collection.replace_one(
+                    {'_id': key},
+                    {'token': credentials.token, 'expiry': credentials.expiry, 'updated_at': datetime.utcnow()},
+                    upsert=True
+                )
+        except Exception as e:
+            print(f"⚠️  Could not persist refreshed token: {e}")
+    
+    def _count(self, name):
+        with self._stats_lock:
+            self._stats[name] += 1
+    
+    def stats(self):
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats['grants'] = len(self._tokens)
+        stats['refresh_ms_avg'] = (
+            round(stats['refresh_ms_total'] / stats['refreshes'], 3) if stats['refreshes'] else None
+        )
+        return stats
+
+
+# Create a single manager instance
+credentials_manager = CredentialsManager()
@@ -1,85 +1,410 @@
-from google.oauth2.credentials import Credentials
-from googleapiclient.discovery import build
+from googleapiclient.errors import HttpError
+from googleapiclient.http import BatchHttpRequest
 from email.utils import parsedate_to_datetime
-import base64
+from services.client_pool import gmail_client_pool
+from services.mime import parse_message, mime_parser
+from services.classifier import EmailClassifier
+from services.rate_limiter import gmail_rate_limiter, QUOTA_UNITS
+from services.instrumentation import span
+from config import Config
+import random
+import re
+import time
+
+# Gmail answers quota pressure with 429/403 and transient outages with 5xx
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+RATE_LIMIT_REASONS = {'rateLimitExceeded', 'userRateLimitExceeded'}
+RETRYABLE_REASONS = RATE_LIMIT_REASONS | {'backendError'}
+
+DEFAULT_API_ENDPOINT = 'https://gmail.googleapis.com/'
+
+JOB_SUBJECT_TERMS = [
+    'application', 'interview', 'position', 'job', 'opportunity', 'career',
+    'hiring', 'recruitment', 'candidate', 'role', 'offer'
+]
+JOB_QUERY = f"subject:({' OR '.join(JOB_SUBJECT_TERMS)}) newer_than:6m"
+# Local equivalent of the subject: search, for messages found via history.list
+JOB_SUBJECT_RE = re.compile(r'\b(?:' + '|'.join(JOB_SUBJECT_TERMS) + r')\b', re.IGNORECASE)
+EXCLUDED_LABELS = {'SPAM', 'TRASH', 'DRAFT'}
+# All the metadata tier asks for; enough to filter and classify with the snippet
+METADATA_HEADERS = ['Subject', 'From', 'Date']
+
+
+class HistoryExpired(Exception):
+    """The stored historyId is older than the history Gmail keeps"""
+
 
 class GmailService:
-    def __init__(self, credentials_dict):
-        self.credentials = Credentials(**credentials_dict)
-        self.service = build('gmail', 'v1', credentials=self.credentials)
+    def __init__(self, credentials_dict, api_endpoint=None):
+        endpoint = api_endpoint or Config.GMAIL_API_ENDPOINT
+        # Built clients (and their open connections) are reused across requests
+        self._client = gmail_client_pool.acquire(credentials_dict, endpoint)
+        self.credentials = self._client.credentials
+        self.service = self._client.service
+        # Quota is tracked per Gmail account, which the pool key identifies
+        self.rate_key = self._client.key
+        # The discovery document hard-codes the batch URI, so derive it ourselves
+        self.batch_uri = (endpoint or DEFAULT_API_ENDPOINT).rstrip('/') + '/batch/gmail/v1'
+        self.truncated = False
+        # Messages dropped after their retries ran out; they stay behind the cursor
+        self.failed = 0
+        self.classifier = EmailClassifier()
+    
+    def close(self):
+        """Hand the underlying client back to the pool"""
+        if self._client is not None:
+            gmail_client_pool.release(self._client)
+            self._client = None
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
     
     def get_user_info(self):
         """Get user's Gmail profile information"""
-        return self.service.users().getProfile(userId='me').execute()
-    
-    def fetch_job_emails(self, max_results=50):
-        """Fetch job-related emails from Gmail"""
-        query = (
-            'subject:(application OR interview OR position OR job OR opportunity OR '
-            'career OR hiring OR recruitment OR candidate OR role OR offer) '
-            'newer_than:6m'
-        )
+        self._throttle(QUOTA_UNITS['getProfile'])
+        with span('gmail.profile'):
+            return self.service.users().getProfile(userId='me').execute()
+    
+    def fetch_job_emails(self, max_results=50, batch_size=None):
+        """Fetch job-related emails from Gmail.
         
-        try:
-            results = self.service.users().messages().list(
-                userId='me',
-                q=query,
-                maxResults=max_results
-            ).execute()
-            
-            messages = results.get('messages', [])
-            emails = []
-            
-            for message in messages:
-                msg = self.service.users().messages().get(
+        Errors propagate: an empty list used to hide quota exhaustion and
+        auth failures behind what looked like an empty mailbox.
+        """
+        return list(self.iter_job_emails(max_messages=max_results, batch_size=batch_size))
+    
+    def iter_job_emails(self, max_messages=None, time_budget=None, batch_size=None, page_size=500):
+        """Yield parsed job emails across every page of the search window.
+        
+        Follows nextPageToken until max_messages have been listed or
+        time_budget seconds have passed, fetching one batch at a time so
+        only a batch of bodies is held in memory. Sets self.truncated
+        when the time budget cut the sync short, and counts messages that
+        could not be fetched in self.failed.
+        """
+        deadline = time.monotonic() + time_budget if time_budget else None
+        self.truncated = False
+        self.failed = 0
+        
+        for message_ids in self._iter_job_message_id_pages(max_messages, page_size):
+            yield from self._iter_messages(message_ids, batch_size, deadline)
+            if self.truncated:
+                return
+    
+    def sync_job_emails(self, start_history_id=None, max_results=None, time_budget=None, batch_size=None):
+        """Fetch job emails for a refresh, incrementally when possible.
+        
+        With start_history_id only messages added since that point are
+        fetched; otherwise, or when Gmail has expired the cursor, the full
+        search window is listed. Returns (emails iterator, full_sync).
+        Errors are raised so callers never advance their cursor past a
+        failed sync.
+        """
+        if start_history_id:
+            try:
+                message_ids = self._list_added_message_ids(start_history_id)
+                deadline = time.monotonic() + time_budget if time_budget else None
+                self.truncated = False
+                self.failed = 0
+                emails = self._iter_messages(message_ids, batch_size, deadline)
+                return (e for e in emails if self._is_job_email(e)), False
+            except HistoryExpired:
+                print(f"⚠️  History cursor {start_history_id} expired, running full sync")
+        
+        return self.iter_job_emails(max_results, time_budget, batch_size), True
+    
+    def _iter_job_message_id_pages(self, max_messages=None, page_size=500):
+        """Yield pages of matching message ids, newest first"""
+        remaining = max_messages
+        page_token = None
+        
+        while remaining is None or remaining > 0:
+            self._throttle(QUOTA_UNITS['messages.list'])
+            with span('gmail.list'):
+                results = self.service.users().messages().list(
                     userId='me',
-                    id=message['id'],
-                    format='full'
+                    q=JOB_QUERY,
+                    maxResults=page_size if remaining is None else min(page_size, remaining),
+                    pageToken=page_token
                 ).execute()
-                
-                email_data = self._parse_message(msg)
-                emails.append(email_data)
             
-            return emails
+            message_ids = [m['id'] for m in results.get('messages', [])]
+            if message_ids:
+                yield message_ids
+            
+            if remaining is not None:
+                remaining -= len(message_ids)
+            page_token = results.get('nextPageToken')
+            if not page_token:
+                return
+    
+    def _iter_messages(self, message_ids, batch_size=None, deadline=None):
+        """Fetch message_ids one batch at a time, yielding as each arrives"""
+        if batch_size is None:
+            batch_size = Config.GMAIL_BATCH_SIZE
+        step = max(batch_size, 1)
+        
+        for start in range(0, len(message_ids), step):
+            if deadline and time.monotonic() >= deadline:
+                print(f"⚠️  Sync time budget exhausted, {len(message_ids) - start} messages left for next run")
+                self.truncated = True
+                return
+            yield from self._fetch_messages(message_ids[start:start + step], batch_size)
+    
+    def _list_added_message_ids(self, start_history_id):
+        """Ids of messages added since start_history_id, oldest first"""
+        message_ids = []
+        seen = set()
+        page_token = None
+        
+        while True:
+            self._throttle(QUOTA_UNITS['history.list'])
+            try:
+                with span('gmail.list'):
+                    results = self.service.users().history().list(
+                        userId='me',
+                        startHistoryId=start_history_id,
+                        historyTypes='messageAdded',
+                        maxResults=500,
+                        pageToken=page_token
+                    ).execute()
+            except HttpError as e:
+                if e.resp.status == 404:
+                    raise HistoryExpired(start_history_id) from e
+                raise
+            
+            for record in results.get('history', []):
+                for added in record.get('messagesAdded', []):
+                    message_id = added['message']['id']
+                    if message_id not in seen:
+                        seen.add(message_id)
+                        message_ids.append(message_id)
             
+            page_token = results.get('nextPageToken')
+            if not page_token:
+                return message_ids
+    
+    @staticmethod
+    def _is_job_email(email):
+        if EXCLUDED_LABELS.intersection(email.get('labels', [])):
+            return False
+        return bool(JOB_SUBJECT_RE.search(email.get('subject', '')))
+    
+    def _fetch_messages(self, message_ids, batch_size=None):
+        if Config.GMAIL_TIERED_FETCH:
+            return self.fetch_messages_tiered(message_ids, batch_size)
+        return self._fetch_format(message_ids, batch_size, 'full')
+    
+    def fetch_messages_tiered(self, message_ids, batch_size=None):
+        """Fetch headers and snippets first, full bodies only where needed.
+        
+        Each message is classified from its subject and Gmail snippet; job
+        emails the classifier isn't sure about are fetched again in full.
+        Metadata-only emails record bytes_saved, Gmail's sizeEstimate of
+        the message we didn't download.
+        """
+        emails = self._fetch_format(message_ids, batch_size, 'metadata')
+        
+        with span('classify'):
+            unsure = [
+                e['id'] for e in emails
+                if self._is_job_email(e)
+                and not self.classifier.classify_with_confidence(e['subject'], e['snippet'])[1]
+            ]
+        # Unsure ones whose full fetch fails are still stored from metadata
+        failed = self.failed
+        full = {e['id']: e for e in self._fetch_format(unsure, batch_size, 'full')} if unsure else {}
+        self.failed = failed
+        
+        result = []
+        for email in emails:
+            if email['id'] in full:
+                result.append(full[email['id']])
+            else:
+                # Also covers unsure ones whose full fetch failed
+                email['bytes_saved'] = email['size_estimate']
+                result.append(email)
+        return result
+    
+    def _fetch_format(self, message_ids, batch_size, fmt):
+        if batch_size is None:
+            batch_size = Config.GMAIL_BATCH_SIZE
+        if batch_size > 1:
+            emails = self.fetch_messages_batched(message_ids, batch_size, fmt)
+        else:
+            emails = self.fetch_messages_sequential(message_ids, fmt)
+        
+        for email in emails:
+            email['fetch_tier'] = fmt
+            email['bytes_saved'] = 0
+        return emails
+    
+    def _get_request(self, message_id, fmt='full'):
+        params = {'userId': 'me', 'id': message_id, 'format': fmt}
+        if fmt == 'metadata':
+            params['metadataHeaders'] = METADATA_HEADERS
+        return self.service.users().messages().get(**params)
+    
+    def fetch_messages_sequential(self, message_ids, fmt='full'):
+        """Fetch and parse messages one request at a time"""
+        emails = []
+        
+        for message_id in message_ids:
+            for attempt in range(Config.GMAIL_MAX_RETRIES + 1):
+                self._throttle(QUOTA_UNITS['messages.get'])
+                try:
+                    with span('gmail.get'):
+                        msg = self._get_request(message_id, fmt).execute()
+                    with span('mime.parse'):
+                        emails.append(self._parse_message(msg))
+                    break
+                except Exception as e:
+                    self._note_throttle(e)
+                    if attempt == Config.GMAIL_MAX_RETRIES or not self._is_retryable(e):
+                        self._drop(message_id, e)
+                        break
+                    time.sleep(self._backoff_delay(attempt, self._retry_after(e)))
+        
+        return emails
+    
+    def fetch_messages_batched(self, message_ids, batch_size=None, fmt='full'):
+        """Fetch and parse messages using multipart batch requests.
+        
+        Failed items are retried in later rounds with exponential backoff
+        (or the server's Retry-After); permanent failures are skipped.
+        Results keep the order of message_ids.
+        """
+        batch_size = max(1, min(batch_size or Config.GMAIL_BATCH_SIZE, 100))
+        parsed = {}
+        pending = list(message_ids)
+        
+        for attempt in range(Config.GMAIL_MAX_RETRIES + 1):
+            retry_ids = []
+            retry_after = 0
+            
+            for start in range(0, len(pending), batch_size):
+                failed, wait = self._execute_batch(pending[start:start + batch_size], parsed, fmt)
+                retry_ids.extend(failed)
+                retry_after = max(retry_after, wait)
+            
+            pending = retry_ids
+            if not pending:
+                break
+            if attempt < Config.GMAIL_MAX_RETRIES:
+                time.sleep(self._backoff_delay(attempt, retry_after))
+        
+        if pending:
+            print(f"⚠️  Gave up on {len(pending)} messages after {Config.GMAIL_MAX_RETRIES} retries")
+            self.failed += len(pending)
+        
+        return [parsed[mid] for mid in message_ids if mid in parsed]
+    
+    def _execute_batch(self, message_ids, parsed, fmt='full'):
+        """Run one batch; returns (retryable ids, longest Retry-After seen)"""
+        failed = []
+        retry_after = [0]
+        responses = {}
+        
+        def on_response(request_id, response, exception):
+            if exception is None:
+                responses[request_id] = response
+            elif self._is_retryable(exception):
+                failed.append(request_id)
+                retry_after[0] = max(retry_after[0], self._retry_after(exception))
+                self._note_throttle(exception)
+            else:
+                self._drop(request_id, exception)
+        
+        batch = BatchHttpRequest(callback=on_response, batch_uri=self.batch_uri)
+        for message_id in message_ids:
+            batch.add(self._get_request(message_id, fmt), request_id=message_id)
+        
+        # Each request inside a batch is billed as if sent on its own
+        self._throttle(QUOTA_UNITS['messages.get'] * len(message_ids))
+        try:
+            with span('gmail.get'):
+                batch.execute()
         except Exception as e:
-            print(f"Error fetching emails: {e}")
-            return []
+            # The whole batch was rejected; retry whatever didn't come back
+            print(f"⚠️  Batch request failed: {e}")
+            self._note_throttle(e)
+            self._parse_responses(responses, parsed)
+            if not self._is_retryable(e):
+                self.failed += len(message_ids) - len(responses)
+                return [], 0
+            done = set(responses) | set(failed)
+            return failed + [mid for mid in message_ids if mid not in done], self._retry_after(e)
+        
+        self._parse_responses(responses, parsed)
+        return failed, retry_after[0]
+    
+    @staticmethod
+    def _parse_responses(responses, parsed):
+        """Parse a batch's raw messages together, so big batches can use the pool"""
+        ids = list(responses)
+        with span('mime.parse'):
+            emails = mime_parser.parse_many([responses[mid] for mid in ids])
+        for message_id, email in zip(ids, emails):
+            if email is not None:
+                parsed[message_id] = email
+    
+    def _drop(self, message_id, error):
+        """Skip a message for this sync; unless Gmail says it's gone, it counts as failed"""
+        print(f"⚠️  Skipping message {message_id}: {error}")
+        if not (isinstance(error, HttpError) and error.resp.status == 404):
+            self.failed += 1
+    
+    def _throttle(self, units):
+        """Wait for units of this user's (and the project's) Gmail quota"""
+        if Config.GMAIL_RATE_LIMIT:
+            with span('gmail.quota_wait'):
+                gmail_rate_limiter.acquire(self.rate_key, units)
+    
+    def _note_throttle(self, error):
+        """Tell the limiter about a rate-limit answer so other calls back off too"""
+        if self._is_rate_limited(error):
+            gmail_rate_limiter.throttled(self.rate_key, self._retry_after(error))
+    
+    @staticmethod
+    def _is_rate_limited(error):
+        if not isinstance(error, HttpError):
+            return False
+        if error.resp.status == 429:
+            return True
+        return error.resp.status == 403 and any(
+            d.get('reason') in RATE_LIMIT_REASONS for d in (error.error_details or []) if isinstance(d, dict)
+        )
+    
+    @staticmethod
+    def _is_retryable(error):
+        if not isinstance(error, HttpError):
+            # Connection resets and timeouts are worth another attempt
+            return isinstance(error, (OSError, TimeoutError))
+        if error.resp.status in RETRYABLE_STATUS:
+            return True
+        if error.resp.status == 403:
+            return any(d.get('reason') in RETRYABLE_REASONS for d in (error.error_details or [])
+                       if isinstance(d, dict))
+        return False
+    
+    @staticmethod
+    def _retry_after(error):
+        """Seconds requested by a Retry-After header, 0 if absent"""
+        resp = getattr(error, 'resp', None)
+        try:
+            return float(resp.get('retry-after', 0)) if resp is not None else 0
+        except (TypeError, ValueError):
+            return 0
+    
+    @staticmethod
+    def _backoff_delay(attempt, retry_after=0):
+        """Exponential backoff with jitter, never shorter than Retry-After"""
+        delay = Config.GMAIL_RETRY_BASE_DELAY * (2 ** attempt) * random.uniform(0.5, 1.0)
+        return max(delay, retry_after)
     
     def _parse_message(self, message):
         """Parse Gmail message into structured format"""
-        headers = message['payload']['headers']
-        
-        subject = next((h['value'] for h in headers if h['name'].lower() == 'subject'), 'No Subject')
-        sender = next((h['value'] for h in headers if h['name'].lower() == 'from'), 'Unknown')
-        date = next((h['value'] for h in headers if h['name'].lower() == 'date'), '')
-        
-        snippet = message.get('snippet', '')
-        
-        # Try to get body
-        body = self._get_body(message['payload'])
-        
-        return {
-            'id': message['id'],
-            'subject': subject,
-            'from': sender,
-            'date': date,
-            'snippet': body or snippet
-        }
-    
-    def _get_body(self, payload):
-        """Extract email body from payload"""
-        if 'body' in payload and 'data' in payload['body']:
-            return base64.urlsafe_b64decode(payload['body']['data']).decode('utf-8', errors='ignore')
-        
-        if 'parts' in payload:
-            for part in payload['parts']:
-                if part['mimeType'] == 'text/plain':
-                    if 'data' in part['body']:
-                        return base64.urlsafe_b64decode(part['body']['data']).decode('utf-8', errors='ignore')
-                elif 'parts' in part:
-                    body = self._get_body(part)
-                    if body:
-                        return body
-        
-        return ''
\ No newline at end of file
+        return parse_message(message)
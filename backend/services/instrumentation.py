@@ -0,0 +1,208 @@
+from contextvars import ContextVar
+from config import Config
+import os
+import random
+import threading
+import time
+
+# Upper bounds in seconds, as Prometheus expects
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Span totals of the request being handled on this thread: name -> [seconds, count]
+_request_spans = ContextVar('request_spans', default=None)
+
+
+class Histogram:
+    """Cumulative-bucket histogram keyed by a tuple of label values"""
+    
+    def __init__(self, name, help_text, labels):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self._series = {}
+        self._lock = threading.Lock()
+    
+    def observe(self, label_values, seconds):
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * len(BUCKETS), 0.0, 0]
+            for i, bound in enumerate(BUCKETS):
+                if seconds <= bound:
+                    series[0][i] += 1
+                    break
+            series[1] += seconds
+            series[2] += 1
+    
+    def totals(self):
+        """{label values: (seconds, count)} for every series"""
+        with self._lock:
+            return {labels: (s[1], s[2]) for labels, s in self._series.items()}
+    
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted((labels, [list(s[0]), s[1], s[2]]) for labels, s in self._series.items())
+        for label_values, (counts, total, count) in series:
+            labels = ','.join(f'{k}="{_escape(v)}"' for k, v in zip(self.labels, label_values))
+            cumulative = 0
+            for bound, n in zip(BUCKETS, counts):
+                cumulative += n
+                lines.append(f'{self.name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{labels},le="+Inf"}} {count}')
+            lines.append(f'{self.name}_sum{{{labels}}} {total:.6f}')
+            lines.append(f'{self.name}_count{{{labels}}} {count}')
+        return lines
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+stage_seconds = Histogram('jobmail_stage_duration_seconds', 'Time spent per instrumented stage', ('stage',))
+request_seconds = Histogram(
+    'jobmail_http_request_duration_seconds', 'Time to produce a response', ('method', 'endpoint', 'status')
+)
+
+
+class _Span:
+    __slots__ = ('name', 'start')
+    
+    def __init__(self, name):
+        self.name = name
+    
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+    
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        stage_seconds.observe((self.name,), elapsed)
+        spans = _request_spans.get()
+        if spans is not None:
+            total = spans.get(self.name)
+            if total is None:
+                spans[self.name] = [elapsed, 1]
+            else:
+                total[0] += elapsed
+                total[1] += 1
+
+
+class _NoopSpan:
+    __slots__ = ()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        pass
+
+
+_NOOP = _NoopSpan()
+
+def span(name):
+    """Time a block as stage name: `with span('gmail.list'): ...`"""
+    if not Config.INSTRUMENTATION_ENABLED:
+        return _NOOP
+    return _Span(name)
+
+
+def server_timing(spans, total):
+    """Server-Timing header value; a stage's desc is its call count when > 1"""
+    parts = []
+    for name, (seconds, count) in spans.items():
+        entry = f"{name.replace('.', '-')};dur={seconds * 1000:.1f}"
+        if count > 1:
+            entry += f';desc="{count}x"'
+        parts.append(entry)
+    parts.append(f"total;dur={total * 1000:.1f}")
+    return ', '.join(parts)
+
+
+class _Profiler:
+    """One request's cProfile or pyinstrument session"""
+    
+    def __init__(self, kind):
+        self.kind = kind
+        if kind == 'pyinstrument':
+            from pyinstrument import Profiler
+            self._profiler = Profiler()
+        else:
+            import cProfile
+            self._profiler = cProfile.Profile()
+    
+    def start(self):
+        if self.kind == 'pyinstrument':
+            self._profiler.start()
+        else:
+            self._profiler.enable()
+    
+    def stop_and_dump(self, label):
+        os.makedirs(Config.PROFILE_DIR, exist_ok=True)
+        base = os.path.join(Config.PROFILE_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{label}")
+        if self.kind == 'pyinstrument':
+            self._profiler.stop()
+            path = base + '.html'
+            with open(path, 'w') as f:
+                f.write(self._profiler.output_html())
+        else:
+            self._profiler.disable()
+            path = base + '.prof'
+            self._profiler.dump_stats(path)
+        return path
+
+
+def init_app(app):
+    """Per-request spans, Server-Timing header, request histogram and sampled profiling"""
+    from flask import g, request
+    
+    @app.before_request
+    def start_request_timing():
+        if not Config.INSTRUMENTATION_ENABLED:
+            return
+        g.request_start = time.perf_counter()
+        g.span_token = _request_spans.set({})
+        if Config.PROFILE_SAMPLE_RATE and random.random() < Config.PROFILE_SAMPLE_RATE:
+            try:
+                g.profiler = _Profiler(Config.PROFILER)
+                g.profiler.start()
+            except Exception as e:
+                print(f"⚠️  Could not start {Config.PROFILER} profiler: {e}")
+    
+    @app.after_request
+    def finish_request_timing(response):
+        start = g.pop('request_start', None)
+        if start is None:
+            return response
+        total = time.perf_counter() - start
+        spans = _request_spans.get() or {}
+        _request_spans.reset(g.pop('span_token'))
+        
+        request_seconds.observe((request.method, request.endpoint or 'unmatched', str(response.status_code)), total)
+        response.headers['Server-Timing'] = server_timing(spans, total)
+        
+        profiler = g.pop('profiler', None)
+        if profiler is not None:
+            try:
+                path = profiler.stop_and_dump((request.endpoint or 'unmatched').replace('.', '_'))
+                print(f"📈 Profile of {request.method} {request.path} written to {path}")
+            except Exception as e:
+                print(f"⚠️  Could not write profile: {e}")
+        return response
+
+
+def render_metrics(gauges=None):
+    """Prometheus text exposition: the histograms plus flat numeric gauges.
+    
+    gauges maps a metric prefix to a stats dict; numeric entries become
+    jobmail_<prefix>_<key> gauges.
+    """
+    lines = stage_seconds.render() + request_seconds.render()
+    for prefix, stats in (gauges or {}).items():
+        for key, value in sorted(stats.items()):
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                continue
+            name = f"jobmail_{prefix}_{key}"
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {value}")
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,135 @@
+from concurrent.futures import ProcessPoolExecutor
+from config import Config
+import base64
+import html
+import re
+import threading
+
+# Markup whose text never belongs in the body; a truncated block runs to the end
+_HIDDEN_RE = re.compile(r'<(script|style|head|title)\b.*?(?:</\1\s*>|\Z)', re.IGNORECASE | re.DOTALL)
+_COMMENT_RE = re.compile(r'<!--.*?(?:-->|\Z)', re.DOTALL)
+_BREAK_RE = re.compile(r'<(?:br|/p|/div|/tr|/li|/h[1-6]|/table)\b[^>]*>', re.IGNORECASE)
+# A tag cut off by the byte budget has no closing '>'
+_TAG_RE = re.compile(r'<[^>]*(?:>|\Z)')
+
+
+def decode_base64url(data, max_bytes=None):
+    """Decode Gmail's base64url body data, only as far as max_bytes"""
+    if max_bytes is None:
+        return base64.urlsafe_b64decode(data + '=' * (-len(data) % 4))
+    # Every 4 characters decode to 3 bytes, so never touch the rest; the
+    # last group can overshoot the budget by up to 2 bytes
+    data = data[:-(-max_bytes // 3) * 4]
+    return base64.urlsafe_b64decode(data + '=' * (-len(data) % 4))[:max_bytes]
+
+def html_to_text(markup):
+    """Cheap HTML to text: drop hidden blocks and tags, keep line breaks"""
+    markup = _HIDDEN_RE.sub(' ', markup)
+    markup = _COMMENT_RE.sub(' ', markup)
+    markup = _BREAK_RE.sub('\n', markup)
+    text = html.unescape(_TAG_RE.sub(' ', markup))
+    # str.split() collapses whitespace (nbsp included) much faster than a regex
+    lines = (' '.join(line.split()) for line in text.split('\n'))
+    return '\n'.join(line for line in lines if line)
+
+def extract_body(payload, budget=None):
+    """Body text of a Gmail payload, at most budget bytes of it.
+    
+    Prefers the first text/plain part and falls back to the first
+    text/html part run through html_to_text. Attachments are skipped and
+    only the start of the chosen part is ever decoded.
+    """
+    budget = budget or Config.MIME_BODY_BUDGET
+    html_part = None
+    
+    # Depth-first in document order, like the old recursive walk
+    stack = [payload]
+    while stack:
+        part = stack.pop()
+        if part.get('parts'):
+            stack.extend(reversed(part['parts']))
+            continue
+        if part.get('filename') or 'data' not in part.get('body', {}):
+            continue
+        mime_type = part.get('mimeType', 'text/plain')
+        if mime_type == 'text/html':
+            html_part = html_part or part
+        elif mime_type == 'text/plain' or part is payload:
+            raw = decode_base64url(part['body']['data'], budget)
+            return raw.decode('utf-8', errors='ignore')
+    
+    if html_part is None:
+        return ''
+    
+    raw = decode_base64url(html_part['body']['data'], budget * Config.MIME_HTML_BUDGET_FACTOR)
+    text = html_to_text(raw.decode('utf-8', errors='ignore'))
+    return text.encode('utf-8')[:budget].decode('utf-8', errors='ignore')
+
+def parse_message(message, budget=None):
+    """Parse a Gmail message resource into the dict the sync pipeline uses"""
+    payload = message['payload']
+    headers = {}
+    for header in payload.get('headers', []):
+        # First occurrence wins, as with the old next() lookups
+        headers.setdefault(header['name'].lower(), header['value'])
+    
+    body = extract_body(payload, budget)
+    
+    return {
+        'id': message['id'],
+        'subject': headers.get('subject', 'No Subject'),
+        'from': headers.get('from', 'Unknown'),
+        'date': headers.get('date', ''),
+        # Gmail's snippet is HTML-escaped ('&#39;' and friends)
+        'snippet': body or html.unescape(message.get('snippet', '')),
+        'labels': message.get('labelIds', []),
+        'size_estimate': message.get('sizeEstimate', 0)
+    }
+
+def _parse_or_none(message, budget=None):
+    try:
+        return parse_message(message, budget)
+    except Exception as e:
+        print(f"⚠️  Could not parse message {message.get('id')}: {e}")
+        return None
+
+
+class MimeParser:
+    """Parses batches of Gmail messages, on a process pool for big batches.
+    
+    The pool is started on first use and kept for the life of the process,
+    so a sync doesn't pay for spawning workers on every batch.
+    """
+    
+    def __init__(self, processes=None, threshold=None):
+        self.processes = Config.MIME_PROCESSES if processes is None else processes
+        self.threshold = Config.MIME_PARALLEL_THRESHOLD if threshold is None else threshold
+        self._pool = None
+        self._lock = threading.Lock()
+    
+    def parse_many(self, messages, budget=None):
+        """Parse messages in order; unparseable ones come back as None"""
+        budget = budget or Config.MIME_BODY_BUDGET
+        if self.processes <= 1 or len(messages) < self.threshold:
+            return [_parse_or_none(message, budget) for message in messages]
+        
+        chunksize = max(1, len(messages) // (self.processes * 4))
+        return list(self._get_pool().map(
+            _parse_or_none, messages, [budget] * len(messages), chunksize=chunksize
+        ))
+    
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.processes)
+            return self._pool
+    
+    def close(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown()
+                self._pool = None
+
+
+# Create a single parser instance
+mime_parser = MimeParser()
@@ -0,0 +1,143 @@
+from collections import OrderedDict
+from config import Config
+import asyncio
+import threading
+import time
+
+# Gmail API quota units per call (developers.google.com/gmail/api/reference/quota)
+QUOTA_UNITS = {
+    'getProfile': 1,
+    'messages.list': 5,
+    'messages.get': 5,
+    'history.list': 2
+}
+
+
+class TokenBucket:
+    """Token bucket handing out reservations.
+    
+    reserve() takes the units straight away, letting the balance go
+    negative, and returns how long the caller has to wait for them; so
+    concurrent callers queue in arrival order without holding a lock
+    while they sleep. Callers serialize access themselves.
+    """
+    
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+    
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+    
+    def reserve(self, units, now):
+        self._refill(now)
+        self.tokens -= units
+        return max(0.0, -self.tokens / self.rate)
+    
+    def pause(self, seconds, now):
+        """Hold back everyone for at least seconds (a server-side throttle)"""
+        self._refill(now)
+        self.tokens = min(self.tokens, -seconds * self.rate)
+
+
+class GmailRateLimiter:
+    """Client-side Gmail quota: one bucket per user plus one for the project.
+    
+    Every call reserves its quota units on both buckets and waits for the
+    slower of the two. A 429 from Gmail pauses that user's bucket for the
+    Retry-After period, so their other in-flight work backs off too.
+    Buckets live in this process; size GMAIL_PROJECT_QUOTA_RATE for the
+    number of worker processes sharing the project.
+    """
+    
+    def __init__(self, user_rate=None, project_rate=None, burst_seconds=None, max_users=10000):
+        self.max_users = max_users
+        self._lock = threading.Lock()
+        self._waiting = 0
+        self.reset(user_rate, project_rate, burst_seconds)
+    
+    def reset(self, user_rate=None, project_rate=None, burst_seconds=None):
+        """Drop every bucket and counter, optionally with new rates (benchmarks)"""
+        with self._lock:
+            self.user_rate = user_rate or Config.GMAIL_USER_QUOTA_RATE
+            self.project_rate = project_rate or Config.GMAIL_PROJECT_QUOTA_RATE
+            self.burst_seconds = burst_seconds or Config.GMAIL_RATE_BURST_SECONDS
+            self._project = TokenBucket(self.project_rate, self.project_rate * self.burst_seconds)
+            self._users = OrderedDict()
+            self._stats = {
+                'requests': 0,
+                'units': 0,
+                'delayed': 0,
+                'wait_seconds_total': 0.0,
+                'wait_seconds_max': 0.0,
+                'throttled': 0,
+                'max_waiting': 0
+            }
+    
+    def reserve(self, user_key, units):
+        """Take units for user_key; returns the seconds to wait before calling Gmail"""
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._users.get(user_key)
+            if bucket is None:
+                bucket = self._users[user_key] = TokenBucket(self.user_rate, self.user_rate * self.burst_seconds)
+                if len(self._users) > self.max_users:
+                    self._users.popitem(last=False)
+            self._users.move_to_end(user_key)
+            
+            wait = max(bucket.reserve(units, now), self._project.reserve(units, now))
+            self._stats['requests'] += 1
+            self._stats['units'] += units
+            if wait > 0:
+                self._stats['delayed'] += 1
+                self._stats['wait_seconds_total'] += wait
+                self._stats['wait_seconds_max'] = max(self._stats['wait_seconds_max'], wait)
+        return wait
+    
+    def acquire(self, user_key, units):
+        """Block until units of quota are available for user_key"""
+        wait = self.reserve(user_key, units)
+        if wait > 0:
+            self._waiting_delta(1)
+            try:
+                time.sleep(wait)
+            finally:
+                self._waiting_delta(-1)
+    
+    async def acquire_async(self, user_key, units):
+        wait = self.reserve(user_key, units)
+        if wait > 0:
+            self._waiting_delta(1)
+            try:
+                await asyncio.sleep(wait)
+            finally:
+                self._waiting_delta(-1)
+    
+    def throttled(self, user_key, retry_after=0):
+        """Record a Gmail rate-limit answer and pause the user's bucket"""
+        with self._lock:
+            self._stats['throttled'] += 1
+            bucket = self._users.get(user_key)
+            if bucket is not None and retry_after > 0:
+                bucket.pause(retry_after, time.monotonic())
+    
+    def _waiting_delta(self, delta):
+        with self._lock:
+            self._waiting += delta
+            self._stats['max_waiting'] = max(self._stats['max_waiting'], self._waiting)
+    
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['waiting'] = self._waiting
+            stats['users'] = len(self._users)
+        stats['user_rate'] = self.user_rate
+        stats['project_rate'] = self.project_rate
+        return stats
+
+
+# Create a single limiter instance
+gmail_rate_limiter = GmailRateLimiter()
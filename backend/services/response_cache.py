@@ -0,0 +1,123 @@
+from flask import Response, current_app, request
+from pymongo import ReturnDocument
+from urllib.parse import urlencode
+from services.cache import TTLCache
+from services.instrumentation import span
+from database import db
+from config import Config
+import hashlib
+
+
+def version_update():
+    """Update bumping a user_versions document (also used with motor)"""
+    return {'$inc': {'version': 1}}
+
+
+class DataVersions:
+    """Per-user data version, bumped on every write to a user's emails.
+    
+    The counter lives in MongoDB so every worker sees the same value; each
+    process remembers what it read for RESPONSE_VERSION_TTL seconds, and
+    its own bumps apply immediately, so polls in between cost no query.
+    """
+    
+    def __init__(self, maxsize=None, ttl=None):
+        self._versions = TTLCache(
+            maxsize=maxsize or Config.RESPONSE_CACHE_SIZE * 4,
+            ttl=Config.RESPONSE_VERSION_TTL if ttl is None else ttl
+        )
+    
+    def get(self, user_email):
+        version = self._versions.get(user_email)
+        if version is None:
+            doc = db.user_versions.find_one({'_id': user_email}, {'version': 1})
+            version = doc['version'] if doc else 0
+            self._versions.set(user_email, version)
+        return version
+    
+    def bump(self, user_email):
+        """Record a write to user_email's emails or stats"""
+        doc = db.user_versions.find_one_and_update(
+            {'_id': user_email},
+            version_update(),
+            projection={'version': 1},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        self._versions.set(user_email, doc['version'])
+    
+    def forget(self, user_email):
+        """Re-read the version on next use (after a write made elsewhere)"""
+        self._versions.pop(user_email)
+    
+    def stats(self):
+        return self._versions.stats()
+
+
+class ResponseCache:
+    """Serialized GET responses per user and URL, valid for one data version.
+    
+    Responses carry a strong ETag derived from the version, so a client
+    whose copy is current gets a 304 with no body; a client without one
+    gets the cached body instead of a fresh query.
+    """
+    
+    def __init__(self, maxsize=None, ttl=None):
+        self._responses = TTLCache(
+            maxsize=maxsize or Config.RESPONSE_CACHE_SIZE,
+            ttl=ttl or Config.RESPONSE_CACHE_TTL
+        )
+        self.not_modified = 0
+    
+    @staticmethod
+    def variant(salt=''):
+        """The request's path and query string, order-insensitive"""
+        return f"{request.path}?{urlencode(sorted(request.args.items(multi=True)))}#{salt}"
+    
+    @staticmethod
+    def etag(user_email, variant, version):
+        digest = hashlib.sha1(f"{user_email}|{variant}".encode('utf-8')).hexdigest()[:16]
+        return f"{digest}-{version}"
+    
+    def serve(self, user_email, build, salt=''):
+        """Answer the current GET for user_email from the cache.
+        
+        build() returns the JSON payload, or None when this response must
+        not be cached; serve() then returns None and the caller answers
+        the request itself. salt covers anything besides the user's data
+        that changes the payload.
+        """
+        version = data_versions.get(user_email)
+        variant = self.variant(salt)
+        etag = self.etag(user_email, variant, version)
+        
+        if request.if_none_match.contains(etag):
+            self.not_modified += 1
+            response = Response(status=304)
+        else:
+            entry = self._responses.get((user_email, variant))
+            if entry is not None and entry[0] == version:
+                body = entry[1]
+            else:
+                payload = build()
+                if payload is None:
+                    return None
+                with span('serialize'):
+                    body = current_app.json.dumps(payload)
+                # Stored under the version read before building; a write
+                # that lands meanwhile bumps it and the next poll rebuilds
+                self._responses.set((user_email, variant), (version, body))
+            response = Response(body, mimetype='application/json')
+        
+        response.set_etag(etag)
+        # Browsers revalidate with If-None-Match on every poll
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
+    
+    def stats(self):
+        return dict(self._responses.stats(), not_modified=self.not_modified)
+
+
+# Create single instances
+data_versions = DataVersions()
+response_cache = ResponseCache()
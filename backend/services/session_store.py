@@ -0,0 +1,165 @@
+from flask.sessions import SessionInterface, SessionMixin
+from werkzeug.datastructures import CallbackDict
+from services.cache import TTLCache
+from database import db
+from config import Config
+from datetime import datetime, timedelta
+import re
+import secrets
+import time
+
+# secrets.token_urlsafe(32); anything else in the cookie is ignored
+_SID_RE = re.compile(r'^[A-Za-z0-9_-]{43}$')
+
+
+class MemoryStore:
+    """In-process LRU+TTL store. Each worker has its own, so only use it
+    with a single worker process."""
+    
+    def __init__(self, maxsize=None):
+        # Every set() passes its own ttl
+        self._cache = TTLCache(maxsize=maxsize or Config.SESSION_CACHE_SIZE, ttl=60)
+    
+    def get(self, key):
+        return self._cache.get(key)
+    
+    def set(self, key, data, ttl):
+        self._cache.set(key, data, ttl=ttl)
+    
+    def pop(self, key):
+        return self._cache.pop(key)
+    
+    def delete(self, key):
+        self._cache.pop(key)
+
+
+class MongoStore:
+    """Documents {_id, data, expires_at} in a collection with a TTL index
+    on expires_at, shared by every worker. Mongo's TTL monitor only runs
+    once a minute, so reads also check expires_at themselves."""
+    
+    def __init__(self, collection_name):
+        self.collection_name = collection_name
+    
+    @property
+    def collection(self):
+        return getattr(db, self.collection_name)
+    
+    def get(self, key):
+        collection = self.collection
+        if collection is None:
+            return None
+        doc = collection.find_one({'_id': key, 'expires_at': {'$gt': datetime.utcnow()}}, {'data': 1})
+        return doc['data'] if doc else None
+    
+    def set(self, key, data, ttl):
+        collection = self.collection
+        if collection is None:
+            print(f"⚠️  MongoDB unavailable, {self.collection_name} entry not saved")
+            return
+        collection.replace_one(
+            {'_id': key},
+            {'data': data, 'expires_at': datetime.utcnow() + timedelta(seconds=ttl)},
+            upsert=True
+        )
+    
+    def pop(self, key):
+        """Remove and return an entry atomically, so it can only be used once"""
+        collection = self.collection
+        if collection is None:
+            return None
+        doc = collection.find_one_and_delete({'_id': key, 'expires_at': {'$gt': datetime.utcnow()}})
+        return doc['data'] if doc else None
+    
+    def delete(self, key):
+        collection = self.collection
+        if collection is not None:
+            collection.delete_one({'_id': key})
+
+
+def create_store(collection_name, backend=None):
+    """Store for SESSION_BACKEND: 'mongo' (any number of workers) or 'memory'"""
+    backend = backend or Config.SESSION_BACKEND
+    if backend == 'memory':
+        return MemoryStore()
+    if backend == 'mongo':
+        return MongoStore(collection_name)
+    raise ValueError(f"Unknown SESSION_BACKEND {backend!r}")
+
+
+class ServerSession(CallbackDict, SessionMixin):
+    """Session whose data lives in a store; the cookie only holds its id"""
+    
+    def __init__(self, initial=None, sid=None):
+        def on_update(self):
+            self.modified = True
+        initial = dict(initial or {})
+        # When the store last got this session, for sliding expiry
+        self.written_at = initial.pop('_written_at', 0)
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.new = sid is None
+        self.modified = False
+        self.rotated_from = None
+    
+    def regenerate(self):
+        """Move the data to a fresh id, e.g. at login against session fixation"""
+        if self.sid is not None and self.rotated_from is None:
+            self.rotated_from = self.sid
+        self.sid = None
+        self.modified = True
+
+
+class ServerSideSessionInterface(SessionInterface):
+    """Flask session interface backed by a MongoStore or MemoryStore.
+    
+    Only modified sessions are written back, plus permanent ones past half
+    their lifetime so active users stay signed in. The cookie carries an
+    opaque random id instead of the signed session contents.
+    """
+    
+    def __init__(self, store):
+        self.store = store
+    
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if sid and _SID_RE.match(sid):
+            data = self.store.get(sid)
+            if data is not None:
+                return ServerSession(data, sid=sid)
+        return ServerSession()
+    
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        
+        if session.rotated_from:
+            self.store.delete(session.rotated_from)
+        
+        if not session:
+            if session.modified and session.sid is not None:
+                self.store.delete(session.sid)
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+        
+        ttl = int(app.permanent_session_lifetime.total_seconds())
+        refresh = session.permanent and time.time() - session.written_at > ttl / 2
+        if not session.modified and not refresh:
+            return
+        
+        if session.sid is None:
+            session.sid = secrets.token_urlsafe(32)
+        session.written_at = time.time()
+        self.store.set(session.sid, dict(session, _written_at=session.written_at), ttl)
+        
+        response.set_cookie(
+            name,
+            session.sid,
+            expires=self.get_expiration_time(app, session),
+            httponly=self.get_cookie_httponly(app),
+            domain=domain,
+            path=path,
+            secure=self.get_cookie_secure(app),
+            samesite=self.get_cookie_samesite(app)
+        )
@@ -0,0 +1,190 @@
+from collections import Counter
+from datetime import datetime, timedelta
+from database import db
+from config import Config
+
+STATUSES = ['Rejection', 'Selection', 'Pending']
+
+
+def week_key(date):
+    """ISO week of a datetime, e.g. '2024-W07'"""
+    year, week, _ = date.isocalendar()
+    return f"{year}-W{week:02d}"
+
+def company_key(company):
+    """Company names become field names, which can't contain '.' or start with '$'"""
+    return (company or 'Unknown').replace('.', '．').replace('$', '＄')
+
+def company_name(key):
+    return key.replace('．', '.').replace('＄', '$')
+
+def rebuild_stats(user_email):
+    """Recompute a user's stats document from their emails.
+    
+    One $facet aggregation produces every breakdown; the result is stored
+    in user_stats so reads don't touch the emails collection again.
+    
+    A placeholder document is put in place first, so the increments of a
+    sync writing meanwhile land on it and bump its revision. The result
+    only replaces the placeholder if its revision is unchanged; otherwise
+    the counts may miss those writes and the placeholder is dropped for
+    the next read to rebuild.
+    """
+    db.user_stats.update_one(
+        {'_id': user_email},
+        {'$set': {'building': True}, '$setOnInsert': {'revision': 0, 'updated_at': datetime.utcnow()}},
+        upsert=True
+    )
+    placeholder = db.user_stats.find_one({'_id': user_email}, {'building': 1, 'revision': 1})
+    
+    pipeline = [
+        {'$match': {'user_email': user_email}},
+        {'$facet': {
+            'by_status': [
+                {'$group': {'_id': '$status', 'count': {'$sum': 1}}}
+            ],
+            'unread': [
+                {'$match': {'read': {'$ne': True}}},
+                {'$count': 'count'}
+            ],
+            'by_company': [
+                {'$group': {'_id': '$company', 'count': {'$sum': 1}}}
+            ],
+            # Grouped per day and bucketed into ISO weeks below, the same
+            # week_key the incremental updates use
+            'by_day': [
+                {'$match': {'date': {'$type': 'date'}}},
+                {'$group': {
+                    '_id': {
+                        'day': {'$dateToString': {'format': '%Y-%m-%d', 'date': '$date'}},
+                        'status': '$status'
+                    },
+                    'count': {'$sum': 1}
+                }}
+            ]
+        }}
+    ]
+    
+    facets = next(db.emails.aggregate(pipeline))
+    
+    by_status = {status: 0 for status in STATUSES}
+    for row in facets['by_status']:
+        by_status[row['_id']] = row['count']
+    
+    by_company = Counter()
+    for row in facets['by_company']:
+        by_company[company_key(row['_id'])] += row['count']
+    
+    by_week = {}
+    for row in facets['by_day']:
+        week = week_key(datetime.strptime(row['_id']['day'], '%Y-%m-%d'))
+        counts = by_week.setdefault(week, {})
+        counts[row['_id']['status']] = counts.get(row['_id']['status'], 0) + row['count']
+    
+    stats = {
+        '_id': user_email,
+        'total': sum(by_status.values()),
+        'unread': facets['unread'][0]['count'] if facets['unread'] else 0,
+        'by_status': by_status,
+        'by_company': dict(by_company),
+        'by_week': by_week,
+        'updated_at': datetime.utcnow()
+    }
+    if placeholder and placeholder.get('building'):
+        revision = placeholder.get('revision')
+        result = db.user_stats.replace_one(
+            {'_id': user_email, 'building': True,
+             'revision': revision if revision is not None else {'$exists': False}},
+            stats
+        )
+        if not result.matched_count:
+            # Written to (or invalidated) during the aggregation
+            db.user_stats.delete_one({'_id': user_email, 'building': True})
+    return stats
+
+def get_stats(user_email):
+    """The user's stats document, built on first use"""
+    stats = db.user_stats.find_one({'_id': user_email})
+    if stats is None or stats.get('building'):
+        stats = rebuild_stats(user_email)
+    return stats
+
+def invalidate_stats(user_email):
+    """Drop the stats document so the next read rebuilds it"""
+    db.user_stats.delete_one({'_id': user_email})
+
+def record_email_changes(user_email, added=(), removed=()):
+    """Apply emails written or overwritten to the stats document.
+    
+    added and removed are email documents (status, company, date, read);
+    an overwrite is the old version in removed and the new one in added.
+    Nothing is written if the document hasn't been built yet; a rebuild in
+    progress sees the revision change and discards its result.
+    """
+    update = stats_update(added, removed)
+    if update:
+        db.user_stats.update_one({'_id': user_email}, update)
+
+def stats_update(added=(), removed=()):
+    """The $inc update for record_email_changes, None if nothing changes"""
+    inc = Counter()
+    for sign, emails in ((1, added), (-1, removed)):
+        for email in emails:
+            status = email.get('status')
+            inc['total'] += sign
+            inc[f"by_status.{status}"] += sign
+            inc[f"by_company.{company_key(email.get('company'))}"] += sign
+            if isinstance(email.get('date'), datetime):
+                inc[f"by_week.{week_key(email['date'])}.{status}"] += sign
+            if email.get('read') is not True:
+                inc['unread'] += sign
+    
+    inc = {path: count for path, count in inc.items() if count}
+    if not inc:
+        return None
+    # Tells rebuild_stats a write landed while it was counting
+    inc['revision'] = 1
+    
+    return {'$inc': inc, '$set': {'updated_at': datetime.utcnow()}}
+
+def record_read(user_email):
+    """One of the user's emails went from unread to read"""
+    db.user_stats.update_one(
+        {'_id': user_email},
+        {'$inc': {'unread': -1, 'revision': 1}, '$set': {'updated_at': datetime.utcnow()}}
+    )
+
+def format_stats(stats, top_companies=None, weeks=None):
+    """API view of a stats document: the status totals plus the top
+    companies and a zero-filled trend over the most recent weeks"""
+    top_companies = top_companies or Config.STATS_TOP_COMPANIES
+    weeks = weeks or Config.STATS_WEEKS
+    by_status = stats.get('by_status', {})
+    
+    companies = sorted(
+        ((company_name(key), count) for key, count in stats.get('by_company', {}).items() if count > 0),
+        key=lambda item: (-item[1], item[0])
+    )
+    
+    trend = []
+    today = datetime.utcnow()
+    for offset in range(weeks - 1, -1, -1):
+        week = week_key(today - timedelta(weeks=offset))
+        counts = stats.get('by_week', {}).get(week, {})
+        trend.append({
+            'week': week,
+            'total': sum(counts.values()),
+            'rejection': counts.get('Rejection', 0),
+            'selection': counts.get('Selection', 0),
+            'pending': counts.get('Pending', 0)
+        })
+    
+    return {
+        'total': stats.get('total', 0),
+        'rejection': by_status.get('Rejection', 0),
+        'selection': by_status.get('Selection', 0),
+        'pending': by_status.get('Pending', 0),
+        'unread': stats.get('unread', 0),
+        'by_company': [{'company': name, 'count': count} for name, count in companies[:top_companies]],
+        'by_week': trend
+    }
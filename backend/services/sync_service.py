@@ -0,0 +1,213 @@
+from services.gmail_service import GmailService
+from services.classifier import EmailClassifier
+from services.company import extract_company, resolve_companies, sender_query, sender_company_writes
+from services.stats_service import record_email_changes, invalidate_stats
+from services.response_cache import data_versions
+from services.instrumentation import span
+from models.email import Email
+from database import db, bulk_write_batches
+from pymongo import UpdateOne
+from config import Config
+from datetime import datetime
+from collections import Counter
+
+# Fields of already-stored emails that prepare_writes and the stats need
+EXISTING_PROJECTION = {'gmail_id': 1, 'status': 1, 'company': 1, 'date': 1, 'read': 1, '_id': 0}
+
+
+def run_sync(credentials, force_refresh=False, progress=None):
+    """Sync a user's job emails from Gmail into MongoDB.
+    
+    Streams the refresh in SYNC_CHUNK_SIZE chunks, calling
+    progress(stored, inserted) after each one, and advances the history cursor when every message
+    was fetched and written.
+    Returns a summary dict.
+    """
+    classifier = EmailClassifier()
+    
+    with GmailService(credentials) as gmail_service:
+        # Snapshot the profile before listing so the cursor never skips mail
+        user_info = gmail_service.get_user_info()
+        user_email = user_info.get('emailAddress')
+        
+        sync_state = db.users.find_one({'email': user_email}, {'history_id': 1}) or {}
+        messages, full_sync = gmail_service.sync_job_emails(
+            start_history_id=sync_state.get('history_id'),
+            max_results=Config.SYNC_MAX_MESSAGES,
+            time_budget=Config.SYNC_TIME_BUDGET
+        )
+        
+        stored = 0
+        inserted = 0
+        write_errors = []
+        fetch_tiers = Counter()
+        bytes_saved = 0
+        for chunk in chunked(messages, Config.SYNC_CHUNK_SIZE):
+            report = store_messages(user_email, chunk, classifier, force_refresh)
+            write_errors.extend(report['errors'])
+            stored += len(chunk)
+            inserted += report['upserted']
+            fetch_tiers.update(m.get('fetch_tier') or 'full' for m in chunk)
+            bytes_saved += sum(m.get('bytes_saved', 0) for m in chunk)
+            if progress:
+                progress(stored, inserted)
+        
+        save_sync_cursor(gmail_service, user_email, user_info.get('historyId'), write_errors)
+    
+    return {
+        'user_email': user_email,
+        'stored': stored,
+        'inserted': inserted,
+        'full_sync': full_sync,
+        'truncated': gmail_service.truncated,
+        'fetch_failures': gmail_service.failed,
+        'write_errors': write_errors,
+        'fetch_tiers': dict(fetch_tiers),
+        'bytes_saved': bytes_saved
+    }
+
+def store_messages(user_email, messages, classifier, force_refresh=False):
+    """Classify parsed Gmail messages and upsert them for user_email.
+    
+    One $in query finds the emails we already have and the writes go out
+    as unordered bulk upserts. Returns the bulk write report.
+    """
+    # Check which emails already exist in a single round trip; their stored
+    # fields are what the stats counters see replaced on a forced refresh
+    with span('mongo.lookup'):
+        existing = {
+            doc['gmail_id']: doc for doc in db.emails.find(
+                existing_query(user_email, messages), EXISTING_PROJECTION
+            )
+        }
+        
+        # Senders this user has seen before keep their stored company
+        known = {
+            doc['sender']: doc['company'] for doc in db.sender_companies.find(
+                sender_query(user_email, {m.get('from', 'Unknown') for m in messages}),
+                {'sender': 1, 'company': 1, '_id': 0}
+            )
+        }
+    with span('company'):
+        companies, new_senders = resolve_companies(messages, known)
+    
+    operations, added, removed = prepare_writes(
+        user_email, messages, existing, classifier, force_refresh, companies
+    )
+    
+    # Upsert to database
+    with span('mongo.upsert'):
+        report = bulk_write_batches(db.emails, operations)
+        if new_senders:
+            bulk_write_batches(db.sender_companies, sender_company_writes(user_email, new_senders))
+    
+    if report['errors']:
+        # Can't tell which writes landed, so recount on the next read
+        invalidate_stats(user_email)
+    else:
+        record_email_changes(user_email, added, removed)
+    if operations:
+        data_versions.bump(user_email)
+    
+    return report
+
+def existing_query(user_email, messages):
+    return {'user_email': user_email, 'gmail_id': {'$in': [m['id'] for m in messages]}}
+
+def prepare_writes(user_email, messages, existing, classifier, force_refresh=False, companies=None):
+    """Classify messages and build their upserts.
+    
+    existing maps gmail_id to the stored document (EXISTING_PROJECTION)
+    for messages already in the database; those are skipped unless
+    force_refresh. companies maps gmail_id to the resolved company
+    (resolve_companies); without it each sender is resolved here.
+    Returns (operations, added, removed), the last two being the email
+    views the stats counters need.
+    """
+    if force_refresh:
+        new_messages = messages
+    else:
+        new_messages = [m for m in messages if m['id'] not in existing]
+    
+    # Classify the whole chunk in one call
+    with span('classify'):
+        # classify_many is lazy; drain it here so the span covers the work
+        statuses = list(classifier.classify_many(
+            (m.get('subject', 'No Subject'), m.get('snippet', '')) for m in new_messages
+        ))
+    
+    operations = []
+    added, removed = [], []
+    for msg, status in zip(new_messages, statuses):
+        # Parse email details
+        subject = msg.get('subject', 'No Subject')
+        sender = msg.get('from', 'Unknown')
+        body = msg.get('snippet', '')
+        date_str = msg.get('date', '')
+        
+        # Extract company name
+        if companies:
+            company = companies[msg['id']]
+        else:
+            with span('company'):
+                company = extract_company(sender, subject)
+        
+        # Parse date
+        try:
+            email_date = datetime.strptime(date_str[:16], '%a, %d %b %Y')
+        except:
+            email_date = datetime.utcnow()
+        
+        # Create email object
+        email_obj = Email(
+            user_email=user_email,
+            gmail_id=msg['id'],
+            subject=subject,
+            sender=sender,
+            company=company,
+            status=status,
+            date=email_date,
+            snippet=body[:500],
+            fetch_tier=msg.get('fetch_tier'),
+            bytes_saved=msg.get('bytes_saved', 0)
+        )
+        
+        operations.append(UpdateOne(
+            {'user_email': user_email, 'gmail_id': msg['id']},
+            {'$set': email_obj.to_dict()},
+            upsert=True
+        ))
+        
+        previous = existing.get(msg['id'])
+        if previous:
+            removed.append(previous)
+        added.append({
+            'status': status,
+            'company': company,
+            'date': email_date,
+            'read': previous.get('read') if previous else None
+        })
+    
+    return operations, added, removed
+
+def save_sync_cursor(gmail_service, user_email, history_id, write_errors=None):
+    """Advance the history cursor unless the sync stopped early or lost messages"""
+    if gmail_service.truncated or gmail_service.failed or write_errors:
+        # Leave the cursor alone so the next refresh covers what we skipped
+        return
+    
+    db.users.update_one(
+        {'email': user_email},
+        {'$set': {'history_id': history_id, 'last_sync_at': datetime.utcnow()}},
+        upsert=True
+    )
+
+def chunked(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
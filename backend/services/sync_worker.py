@@ -0,0 +1,178 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from services.sync_service import run_sync
+from database import db
+from config import Config
+import os
+import socket
+import threading
+import time
+
+ACTIVE_STATUSES = ('queued', 'running')
+
+
+class SyncWorker:
+    """In-process thread pool running sync jobs queued in MongoDB.
+    
+    Jobs live in the sync_jobs collection, so every gunicorn worker can
+    claim them and no external broker is needed. A user has at most one
+    active (queued or running) job; enqueueing again returns that job.
+    """
+    
+    def __init__(self, max_workers=None):
+        self.max_workers = max_workers or Config.SYNC_WORKERS
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self._executor = None
+        self._lock = threading.Lock()
+    
+    def enqueue(self, user_email, credentials, force_refresh=False):
+        """Queue a sync for user_email, or return the one already active"""
+        now = datetime.utcnow()
+        try:
+            job = db.sync_jobs.find_one_and_update(
+                {'user_email': user_email, 'active': True},
+                {'$setOnInsert': {
+                    'user_email': user_email,
+                    'active': True,
+                    'status': 'queued',
+                    'force_refresh': force_refresh,
+                    'credentials': credentials,
+                    'stored': 0,
+                    'inserted': 0,
+                    'created_at': now,
+                    'heartbeat_at': now
+                }},
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+        except DuplicateKeyError:
+            # Another request inserted the active job between our find and insert
+            job = db.sync_jobs.find_one({'user_email': user_email, 'active': True})
+        
+        self._submit()
+        return job
+    
+    def get_job(self, job_id, user_email):
+        """Fetch a job owned by user_email, None if it doesn't exist"""
+        try:
+            return db.sync_jobs.find_one(
+                {'_id': ObjectId(job_id), 'user_email': user_email},
+                {'credentials': 0}
+            )
+        except InvalidId:
+            return None
+    
+    def wait(self, job_id, timeout, min_stored=None):
+        """Poll until the job finishes or has stored min_stored emails"""
+        deadline = time.monotonic() + timeout
+        while True:
+            job = db.sync_jobs.find_one({'_id': job_id}, {'credentials': 0})
+            if job is None or job['status'] not in ACTIVE_STATUSES:
+                return job
+            if min_stored and job.get('stored', 0) >= min_stored:
+                return job
+            if time.monotonic() >= deadline:
+                return job
+            time.sleep(Config.SYNC_POLL_INTERVAL)
+    
+    def _submit(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix='sync-worker'
+                )
+        self._executor.submit(self._drain)
+    
+    def _drain(self):
+        """Run claimable jobs until the queue is empty"""
+        while True:
+            job = self._claim()
+            if job is None:
+                return
+            self._run(job)
+    
+    def _claim(self):
+        """Atomically take the oldest queued job, or one whose worker died"""
+        now = datetime.utcnow()
+        stale = now - timedelta(seconds=Config.SYNC_JOB_STALE_SECONDS)
+        return db.sync_jobs.find_one_and_update(
+            {'$or': [
+                {'status': 'queued'},
+                {'status': 'running', 'heartbeat_at': {'$lt': stale}}
+            ]},
+            {'$set': {
+                'status': 'running',
+                'started_at': now,
+                'heartbeat_at': now,
+                'worker': self.worker_id
+            }},
+            sort=[('created_at', 1)],
+            return_document=ReturnDocument.AFTER
+        )
+    
+    def _run(self, job):
+        def progress(stored, inserted):
+            db.sync_jobs.update_one(
+                {'_id': job['_id']},
+                {'$set': {'stored': stored, 'inserted': inserted, 'heartbeat_at': datetime.utcnow()}}
+            )
+        
+        try:
+            sync = run_sync
+            if Config.SYNC_PIPELINE == 'async':
+                from services.async_sync import run_sync_async as sync
+            result = sync(job['credentials'], job.get('force_refresh', False), progress)
+            update = {
+                'status': 'done',
+                'stored': result['stored'],
+                'inserted': result.get('inserted', 0),
+                'full_sync': result['full_sync'],
+                'truncated': result['truncated'],
+                'fetch_failures': result.get('fetch_failures', 0),
+                'write_errors': result['write_errors'],
+                'fetch_tiers': result['fetch_tiers'],
+                'bytes_saved': result['bytes_saved']
+            }
+            print(f"✅ Sync job {job['_id']} stored {result['stored']} emails for {job['user_email']}")
+        except Exception as e:
+            print(f"Error in sync job {job['_id']}: {str(e)}")
+            update = {'status': 'failed', 'error': str(e)}
+        
+        update['finished_at'] = datetime.utcnow()
+        # Dropping 'active' frees the per-user slot; credentials aren't kept around
+        db.sync_jobs.update_one(
+            {'_id': job['_id']},
+            {'$set': update, '$unset': {'active': '', 'credentials': ''}}
+        )
+
+
+def serialize_job(job):
+    """JSON-friendly view of a sync job"""
+    def iso(value):
+        return value.isoformat() if isinstance(value, datetime) else value
+    
+    return {
+        'id': str(job['_id']),
+        'status': job['status'],
+        'stored': job.get('stored', 0),
+        'inserted': job.get('inserted', 0),
+        'full_sync': job.get('full_sync'),
+        'truncated': job.get('truncated'),
+        'fetch_failures': job.get('fetch_failures', 0),
+        'error': job.get('error'),
+        'write_errors': job.get('write_errors', []),
+        'fetch_tiers': job.get('fetch_tiers', {}),
+        'bytes_saved': job.get('bytes_saved', 0),
+        'created_at': iso(job.get('created_at')),
+        'started_at': iso(job.get('started_at')),
+        'finished_at': iso(job.get('finished_at'))
+    }
+
+
+# Create a single worker instance
+sync_worker = SyncWorker()
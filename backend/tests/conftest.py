@@ -0,0 +1,21 @@
+import os
+import sys
+
+import mongomock
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import db
+
+
+@pytest.fixture
+def mongo():
+    """The shared database on a fresh mongomock client, with the app's indexes"""
+    client = mongomock.MongoClient()
+    db._client = client
+    db._db = client['jobmail_test']
+    db._setup_indexes()
+    yield db
+    db._client = None
+    db._db = None
@@ -0,0 +1,112 @@
+import asyncio
+
+import mongomock
+import pytest
+
+pytest.importorskip('aiohttp')
+
+import services.async_sync as async_sync_module
+from benchmarks.fake_gmail import FakeGmailServer, FakeMailbox
+from services.async_sync import AsyncSyncPipeline
+from config import Config
+
+CREDENTIALS = {'token': 'test-token'}
+MESSAGES = 300
+
+
+class AsyncCursor:
+    def __init__(self, cursor):
+        self._docs = iter(list(cursor))
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._docs)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class AsyncCollection:
+    """Just enough of a motor collection over a mongomock one"""
+
+    def __init__(self, collection):
+        self._collection = collection
+
+    def find(self, *args, **kwargs):
+        return AsyncCursor(self._collection.find(*args, **kwargs))
+
+    def __getattr__(self, name):
+        method = getattr(self._collection, name)
+
+        async def call(*args, **kwargs):
+            return method(*args, **kwargs)
+        return call
+
+
+class AsyncDatabase:
+    def __init__(self, database):
+        self._database = database
+
+    def __getattr__(self, name):
+        return AsyncCollection(self._database[name])
+
+
+@pytest.fixture
+def server(monkeypatch):
+    monkeypatch.setattr(Config, 'GMAIL_RATE_LIMIT', False)
+    monkeypatch.setattr(Config, 'GMAIL_RETRY_BASE_DELAY', 0.01)
+    monkeypatch.setattr(Config, 'SYNC_TIME_BUDGET', 0)
+    monkeypatch.setattr(Config, 'GMAIL_TIERED_FETCH', True)
+    # Far smaller than the mailbox, so the lister is blocked on a full queue
+    monkeypatch.setattr(Config, 'ASYNC_SYNC_QUEUE_SIZE', 5)
+    with FakeGmailServer(FakeMailbox(size=MESSAGES), latency=0.001, item_latency=0) as server:
+        yield server
+
+
+@pytest.fixture
+def database():
+    return mongomock.MongoClient()['jobmail_test']
+
+
+def run_pipeline(server, database, timeout=30):
+    pipeline = AsyncSyncPipeline(CREDENTIALS, api_endpoint=server.url, database=AsyncDatabase(database))
+    return asyncio.run(asyncio.wait_for(pipeline.run(), timeout))
+
+
+def test_a_failing_stage_stops_the_pipeline_instead_of_hanging(server, database, monkeypatch):
+    def failing_find(self, *args, **kwargs):
+        raise RuntimeError('lookup failed')
+    monkeypatch.setattr(AsyncCollection, 'find', failing_find)
+
+    with pytest.raises(RuntimeError, match='lookup failed'):
+        run_pipeline(server, database)
+    assert database.users.find_one({}) is None
+
+
+def test_an_unparseable_message_is_skipped_and_holds_the_cursor(server, database, monkeypatch):
+    broken = server.mailbox.order[3]
+    parse_message = async_sync_module.parse_message
+
+    def flaky_parse(message):
+        if message['id'] == broken:
+            raise ValueError('malformed payload')
+        return parse_message(message)
+    monkeypatch.setattr(async_sync_module, 'parse_message', flaky_parse)
+
+    result = run_pipeline(server, database)
+
+    assert result['fetch_failures'] == 1
+    assert result['stored'] == MESSAGES - 1
+    assert database.emails.count_documents({'gmail_id': broken}) == 0
+    user = database.users.find_one({'email': server.mailbox.email_address})
+    assert user is None or 'history_id' not in user
+
+
+def test_a_clean_run_stores_everything_and_saves_the_cursor(server, database):
+    result = run_pipeline(server, database)
+
+    assert result['fetch_failures'] == 0
+    assert result['stored'] == MESSAGES
+    assert database.users.find_one({'email': server.mailbox.email_address})['history_id']
@@ -0,0 +1,58 @@
+import pytest
+
+from services.classifier import EmailClassifier, KeywordMatcher
+
+KEYWORDS = {
+    'Rejection': ['other candidates', 'not a fit', 'regret'],
+    'Selection': ['offer', 'interview', 'invitation', 'next round'],
+    'Pending': ['under review'],
+}
+
+
+@pytest.fixture
+def matcher():
+    return KeywordMatcher(KEYWORDS)
+
+
+@pytest.mark.parametrize('text, keywords', [
+    ('We would like to offer you the role', {'offer'}),
+    ('Two offers are attached', {'offer'}),
+    ('Interviews next week', {'interview'}),
+    ('Invitations were sent to all finalists', {'invitation'}),
+    ('Congratulations, you made the next rounds!', {'next round'}),
+    ('We regret to say we went with other candidates', {'regret', 'other candidates'}),
+])
+def test_matches_keywords_and_their_plurals(matcher, text, keywords):
+    assert matcher.find(text) == keywords
+
+
+@pytest.mark.parametrize('text', [
+    'The role was offered to others',
+    'We offered the role to others',
+    'Our interviewer will reach out',
+    'Not as fit as we hoped',
+])
+def test_does_not_match_inside_other_words(matcher, text):
+    assert matcher.find(text) == set()
+
+
+def test_substring_mode_matches_inside_words():
+    matcher = KeywordMatcher(KEYWORDS, word_boundaries=False)
+
+    assert matcher.find('We offered the role to others') == {'offer'}
+
+
+def test_scores_count_distinct_keywords(matcher):
+    scores = matcher.scores('Interview invitation; interviews and offers to follow')
+
+    assert scores == {'Rejection': 0, 'Selection': 3, 'Pending': 0}
+
+
+@pytest.mark.parametrize('subject, body, label', [
+    ('Interviews next week', 'Please pick a slot', 'Selection'),
+    ('Your application', 'Unfortunately we have decided to pursue other candidates', 'Rejection'),
+    ('Your application', 'Your application is under review', 'Pending'),
+    ('Hello', 'Nothing to see here', 'Pending'),
+])
+def test_classify(subject, body, label):
+    assert EmailClassifier(word_boundaries=True).classify(subject, body) == label
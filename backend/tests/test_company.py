@@ -0,0 +1,72 @@
+import pytest
+
+from services.company import CompanyResolver, parse_sender, resolve_companies
+
+
+@pytest.fixture
+def resolver():
+    return CompanyResolver(index_file='')
+
+
+@pytest.mark.parametrize('sender, company', [
+    ('Acme <recruiter@acme.com>', 'Acme'),
+    ('Jane Doe <jane@gmail.com>', 'Jane Doe'),
+    ('"Acme Careers" <jobs@acme.com>', 'Acme'),
+    ('Acme Hiring Team <jobs@acme.com>', 'Acme'),
+    # Generic display names fall back to the registrable domain label
+    ('Jobs <jobs@careers.acme.co.uk>', 'Acme'),
+    ('Careers <careers@globex.com>', 'Globex'),
+    ('Talent Acquisition <ta@initech.com>', 'Initech'),
+    ('Hiring Team <no-reply@mail.hooli.com>', 'Hooli'),
+    ('talent@careers.acme.com', 'Acme'),
+    ('Careers <careers@gmail.com>', 'Unknown'),
+    ('someone@gmail.com', 'Unknown'),
+    ('', 'Unknown'),
+])
+def test_resolve_plain_senders(resolver, sender, company):
+    assert resolver.resolve(sender) == company
+
+
+@pytest.mark.parametrize('sender, company', [
+    ('Acme via Greenhouse <no-reply@greenhouse.io>', 'Acme'),
+    ('Globex Hiring Team <no-reply@us.greenhouse-mail.io>', 'Globex'),
+    ('Workday <initech@myworkday.com>', 'Initech'),
+    ('Careers <no-reply@hooli.wd5.myworkday.com>', 'Hooli'),
+])
+def test_resolve_ats_senders(resolver, sender, company):
+    assert resolver.resolve(sender) == company
+
+
+def test_ats_sender_without_a_company_uses_the_subject(resolver):
+    sender = 'Greenhouse <no-reply@greenhouse.io>'
+
+    assert resolver.resolve_sender(sender) is None
+    assert resolver.resolve(sender, 'Thank you for applying to Stark Industries') == 'Stark Industries'
+    assert resolver.resolve(sender, 'Hello') == 'Unknown'
+
+
+def test_domain_index_wins(tmp_path):
+    index = tmp_path / 'companies.json'
+    index.write_text('{"domains": {"acme.co.uk": "Acme Corporation"}}')
+    resolver = CompanyResolver(index_file=str(index))
+
+    assert resolver.resolve('Jobs <jobs@careers.acme.co.uk>') == 'Acme Corporation'
+
+
+def test_parse_sender():
+    assert parse_sender('"Acme, Inc" <Jobs@Acme.COM.>') == ('Acme, Inc', 'jobs', 'acme.com')
+    assert parse_sender('jobs@acme.com') == ('', 'jobs', 'acme.com')
+    assert parse_sender('Acme') == ('', '', '')
+
+
+def test_resolve_companies_reuses_known_senders():
+    messages = [
+        {'id': '1', 'from': 'Acme <jobs@acme.com>'},
+        {'id': '2', 'from': 'Greenhouse <no-reply@greenhouse.io>', 'subject': 'Your interview at Globex'},
+        {'id': '3', 'from': 'Careers <jobs@initech.com>'},
+    ]
+
+    companies, new = resolve_companies(messages, {'Acme <jobs@acme.com>': 'Acme Corp'})
+
+    assert companies == {'1': 'Acme Corp', '2': 'Globex', '3': 'Initech'}
+    assert new == {'Greenhouse <no-reply@greenhouse.io>': None, 'Careers <jobs@initech.com>': 'Initech'}
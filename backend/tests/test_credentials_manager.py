@@ -0,0 +1,117 @@
+from datetime import datetime, timedelta
+
+import pytest
+from flask import Flask, session
+
+import services.credentials_manager as credentials_module
+from services.credentials_manager import CredentialsManager, ManagedCredentials, credentials_from_dict
+
+GRANT = {'token': 'old-token', 'refresh_token': 'refresh-1', 'client_id': 'client', 'client_secret': 'secret',
+         'token_uri': 'https://oauth2.googleapis.com/token'}
+
+
+@pytest.fixture
+def token_endpoint(monkeypatch):
+    """Stands in for oauth2.googleapis.com: every call hands out the next token"""
+    calls = []
+
+    def refresh_now(credentials, request):
+        calls.append(credentials.token)
+        credentials.token = f'new-token-{len(calls)}'
+        credentials.expiry = datetime.utcnow() + timedelta(hours=1)
+
+    monkeypatch.setattr(ManagedCredentials, '_refresh_now', refresh_now)
+    return calls
+
+
+@pytest.fixture
+def manager(mongo, monkeypatch):
+    manager = CredentialsManager()
+    monkeypatch.setattr(credentials_module, 'credentials_manager', manager)
+    return manager
+
+
+def test_refresh_persists_the_new_token(manager, mongo, token_endpoint):
+    credentials = credentials_from_dict(GRANT)
+
+    credentials.refresh(None)
+
+    assert credentials.token == 'new-token-1'
+    doc = mongo.oauth_tokens.find_one({'_id': manager.key_for('client', 'refresh-1')})
+    assert doc['token'] == 'new-token-1'
+    assert manager.stats()['refreshes'] == 1
+
+
+def test_copies_holding_the_stale_token_reuse_the_refresh(manager, token_endpoint):
+    first, second = credentials_from_dict(GRANT), credentials_from_dict(GRANT)
+
+    first.refresh(None)
+    second.refresh(None)
+
+    assert token_endpoint == ['old-token']
+    assert second.token == 'new-token-1'
+    assert manager.stats()['coalesced'] == 1
+
+
+def test_another_worker_picks_up_the_persisted_token(manager, mongo, monkeypatch, token_endpoint):
+    credentials_from_dict(GRANT).refresh(None)
+    other_worker = CredentialsManager()
+    monkeypatch.setattr(credentials_module, 'credentials_manager', other_worker)
+
+    credentials = credentials_from_dict(GRANT)
+    credentials.refresh(None)
+
+    assert len(token_endpoint) == 1
+    assert credentials.token == 'new-token-1'
+    assert other_worker.stats()['shared'] == 1
+
+
+def test_current_returns_the_refreshed_token_for_write_back(manager, token_endpoint):
+    assert manager.current(GRANT) is GRANT
+
+    credentials_from_dict(GRANT).refresh(None)
+    current = manager.current(GRANT)
+
+    assert current is not GRANT
+    assert current['token'] == 'new-token-1'
+    assert current['refresh_token'] == 'refresh-1'
+    assert manager.current(current) is current
+
+
+def test_session_credentials_are_written_back(manager, token_endpoint, monkeypatch):
+    import routes.auth as auth_module
+    monkeypatch.setattr(auth_module, 'credentials_manager', manager)
+
+    app = Flask(__name__)
+    app.secret_key = 'test'
+    credentials_from_dict(GRANT).refresh(None)
+
+    with app.test_request_context():
+        session['credentials'] = dict(GRANT)
+        session.modified = False
+
+        credentials = auth_module.get_session_credentials()
+
+        assert credentials['token'] == 'new-token-1'
+        assert session['credentials']['token'] == 'new-token-1'
+        assert session.modified
+
+
+def test_failed_refreshes_are_counted(manager, monkeypatch):
+    def refresh_now(credentials, request):
+        raise RuntimeError('invalid_grant')
+
+    monkeypatch.setattr(ManagedCredentials, '_refresh_now', refresh_now)
+
+    with pytest.raises(RuntimeError):
+        credentials_from_dict(GRANT).refresh(None)
+    assert manager.stats()['refresh_failures'] == 1
+
+
+def test_forget_drops_the_grant(manager, mongo, token_endpoint):
+    credentials_from_dict(GRANT).refresh(None)
+
+    manager.forget(GRANT)
+
+    assert manager.current(GRANT) is GRANT
+    assert mongo.oauth_tokens.count_documents({}) == 0
@@ -0,0 +1,113 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from models.email import Email
+from routes.emails import list_emails_page, encode_cursor, decode_cursor
+
+USER = 'a@example.com'
+
+
+@pytest.fixture
+def emails(mongo):
+    """Nine emails over five days, several sharing a date"""
+    start = datetime(2024, 5, 1)
+    for i in range(9):
+        mongo.emails.insert_one(Email(
+            user_email=USER, gmail_id=f'm{i}', subject=f'Subject {i}', sender='jobs@acme.com',
+            company='Acme' if i % 2 else 'Globex', status='Pending' if i % 3 else 'Rejection',
+            date=start + timedelta(days=i // 2), snippet=''
+        ).to_dict())
+    mongo.emails.insert_one(Email(
+        user_email='other@example.com', gmail_id='x', subject='', sender='', company='Acme',
+        status='Pending', date=start, snippet=''
+    ).to_dict())
+    return mongo
+
+
+def walk(args):
+    """Every page for args, following next_cursor"""
+    pages = []
+    cursor = None
+    while True:
+        page = list_emails_page(USER, dict(args, cursor=cursor) if cursor else args)
+        pages.append(page)
+        cursor = page['next_cursor']
+        if not page['has_more']:
+            return pages
+
+
+def test_pages_cover_every_email_once_newest_first(emails):
+    pages = walk({'limit': '4'})
+    rows = [row for page in pages for row in page['emails']]
+
+    assert [page['count'] for page in pages] == [4, 4, 1]
+    assert sorted(row['gmail_id'] for row in rows) == [f'm{i}' for i in range(9)]
+    assert [row['date'] for row in rows] == sorted((row['date'] for row in rows), reverse=True)
+    assert pages[-1]['next_cursor'] is None
+
+
+def test_filters_apply_across_pages(emails):
+    rows = [row for page in walk({'limit': '2', 'status': 'Rejection'}) for row in page['emails']]
+
+    assert sorted(row['gmail_id'] for row in rows) == ['m0', 'm3', 'm6']
+
+
+def test_fields_projection(emails):
+    page = list_emails_page(USER, {'limit': '1', 'fields': 'subject'})
+
+    assert list(page['emails'][0]) == ['id', 'subject']
+
+
+def test_cursor_round_trip(emails):
+    doc = emails.emails.find_one({'gmail_id': 'm4'})
+
+    assert decode_cursor(encode_cursor(doc)) == (doc['date'], doc['_id'])
+
+
+@pytest.mark.parametrize('args', [{'cursor': 'not-a-cursor'}, {'limit': '0'}, {'fields': 'password'}])
+def test_bad_arguments_raise_value_error(emails, args):
+    with pytest.raises(ValueError):
+        list_emails_page(USER, args)
+
+
+def test_undated_emails_follow_the_dated_ones(emails):
+    for i, date in enumerate([None, 'Mon, 6 May 2024', None]):
+        emails.emails.insert_one({'user_email': USER, 'gmail_id': f'u{i}', 'subject': '', 'sender': '',
+                                  'company': 'Acme', 'status': 'Pending', 'date': date, 'snippet': ''})
+    emails.emails.insert_one({'user_email': USER, 'gmail_id': 'u3', 'subject': '', 'sender': '',
+                              'company': 'Acme', 'status': 'Pending', 'snippet': ''})
+
+    pages = walk({'limit': '4'})
+    ids = [row['gmail_id'] for page in pages for row in page['emails']]
+
+    assert len(ids) == len(set(ids)) == 13
+    assert ids[9:] == ['u3', 'u2', 'u1', 'u0']
+
+
+def test_undated_cursor_round_trip(emails):
+    doc = {'_id': emails.emails.find_one()['_id'], 'date': None}
+
+    assert decode_cursor(encode_cursor(doc)) == (None, doc['_id'])
+
+
+def test_date_range_leaves_out_undated_emails(emails):
+    emails.emails.insert_one({'user_email': USER, 'gmail_id': 'u0', 'date': None, 'status': 'Pending'})
+
+    rows = [row for page in walk({'limit': '3', 'date_from': '2024-05-03'}) for row in page['emails']]
+
+    assert sorted(row['gmail_id'] for row in rows) == ['m4', 'm5', 'm6', 'm7', 'm8']
+
+
+def test_setup_drops_superseded_indexes(mongo):
+    mongo.emails.create_index([('user_email', 1), ('date', -1)])
+    mongo.emails.create_index([('user_email', 1), ('status', 1)])
+    mongo.emails.create_index([('user_email', 1), ('created_at', 1)])
+
+    mongo._setup_indexes()
+
+    names = mongo.emails.index_information()
+    assert 'user_email_1_date_-1' not in names
+    assert 'user_email_1_status_1' not in names
+    assert 'user_email_1_created_at_1' not in names
+    assert 'user_email_1_date_-1__id_-1' in names
@@ -0,0 +1,72 @@
+import base64
+
+import pytest
+
+from services.mime import decode_base64url, extract_body
+
+TEXT = 'The quick brown fox jumps over the lazy dog. ' * 20
+ACCENTED = 'Café – naïve résumé. ' * 20
+
+
+def encode(raw, padded=True):
+    data = base64.urlsafe_b64encode(raw).decode('ascii')
+    return data if padded else data.rstrip('=')
+
+
+def plain(text):
+    return {'mimeType': 'text/plain', 'body': {'data': encode(text.encode('utf-8'), padded=False)}}
+
+
+@pytest.mark.parametrize('padded', [True, False])
+@pytest.mark.parametrize('length', [0, 1, 2, 3, 4, 5, 299, 300])
+def test_decodes_everything_without_a_budget(padded, length):
+    raw = TEXT.encode('ascii')[:length]
+
+    assert decode_base64url(encode(raw, padded)) == raw
+
+
+@pytest.mark.parametrize('padded', [True, False])
+@pytest.mark.parametrize('length', [1, 2, 3, 4, 5, 6, 7])
+def test_under_the_budget_decodes_everything(padded, length):
+    raw = TEXT.encode('ascii')[:length]
+
+    assert decode_base64url(encode(raw, padded), max_bytes=8) == raw
+    assert decode_base64url(encode(raw, padded), max_bytes=length) == raw
+
+
+@pytest.mark.parametrize('padded', [True, False])
+@pytest.mark.parametrize('max_bytes', [0, 1, 2, 3, 4, 5, 100, 101, 102])
+def test_over_the_budget_stops_at_max_bytes(padded, max_bytes):
+    raw = TEXT.encode('ascii')
+    length = len(raw) - 1  # leaves a partial last group, so the input needs padding
+
+    assert decode_base64url(encode(raw[:length], padded), max_bytes) == raw[:max_bytes]
+
+
+@pytest.mark.parametrize('budget', range(1, 12))
+def test_multibyte_characters_split_at_the_cut_are_dropped(budget):
+    body = extract_body(plain(ACCENTED), budget)
+
+    assert len(body.encode('utf-8')) <= budget
+    assert ACCENTED.startswith(body)
+    # At most one character (up to 3 bytes in UTF-8) is lost at the cut
+    assert len(body.encode('utf-8')) > budget - 3
+
+
+def test_html_only_body_is_stripped_and_budgeted():
+    markup = '<html><head><title>x</title></head><body><p>Café offer</p><script>no()</script></body></html>'
+    payload = {'mimeType': 'multipart/alternative', 'parts': [
+        {'mimeType': 'text/html', 'body': {'data': encode(markup.encode('utf-8'))}},
+    ]}
+
+    assert extract_body(payload, 100) == 'Café offer'
+
+
+def test_html_text_is_cut_to_the_budget():
+    markup = '<p>' + ACCENTED + '</p>'
+    payload = {'mimeType': 'text/html', 'body': {'data': encode(markup.encode('utf-8'))}}
+
+    body = extract_body(payload, 9)
+
+    assert len(body.encode('utf-8')) <= 9
+    assert ACCENTED.startswith(body)
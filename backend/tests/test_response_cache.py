@@ -0,0 +1,96 @@
+import pytest
+from flask import Flask, request
+
+import services.response_cache as response_cache_module
+from services.response_cache import DataVersions, ResponseCache
+
+USER = 'a@example.com'
+
+
+@pytest.fixture
+def versions(mongo, monkeypatch):
+    versions = DataVersions(ttl=60)
+    monkeypatch.setattr(response_cache_module, 'data_versions', versions)
+    return versions
+
+
+@pytest.fixture
+def builds():
+    return []
+
+
+@pytest.fixture
+def client(versions, builds):
+    app = Flask(__name__)
+    cache = ResponseCache()
+
+    @app.route('/api/emails')
+    def emails():
+        def build():
+            builds.append(request.full_path)
+            if request.args.get('uncacheable'):
+                return None
+            return {'emails': [], 'build': len(builds)}
+        return cache.serve(USER, build) or ({'uncached': True}, 200)
+
+    return app.test_client()
+
+
+def test_matching_if_none_match_gets_a_304_without_a_build(client, builds):
+    first = client.get('/api/emails')
+    etag = first.headers['ETag']
+
+    second = client.get('/api/emails', headers={'If-None-Match': etag})
+
+    assert first.status_code == 200
+    assert first.headers['Cache-Control'] == 'private, no-cache'
+    assert second.status_code == 304
+    assert second.data == b''
+    assert second.headers['ETag'] == etag
+    assert len(builds) == 1
+
+
+def test_unchanged_data_is_served_from_the_cache(client, builds):
+    first = client.get('/api/emails')
+    second = client.get('/api/emails')
+
+    assert second.status_code == 200
+    assert second.data == first.data
+    assert len(builds) == 1
+
+
+def test_bump_gives_a_fresh_etag_and_body(client, versions, builds):
+    old = client.get('/api/emails').headers['ETag']
+
+    versions.bump(USER)
+    response = client.get('/api/emails', headers={'If-None-Match': old})
+
+    assert response.status_code == 200
+    assert response.headers['ETag'] != old
+    assert response.json['build'] == 2
+
+
+def test_a_bump_from_another_worker_is_seen_after_forget(client, versions, mongo, builds):
+    old = client.get('/api/emails').headers['ETag']
+
+    mongo.user_versions.update_one({'_id': USER}, {'$inc': {'version': 1}}, upsert=True)
+    assert client.get('/api/emails', headers={'If-None-Match': old}).status_code == 304
+    versions.forget(USER)
+
+    assert client.get('/api/emails', headers={'If-None-Match': old}).status_code == 200
+
+
+def test_etags_depend_on_the_query_not_its_order(client):
+    a = client.get('/api/emails?limit=10&status=Pending').headers['ETag']
+    b = client.get('/api/emails?status=Pending&limit=10').headers['ETag']
+    c = client.get('/api/emails?limit=20&status=Pending').headers['ETag']
+
+    assert a == b
+    assert a != c
+
+
+def test_uncacheable_payloads_are_left_to_the_caller(client, builds):
+    response = client.get('/api/emails?uncacheable=1')
+
+    assert response.json == {'uncached': True}
+    assert 'ETag' not in response.headers
@@ -0,0 +1,145 @@
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+from flask import Flask, jsonify, session
+
+import services.cache as cache_module
+from services.session_store import MemoryStore, MongoStore, ServerSideSessionInterface
+
+
+@pytest.fixture
+def app(mongo):
+    app = Flask(__name__)
+    app.config.update(SECRET_KEY='test', PERMANENT_SESSION_LIFETIME=timedelta(days=7))
+    app.session_interface = ServerSideSessionInterface(MongoStore('sessions'))
+
+    @app.route('/visit')
+    def visit():
+        session['visits'] = session.get('visits', 0) + 1
+        return jsonify(visits=session['visits'])
+
+    @app.route('/login')
+    def login():
+        session.regenerate()
+        session.permanent = True
+        session['user'] = 'a@example.com'
+        return jsonify(ok=True)
+
+    @app.route('/whoami')
+    def whoami():
+        return jsonify(user=session.get('user'), visits=session.get('visits'))
+
+    @app.route('/logout')
+    def logout():
+        session.clear()
+        return jsonify(ok=True)
+
+    return app
+
+
+def session_id(client):
+    cookie = client.get_cookie('session')
+    return cookie.value if cookie else None
+
+
+def test_cookie_holds_only_an_id(app, mongo):
+    client = app.test_client()
+
+    client.get('/visit')
+
+    sid = session_id(client)
+    assert len(sid) == 43
+    assert mongo.sessions.find_one({'_id': sid})['data']['visits'] == 1
+    assert client.get('/visit').json['visits'] == 2
+
+
+def test_unmodified_session_is_not_written(app, mongo):
+    client = app.test_client()
+    client.get('/visit')
+    written = mongo.sessions.find_one({'_id': session_id(client)})['expires_at']
+
+    client.get('/whoami')
+
+    assert mongo.sessions.find_one({'_id': session_id(client)})['expires_at'] == written
+
+
+def test_regenerate_moves_the_data_to_a_new_id(app, mongo):
+    client = app.test_client()
+    client.get('/visit')
+    before = session_id(client)
+
+    client.get('/login')
+
+    after = session_id(client)
+    assert after != before
+    assert mongo.sessions.find_one({'_id': before}) is None
+    assert client.get('/whoami').json == {'user': 'a@example.com', 'visits': 1}
+
+
+def test_a_rotated_away_id_no_longer_works(app):
+    client = app.test_client()
+    client.get('/visit')
+    old = session_id(client)
+    client.get('/login')
+
+    client.set_cookie('session', old)
+
+    assert client.get('/whoami').json == {'user': None, 'visits': None}
+
+
+def test_expired_sessions_are_ignored_before_the_ttl_monitor_runs(app, mongo):
+    client = app.test_client()
+    client.get('/login')
+    mongo.sessions.update_one({'_id': session_id(client)},
+                              {'$set': {'expires_at': datetime.utcnow() - timedelta(seconds=1)}})
+
+    assert client.get('/whoami').json['user'] is None
+
+
+def test_clearing_the_session_deletes_it(app, mongo):
+    client = app.test_client()
+    client.get('/login')
+    sid = session_id(client)
+
+    client.get('/logout')
+
+    assert mongo.sessions.find_one({'_id': sid}) is None
+    assert session_id(client) is None
+
+
+def test_malformed_cookies_are_ignored(app, mongo):
+    mongo.sessions.insert_one({'_id': 'short', 'data': {'user': 'x'},
+                               'expires_at': datetime.utcnow() + timedelta(days=1)})
+    client = app.test_client()
+    client.set_cookie('session', 'short')
+
+    assert client.get('/whoami').json['user'] is None
+
+
+def test_mongo_store_pop_only_succeeds_once(mongo):
+    states = MongoStore('oauth_states')
+    states.set('state-1', {'created_at': 'now'}, ttl=600)
+
+    assert states.pop('state-1') == {'created_at': 'now'}
+    assert states.pop('state-1') is None
+
+
+def test_memory_store_entries_expire(monkeypatch):
+    clock = SimpleNamespace(now=1000.0)
+    monkeypatch.setattr(cache_module, 'time', SimpleNamespace(monotonic=lambda: clock.now))
+    store = MemoryStore(maxsize=2)
+    store.set('a', {'n': 1}, ttl=10)
+
+    assert store.get('a') == {'n': 1}
+    clock.now += 11
+    assert store.get('a') is None
+
+
+def test_memory_store_is_bounded():
+    store = MemoryStore(maxsize=2)
+    for key in 'abc':
+        store.set(key, {}, ttl=60)
+
+    assert store.get('a') is None
+    assert store.get('c') == {}
@@ -0,0 +1,97 @@
+from datetime import datetime
+
+import pytest
+
+from database import db
+from services.stats_service import (
+    stats_update, week_key, company_key, get_stats, rebuild_stats, record_email_changes
+)
+
+USER = 'a@example.com'
+
+
+def email(status, company='Acme', date=datetime(2024, 5, 6), read=None):
+    return {'status': status, 'company': company, 'date': date, 'read': read}
+
+
+def test_added_emails_are_counted():
+    update = stats_update(added=[email('Rejection'), email('Pending', read=True)])
+    inc = update['$inc']
+
+    assert inc['total'] == 2
+    assert inc['by_status.Rejection'] == 1
+    assert inc['by_status.Pending'] == 1
+    assert inc[f"by_company.{company_key('Acme')}"] == 2
+    assert inc[f"by_week.{week_key(datetime(2024, 5, 6))}.Rejection"] == 1
+    assert inc['unread'] == 1
+    assert 'updated_at' in update['$set']
+
+
+def test_replaced_email_moves_between_counters():
+    update = stats_update(added=[email('Selection', read=True)], removed=[email('Pending', read=True)])
+
+    assert update['$inc'] == {
+        'by_status.Selection': 1,
+        'by_status.Pending': -1,
+        f"by_week.{week_key(datetime(2024, 5, 6))}.Selection": 1,
+        f"by_week.{week_key(datetime(2024, 5, 6))}.Pending": -1,
+        'revision': 1
+    }
+
+
+def test_undated_email_skips_the_weekly_trend():
+    inc = stats_update(added=[email('Pending', date=None)])['$inc']
+
+    assert not any(path.startswith('by_week.') for path in inc)
+
+
+def test_no_change_is_no_update():
+    same = email('Pending')
+
+    assert stats_update() is None
+    assert stats_update(added=[same], removed=[same]) is None
+
+
+@pytest.fixture
+def stored(mongo):
+    """Two stored emails for USER"""
+    mongo.emails.insert_many([
+        dict(email('Pending'), user_email=USER, gmail_id='m1'),
+        dict(email('Rejection'), user_email=USER, gmail_id='m2')
+    ])
+    return mongo
+
+
+def test_rebuild_counts_stored_emails(stored):
+    stats = get_stats(USER)
+
+    assert stats['total'] == 2
+    assert stats['by_status'] == {'Rejection': 1, 'Selection': 0, 'Pending': 1}
+    assert stored.user_stats.find_one({'_id': USER})['total'] == 2
+
+
+def test_changes_apply_to_built_stats(stored):
+    get_stats(USER)
+
+    record_email_changes(USER, added=[email('Selection')])
+
+    assert get_stats(USER)['by_status']['Selection'] == 1
+
+
+def test_write_during_rebuild_is_not_lost(stored, monkeypatch):
+    aggregate = type(stored.emails).aggregate
+
+    def sync_lands_meanwhile(collection, pipeline, *args, **kwargs):
+        result = list(aggregate(collection, pipeline, *args, **kwargs))
+        # A sync chunk is written after the aggregation read the emails
+        stored.emails.insert_one(dict(email('Selection'), user_email=USER, gmail_id='m3'))
+        record_email_changes(USER, added=[email('Selection')])
+        return iter(result)
+
+    monkeypatch.setattr(type(stored.emails), 'aggregate', sync_lands_meanwhile)
+    assert rebuild_stats(USER)['total'] == 2
+    monkeypatch.undo()
+
+    # The stale result wasn't stored, so the next read counts all three
+    assert stored.user_stats.find_one({'_id': USER}) is None
+    assert get_stats(USER)['total'] == 3
@@ -0,0 +1,22 @@
+from services.classifier import EmailClassifier
+from services.sync_service import store_messages
+
+USER = 'a@example.com'
+
+
+def message(gmail_id, subject='Interview invitation'):
+    return {'id': gmail_id, 'subject': subject, 'from': 'Acme <jobs@acme.com>',
+            'snippet': 'We would like to schedule an interview', 'date': 'Mon, 03 Jun 2024 10:00:00 +0000'}
+
+
+def test_store_messages_counts_only_new_emails_as_upserted(mongo):
+    classifier = EmailClassifier()
+
+    first = store_messages(USER, [message('m1'), message('m2')], classifier)
+    second = store_messages(USER, [message('m1'), message('m2'), message('m3')], classifier)
+    forced = store_messages(USER, [message('m1', 'Offer'), message('m3')], classifier, force_refresh=True)
+
+    assert first['upserted'] == 2
+    assert second['upserted'] == 1
+    assert forced['upserted'] == 0
+    assert mongo.emails.count_documents({'user_email': USER}) == 3
@@ -0,0 +1,148 @@
+from datetime import datetime, timedelta
+
+import pytest
+from pymongo.errors import DuplicateKeyError
+
+import services.sync_worker as sync_worker_module
+from services.sync_worker import SyncWorker
+from config import Config
+
+CREDENTIALS = {'token': 'test-token'}
+
+
+@pytest.fixture
+def worker(mongo, monkeypatch):
+    worker = SyncWorker(max_workers=1)
+    # Jobs are run by hand in these tests
+    monkeypatch.setattr(worker, '_submit', lambda: None)
+    return worker
+
+
+def insert_job(mongo, user_email, status, created_at, heartbeat_at=None, active=True):
+    job = {'user_email': user_email, 'status': status, 'credentials': CREDENTIALS, 'stored': 0,
+           'created_at': created_at, 'heartbeat_at': heartbeat_at or created_at}
+    if active:
+        job['active'] = True
+    return mongo.sync_jobs.insert_one(job).inserted_id
+
+
+def test_enqueue_returns_the_active_job(worker, mongo):
+    first = worker.enqueue('a@example.com', CREDENTIALS)
+    second = worker.enqueue('a@example.com', CREDENTIALS, force_refresh=True)
+
+    assert second['_id'] == first['_id']
+    assert second['force_refresh'] is False
+    assert mongo.sync_jobs.count_documents({}) == 1
+
+
+def test_enqueue_creates_a_new_job_once_the_last_one_finished(worker, mongo):
+    first = worker.enqueue('a@example.com', CREDENTIALS)
+    mongo.sync_jobs.update_one({'_id': first['_id']}, {'$set': {'status': 'done'}, '$unset': {'active': ''}})
+
+    second = worker.enqueue('a@example.com', CREDENTIALS)
+
+    assert second['_id'] != first['_id']
+    assert mongo.sync_jobs.count_documents({'user_email': 'a@example.com'}) == 2
+
+
+def test_partial_index_allows_one_active_job_per_user(mongo):
+    now = datetime.utcnow()
+    insert_job(mongo, 'a@example.com', 'done', now, active=False)
+    insert_job(mongo, 'a@example.com', 'failed', now, active=False)
+    insert_job(mongo, 'a@example.com', 'queued', now)
+
+    with pytest.raises(DuplicateKeyError):
+        insert_job(mongo, 'a@example.com', 'queued', now)
+    insert_job(mongo, 'b@example.com', 'queued', now)
+
+
+def test_enqueue_race_returns_the_winning_job(worker, mongo, monkeypatch):
+    collection = mongo.sync_jobs
+    winner = {}
+
+    def lose_race(*args, **kwargs):
+        # Another request inserts the active job between our find and insert
+        winner['_id'] = insert_job(mongo, 'a@example.com', 'queued', datetime.utcnow())
+        raise DuplicateKeyError('E11000 duplicate key error')
+
+    monkeypatch.setattr(type(collection), 'find_one_and_update', lose_race)
+
+    job = worker.enqueue('a@example.com', CREDENTIALS)
+
+    assert job['_id'] == winner['_id']
+
+
+def test_claim_takes_the_oldest_queued_job(worker, mongo):
+    now = datetime.utcnow()
+    newer = insert_job(mongo, 'a@example.com', 'queued', now)
+    older = insert_job(mongo, 'b@example.com', 'queued', now - timedelta(minutes=1))
+
+    job = worker._claim()
+
+    assert job['_id'] == older
+    assert job['status'] == 'running'
+    assert job['worker'] == worker.worker_id
+    assert worker._claim()['_id'] == newer
+    assert worker._claim() is None
+
+
+def test_claim_takes_over_stale_running_jobs_only(worker, mongo):
+    now = datetime.utcnow()
+    stale_at = now - timedelta(seconds=Config.SYNC_JOB_STALE_SECONDS + 60)
+    insert_job(mongo, 'live@example.com', 'running', stale_at, heartbeat_at=now)
+    stale = insert_job(mongo, 'dead@example.com', 'running', stale_at, heartbeat_at=stale_at)
+
+    job = worker._claim()
+
+    assert job['_id'] == stale
+    assert job['heartbeat_at'] > stale_at
+    assert worker._claim() is None
+
+
+def test_run_records_the_result_and_frees_the_slot(worker, mongo, monkeypatch):
+    result = {'user_email': 'a@example.com', 'stored': 3, 'inserted': 1, 'full_sync': True, 'truncated': False,
+              'fetch_failures': 0, 'write_errors': [], 'fetch_tiers': {'full': 3}, 'bytes_saved': 0}
+    monkeypatch.setattr(sync_worker_module, 'run_sync', lambda credentials, force, progress: result)
+    worker.enqueue('a@example.com', CREDENTIALS)
+
+    worker._run(worker._claim())
+
+    job = mongo.sync_jobs.find_one({'user_email': 'a@example.com'})
+    assert job['status'] == 'done'
+    assert job['stored'] == 3
+    assert job['inserted'] == 1
+    assert job['finished_at'] is not None
+    assert 'active' not in job
+    assert 'credentials' not in job
+
+
+def test_run_marks_failed_syncs(worker, mongo, monkeypatch):
+    def fail(credentials, force, progress):
+        raise RuntimeError('Gmail unavailable')
+
+    monkeypatch.setattr(sync_worker_module, 'run_sync', fail)
+    worker.enqueue('a@example.com', CREDENTIALS)
+
+    worker._run(worker._claim())
+
+    job = mongo.sync_jobs.find_one({'user_email': 'a@example.com'})
+    assert job['status'] == 'failed'
+    assert job['error'] == 'Gmail unavailable'
+    assert 'active' not in job
+
+
+def test_progress_records_stored_and_inserted(worker, mongo, monkeypatch):
+    seen = {}
+
+    def sync(credentials, force, progress):
+        progress(100, 4)
+        seen.update(mongo.sync_jobs.find_one({'user_email': 'a@example.com'}))
+        raise RuntimeError('stop')
+
+    monkeypatch.setattr(sync_worker_module, 'run_sync', sync)
+    worker.enqueue('a@example.com', CREDENTIALS)
+
+    worker._run(worker._claim())
+
+    assert seen['stored'] == 100
+    assert seen['inserted'] == 4
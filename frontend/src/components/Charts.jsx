@@ -11,14 +11,12 @@ const Charts = ({ stats }) => {
     { name: 'Rejection', value: stats.rejection, color: '#ef4444' },
   ];
 
-  // Mock trend data - you can fetch this from backend later
-  const trendData = [
-    { month: 'Jun', applications: 15, responses: 8 },
-    { month: 'Jul', applications: 22, responses: 12 },
-    { month: 'Aug', applications: 28, responses: 18 },
-    { month: 'Sep', applications: 25, responses: 15 },
-    { month: 'Oct', applications: stats.total, responses: stats.selection + stats.rejection },
-  ];
+  // Weekly breakdown from /api/stats; responses are emails that got a decision
+  const trendData = (stats.by_week || []).map((week) => ({
+    week: week.week.split('-')[1],
+    applications: week.total,
+    responses: week.selection + week.rejection,
+  }));
 
   return (
     <div className="grid grid-cols-1 lg:grid-cols-3 gap-6 mb-8">
@@ -39,7 +37,7 @@ const Charts = ({ stats }) => {
               </linearGradient>
             </defs>
             <CartesianGrid strokeDasharray="3 3" stroke={darkMode ? '#374151' : '#e5e7eb'} />
-            <XAxis dataKey="month" stroke={darkMode ? '#9ca3af' : '#6b7280'} />
+            <XAxis dataKey="week" stroke={darkMode ? '#9ca3af' : '#6b7280'} />
             <YAxis stroke={darkMode ? '#9ca3af' : '#6b7280'} />
             <Tooltip 
               contentStyle={{ 
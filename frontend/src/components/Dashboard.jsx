@@ -3,7 +3,7 @@ import { useTheme } from '../context/ThemeContext';
 import StatsCards from './StatsCards';
 import Charts from './Charts';
 import EmailTable from './EmailTable';
-import { fetchEmails, fetchStats } from '../utils/api';
+import { fetchEmails, fetchStats, fetchSyncStatus, streamEmails } from '../utils/api';
 import { Loader, AlertCircle, RefreshCw } from 'lucide-react';
 
 const Dashboard = () => {
@@ -19,6 +19,7 @@ const Dashboard = () => {
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState(null);
   const [refreshing, setRefreshing] = useState(false);
+  const [syncing, setSyncing] = useState(false);
 
   useEffect(() => {
     loadData();
@@ -33,13 +34,23 @@ const Dashboard = () => {
       }
       setError(null);
 
-      const [emailsData, statsData] = await Promise.all([
-        fetchEmails(forceRefresh),
-        fetchStats()
-      ]);
+      // Stored rows arrive as the backend reads them; show the table as soon
+      // as the first batch is in
+      const rows = new Map();
+      const end = await streamEmails(forceRefresh, (events) => {
+        events
+          .filter(event => event.type === 'email')
+          .forEach(event => rows.set(event.email.gmail_id, event.email));
+        setEmails([...rows.values()].sort((a, b) => (b.date || '').localeCompare(a.date || '')));
+        setLoading(false);
+      });
 
-      setEmails(emailsData.emails || []);
-      setStats(statsData);
+      setStats(await fetchStats());
+
+      // The stream only carries what was stored; a running sync is picked up when done
+      if (end?.syncing && end.sync_job) {
+        waitForSync(end.sync_job.id);
+      }
     } catch (err) {
       console.error('Error loading data:', err);
       setError(err.response?.data?.error || err.message || 'Failed to load data');
@@ -49,6 +60,28 @@ const Dashboard = () => {
     }
   };
 
+  const waitForSync = async (jobId) => {
+    setSyncing(true);
+    try {
+      let job;
+      do {
+        await new Promise(resolve => setTimeout(resolve, 3000));
+        job = await fetchSyncStatus(jobId);
+      } while (job.status === 'queued' || job.status === 'running');
+
+      const [emailsData, statsData] = await Promise.all([
+        fetchEmails(false),
+        fetchStats()
+      ]);
+      setEmails(emailsData.emails || []);
+      setStats(statsData);
+    } catch (err) {
+      console.error('Error waiting for sync:', err);
+    } finally {
+      setSyncing(false);
+    }
+  };
+
   const handleRefresh = () => {
     loadData(true);
   };
@@ -98,11 +131,11 @@ const Dashboard = () => {
     <div className={`min-h-screen transition-colors duration-300 ${darkMode ? 'bg-gradient-to-br from-gray-900 via-gray-800 to-gray-900' : 'bg-gradient-to-br from-blue-50 via-white to-purple-50'}`}>
       <div className="max-w-7xl mx-auto px-4 sm:px-6 lg:px-8 py-8">
         {/* Refresh Indicator */}
-        {refreshing && (
+        {(refreshing || syncing) && (
           <div className={`mb-6 p-4 rounded-xl ${darkMode ? 'bg-blue-900/30 border border-blue-800' : 'bg-blue-50 border border-blue-200'} flex items-center space-x-3`}>
             <Loader className={`w-5 h-5 animate-spin ${darkMode ? 'text-blue-400' : 'text-blue-600'}`} />
             <span className={`font-medium ${darkMode ? 'text-blue-300' : 'text-blue-700'}`}>
-              Refreshing your emails...
+              {refreshing ? 'Refreshing your emails...' : 'Syncing older emails in the background...'}
             </span>
           </div>
         )}
@@ -53,6 +53,45 @@ export const fetchEmails = async (forceRefresh = false) => {
   return response.data;
 };
 
+// Streams /emails as NDJSON, calling onEvents with the lines parsed from
+// each network read so rows can render before the listing is complete
+export const streamEmails = async (forceRefresh, onEvents) => {
+  const response = await fetch(`${API_URL}/emails?format=ndjson&refresh=${forceRefresh}`, {
+    credentials: 'include',
+    headers: { Accept: 'application/x-ndjson' },
+  });
+  if (!response.ok) {
+    const data = await response.json().catch(() => ({}));
+    throw new Error(data.error || `Request failed with status ${response.status}`);
+  }
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+  let end = null;
+
+  for (;;) {
+    const { done, value } = await reader.read();
+    buffer += decoder.decode(value || new Uint8Array(), { stream: !done });
+    const lines = buffer.split('\n');
+    buffer = done ? '' : lines.pop();
+
+    const events = lines.filter(line => line.trim()).map(line => JSON.parse(line));
+    end = events.find(event => event.type === 'end') || end;
+    if (events.length) {
+      onEvents(events);
+    }
+    if (done) {
+      return end;
+    }
+  }
+};
+
+export const fetchSyncStatus = async (jobId) => {
+  const response = await api.get(`/sync/${jobId}`);
+  return response.data;
+};
+
 export const fetchStats = async () => {
   const response = await api.get('/stats');
   return response.data;